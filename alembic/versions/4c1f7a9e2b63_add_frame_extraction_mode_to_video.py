@@ -0,0 +1,34 @@
+"""add frame extraction mode to video
+
+Revision ID: 4c1f7a9e2b63
+Revises: 30a6de22c1a4
+Create Date: 2026-10-18 09:12:41.318520
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '4c1f7a9e2b63'
+down_revision: Union[str, None] = '30a6de22c1a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('video', sa.Column('extraction_mode', sa.String(), server_default='all', nullable=False))
+    op.add_column('video', sa.Column('frame_stride', sa.Integer(), nullable=True))
+    op.add_column('video', sa.Column('scene_threshold', sa.Float(), nullable=True))
+    op.add_column('video', sa.Column('extracted_frame_count', sa.Integer(), nullable=True))
+    op.add_column('video', sa.Column('frame_mapping', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('video', 'frame_mapping')
+    op.drop_column('video', 'extracted_frame_count')
+    op.drop_column('video', 'scene_threshold')
+    op.drop_column('video', 'frame_stride')
+    op.drop_column('video', 'extraction_mode')
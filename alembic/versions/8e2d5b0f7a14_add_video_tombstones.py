@@ -0,0 +1,36 @@
+"""add video tombstones
+
+Revision ID: 8e2d5b0f7a14
+Revises: 4c1f7a9e2b63
+Create Date: 2026-10-18 10:03:17.504262
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '8e2d5b0f7a14'
+down_revision: Union[str, None] = '4c1f7a9e2b63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('video', sa.Column('deleted_at', postgresql.TIMESTAMP(timezone=True), nullable=True))
+    op.drop_constraint('video_video_name_key', 'video', type_='unique')
+    op.create_index(
+        'ix_video_video_name_active',
+        'video',
+        ['video_name'],
+        unique=True,
+        postgresql_where=sa.text('is_active'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_video_video_name_active', table_name='video', postgresql_where=sa.text('is_active'))
+    op.create_unique_constraint('video_video_name_key', 'video', ['video_name'])
+    op.drop_column('video', 'deleted_at')
@@ -0,0 +1,28 @@
+"""add content hash to video
+
+Revision ID: b37a1d4c9e05
+Revises: 8e2d5b0f7a14
+Create Date: 2026-10-18 11:24:52.871934
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'b37a1d4c9e05'
+down_revision: Union[str, None] = '8e2d5b0f7a14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('video', sa.Column('content_hash', sa.String(), nullable=True))
+    op.create_index(op.f('ix_video_content_hash'), 'video', ['content_hash'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_video_content_hash'), table_name='video')
+    op.drop_column('video', 'content_hash')
@@ -0,0 +1,26 @@
+"""add segments path to video
+
+Revision ID: c5e8f2a06d71
+Revises: b37a1d4c9e05
+Create Date: 2026-10-18 12:41:09.662180
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e8f2a06d71'
+down_revision: Union[str, None] = 'b37a1d4c9e05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('video', sa.Column('segments_path', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('video', 'segments_path')
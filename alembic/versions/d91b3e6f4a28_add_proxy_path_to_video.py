@@ -0,0 +1,26 @@
+"""add proxy path to video
+
+Revision ID: d91b3e6f4a28
+Revises: c5e8f2a06d71
+Create Date: 2026-10-18 13:37:44.150973
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'd91b3e6f4a28'
+down_revision: Union[str, None] = 'c5e8f2a06d71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('video', sa.Column('proxy_path', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('video', 'proxy_path')
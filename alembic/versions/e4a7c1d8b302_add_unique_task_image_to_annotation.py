@@ -0,0 +1,40 @@
+"""add unique task image to annotation
+
+Revision ID: e4a7c1d8b302
+Revises: d91b3e6f4a28
+Create Date: 2026-10-18 16:12:05.418327
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a7c1d8b302'
+down_revision: Union[str, None] = 'd91b3e6f4a28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # keep the latest row of frames exported more than once
+    op.execute(
+        """
+        DELETE FROM annotation a
+        USING annotation b
+        WHERE a.task_id = b.task_id
+          AND a.image_id = b.image_id
+          AND a.annotation_id < b.annotation_id
+        """
+    )
+    op.create_unique_constraint(
+        'uq_annotation_task_id_image_id', 'annotation', ['task_id', 'image_id']
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint(
+        'uq_annotation_task_id_image_id', 'annotation', type_='unique'
+    )
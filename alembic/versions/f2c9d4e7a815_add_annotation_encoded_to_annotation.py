@@ -0,0 +1,28 @@
+"""add annotation encoded to annotation
+
+Revision ID: f2c9d4e7a815
+Revises: e4a7c1d8b302
+Create Date: 2026-10-18 18:04:51.902316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c9d4e7a815'
+down_revision: Union[str, None] = 'e4a7c1d8b302'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'annotation', sa.Column('annotation_encoded', sa.LargeBinary(), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('annotation', 'annotation_encoded')
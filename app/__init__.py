@@ -1,4 +1,16 @@
 from settings import settings
 
-from .routers import video_router, ai_model_router, files_router, frames_router, task_router
-from .exceptions import CustomHTTPException
\ No newline at end of file
+from .routers import (
+    video_router,
+    ai_model_router,
+    files_router,
+    frames_router,
+    task_router,
+    playback_router,
+)
+from .exceptions import CustomHTTPException
+from .file_catalog import FILE_CATALOG
+from .media_prober import MEDIA_PROBER
+from .response_bridge import RESPONSE_BRIDGE
+from .websocket_manager import WSMANAGER
+from .task_hub import TASK_HUBS
@@ -0,0 +1,268 @@
+import os
+import json
+import time
+import asyncio
+import threading
+from datetime import datetime
+from typing import Dict, List, Literal, Optional, Set, Tuple
+
+import schemas
+from settings import settings
+
+SortKey = Literal["file_name", "file_size", "created_at", "modified_at"]
+# stands in for a missing value, of the type of the sort field
+SORT_KEY_MINIMUMS: Dict[str, object] = {
+    "file_name": "",
+    "file_size": 0,
+    "created_at": datetime.min,
+    "modified_at": datetime.min,
+}
+
+
+class DirectoryState:
+    def __init__(self, mtime: float, files: List[str], subdirectories: List[str]):
+        self.mtime = mtime
+        self.files = files
+        self.subdirectories = subdirectories
+
+    def to_dict(self) -> dict:
+        return {
+            "mtime": self.mtime,
+            "files": self.files,
+            "subdirectories": self.subdirectories,
+        }
+
+
+class FileCatalog:
+    """In-memory index of user files, refreshed incrementally.
+
+    Every refresh stats each directory once. Only directories whose mtime
+    changed (files added, removed or renamed) are listed again, so a refresh
+    of an unchanged tree costs one stat per directory instead of two per file.
+    Files growing in place do not change their directory mtime, a periodic
+    full rescan picks them up.
+    """
+
+    def __init__(
+        self,
+        root_directory: str,
+        persist_path: Optional[str] = None,
+        full_rescan_interval: float = 15 * 60,
+    ) -> None:
+        self.root_directory = os.path.abspath(root_directory)
+        self.persist_path = persist_path or None
+        self.full_rescan_interval = full_rescan_interval
+
+        self._files: Dict[str, schemas.FileOut] = dict()
+        self._directories: Dict[str, DirectoryState] = dict()
+        self._sorted_views: Dict[Tuple[str, bool], List[schemas.FileOut]] = dict()
+        self._refresh_lock = threading.Lock()
+        self._last_full_rescan_at = 0.0
+        self.is_ready = False
+
+    @staticmethod
+    def _scan_directory(directory: str, mtime: float) -> Optional[DirectoryState]:
+        files, subdirectories = [], []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirectories.append(os.path.abspath(entry.path))
+                        elif entry.is_file():
+                            files.append(os.path.abspath(entry.path))
+                    except OSError:
+                        continue
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        return DirectoryState(mtime, files, subdirectories)
+
+    @staticmethod
+    def _stat_file(file_path: str) -> Optional[schemas.FileOut]:
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        return schemas.FileOut(
+            file_name=os.path.basename(file_path),
+            file_path=file_path,
+            file_size=stat.st_size,
+            created_at=datetime.fromtimestamp(stat.st_ctime),
+            modified_at=datetime.fromtimestamp(stat.st_mtime),
+        )
+
+    def refresh(self, full: bool = False) -> bool:
+        """Brings the index up to date with the file system.
+
+        Args:
+            full (bool, optional): stat every file, not only files in changed directories.
+
+        Returns:
+            bool: True if the index changed
+        """
+        with self._refresh_lock:
+            if time.time() - self._last_full_rescan_at > self.full_rescan_interval:
+                full = True
+
+            files = dict(self._files)
+            directories: Dict[str, DirectoryState] = dict()
+            changed = False
+
+            stack = [self.root_directory]
+            while stack:
+                directory = stack.pop()
+                previous = self._directories.get(directory)
+                try:
+                    mtime = os.stat(directory).st_mtime
+                except (FileNotFoundError, NotADirectoryError):
+                    continue
+
+                if previous is not None and previous.mtime == mtime and not full:
+                    state = previous
+                else:
+                    state = self._scan_directory(directory, mtime)
+                    if state is None:
+                        continue
+                    previous_files = set(previous.files) if previous else set()
+                    for file_path in previous_files - set(state.files):
+                        files.pop(file_path, None)
+                        changed = True
+                    for file_path in state.files:
+                        if file_path in previous_files and not full:
+                            continue
+                        file_out = self._stat_file(file_path)
+                        if file_out is None:
+                            files.pop(file_path, None)
+                        elif files.get(file_path) != file_out:
+                            files[file_path] = file_out
+                        else:
+                            continue
+                        changed = True
+
+                directories[directory] = state
+                stack.extend(state.subdirectories)
+
+            # directories removed since the last refresh
+            for directory in set(self._directories) - set(directories):
+                for file_path in self._directories[directory].files:
+                    files.pop(file_path, None)
+                    changed = True
+
+            self._directories = directories
+            if changed:
+                self._files = files
+                self._sorted_views = dict()
+            if full:
+                self._last_full_rescan_at = time.time()
+            self.is_ready = True
+
+        if changed:
+            self.save()
+        return changed
+
+    def list_files(
+        self,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        extensions: Optional[Set[str]] = None,
+        sort_by: SortKey = "file_name",
+        descending: bool = False,
+    ) -> Tuple[int, List[schemas.FileOut]]:
+        """Returns a page of the catalog
+
+        Args:
+            offset (int, optional): number of files to skip. Defaults to 0.
+            limit (Optional[int], optional): page size, all files if None. Defaults to None.
+            extensions (Optional[Set[str]], optional): lowercase extensions without dot.
+            sort_by (SortKey, optional): sort field. Defaults to "file_name".
+            descending (bool, optional): sort order. Defaults to False.
+
+        Returns:
+            Tuple[int, List[schemas.FileOut]]: total number of matching files and the page
+        """
+        view_key = (sort_by, descending)
+        sorted_view = self._sorted_views.get(view_key)
+        if sorted_view is None:
+            minimum = SORT_KEY_MINIMUMS[sort_by]
+            sorted_view = sorted(
+                self._files.values(),
+                key=lambda f: (
+                    minimum if getattr(f, sort_by) is None else getattr(f, sort_by),
+                    str(f.file_path),
+                ),
+                reverse=descending,
+            )
+            self._sorted_views[view_key] = sorted_view
+
+        if extensions:
+            sorted_view = [
+                f
+                for f in sorted_view
+                if os.path.splitext(f.file_name)[1][1:].lower() in extensions
+            ]
+
+        end = offset + limit if limit is not None else None
+        return len(sorted_view), sorted_view[offset:end]
+
+    def save(self) -> None:
+        """Persists the index so a restarted API serves it before the first refresh"""
+        if not self.persist_path:
+            return
+        data = {
+            "root_directory": self.root_directory,
+            "files": [f.model_dump(mode="json") for f in self._files.values()],
+            "directories": {
+                directory: state.to_dict()
+                for directory, state in self._directories.items()
+            },
+        }
+        temporary_path = f"{self.persist_path}.tmp"
+        try:
+            with open(temporary_path, "w") as file:
+                json.dump(data, file)
+            os.replace(temporary_path, self.persist_path)
+        except OSError as e:
+            print(f"Error persisting file catalog: {e}")
+
+    def load(self) -> None:
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, "r") as file:
+                data = json.load(file)
+            if data.get("root_directory") != self.root_directory:
+                return
+            files = [schemas.FileOut.model_validate(f) for f in data["files"]]
+            self._files = {str(f.file_path): f for f in files}
+            self._directories = {
+                directory: DirectoryState(**state)
+                for directory, state in data["directories"].items()
+            }
+            self._sorted_views = dict()
+            self.is_ready = True
+        except Exception as e:
+            print(f"Error loading file catalog: {e}")
+
+    async def ensure_ready(self) -> None:
+        if not self.is_ready:
+            await asyncio.to_thread(self.refresh)
+
+    async def run(self, interval: float) -> None:
+        """Refreshes the catalog periodically in a worker thread"""
+        await asyncio.to_thread(self.load)
+        try:
+            while True:
+                try:
+                    await asyncio.to_thread(self.refresh)
+                except Exception as e:
+                    print(f"Error refreshing file catalog: {e}")
+                await asyncio.sleep(interval)
+        except asyncio.CancelledError:
+            print("File catalog refresh cancelled")
+
+
+FILE_CATALOG = FileCatalog(
+    settings.USER_FILES_DIRECTORY,
+    persist_path=settings.FILE_CATALOG_PERSIST_PATH,
+    full_rescan_interval=settings.FILE_CATALOG_FULL_RESCAN_INTERVAL_SECONDS,
+)
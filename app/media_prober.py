@@ -0,0 +1,128 @@
+import asyncio
+import itertools
+from typing import Dict, List, Optional, Set, Tuple
+
+import schemas
+from settings import settings
+from utils import probe_media_file
+
+from .file_catalog import FileCatalog
+
+CacheKey = Tuple[int, Optional[float]]
+
+# page requests jump ahead of the background backfill
+PRIORITY_REQUESTED = 0
+PRIORITY_BACKGROUND = 1
+
+
+class MediaProber:
+    """Fills in media metadata of catalog files in the background.
+
+    Results are cached by path, size and mtime, so a file is probed again
+    only after it changes. At most `concurrency` ffprobe processes run at once.
+    """
+
+    def __init__(self, concurrency: int = 2, timeout: float = 10) -> None:
+        self.concurrency = max(concurrency, 1)
+        self.timeout = timeout
+
+        self._cache: Dict[str, Tuple[CacheKey, Optional[schemas.MediaInformation]]] = (
+            dict()
+        )
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._queued: Dict[str, int] = dict()
+        self._counter = itertools.count()
+
+    @staticmethod
+    def _cache_key(file_out: schemas.FileOut) -> CacheKey:
+        modified_at = file_out.modified_at.timestamp() if file_out.modified_at else None
+        return file_out.file_size, modified_at
+
+    def _lookup(
+        self, file_out: schemas.FileOut
+    ) -> Tuple[bool, Optional[schemas.MediaInformation]]:
+        cached = self._cache.get(str(file_out.file_path))
+        if cached is None or cached[0] != self._cache_key(file_out):
+            return False, None
+        return True, cached[1]
+
+    def enqueue(self, files: List[schemas.FileOut], priority: int) -> None:
+        """Schedules files without fresh metadata for probing"""
+        if self._queue is None:
+            return
+        for file_out in files:
+            file_path = str(file_out.file_path)
+            queued_priority = self._queued.get(file_path)
+            if queued_priority is not None and queued_priority <= priority:
+                continue
+            if self._lookup(file_out)[0]:
+                continue
+            self._queued[file_path] = priority
+            self._queue.put_nowait((priority, next(self._counter), file_out))
+
+    def annotate(self, files: List[schemas.FileOut]) -> List[schemas.FileOut]:
+        """Attaches known metadata without waiting, unknown files are probed next
+
+        Args:
+            files (List[schemas.FileOut]): catalog entries
+
+        Returns:
+            List[schemas.FileOut]: copies with media fields filled in where known
+        """
+        annotated, missing = [], []
+        for file_out in files:
+            probed, media = self._lookup(file_out)
+            if not probed:
+                missing.append(file_out)
+            annotated.append(
+                file_out.model_copy(update={"media": media, "media_probed": probed})
+            )
+        self.enqueue(missing, PRIORITY_REQUESTED)
+        return annotated
+
+    def prune(self, file_paths: Set[str]) -> None:
+        """Drops cached metadata of files no longer in the catalog"""
+        for file_path in set(self._cache) - file_paths:
+            self._cache.pop(file_path, None)
+
+    async def _worker(self) -> None:
+        while True:
+            _, _, file_out = await self._queue.get()
+            file_path = str(file_out.file_path)
+            try:
+                self._queued.pop(file_path, None)
+                if self._lookup(file_out)[0]:
+                    continue
+                media = await asyncio.to_thread(
+                    probe_media_file, file_path, self.timeout
+                )
+                self._cache[file_path] = (self._cache_key(file_out), media)
+            except Exception as e:
+                print(f"Error probing {file_path}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def run(self, catalog: FileCatalog, interval: float) -> None:
+        """Probes every catalog file once, then new and changed files as they appear"""
+        self._queue = asyncio.PriorityQueue()
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        try:
+            while True:
+                if catalog.is_ready:
+                    _, files = catalog.list_files()
+                    self.prune({str(f.file_path) for f in files})
+                    self.enqueue(files, PRIORITY_BACKGROUND)
+                await asyncio.sleep(interval)
+        except asyncio.CancelledError:
+            print("Media prober cancelled")
+        finally:
+            for worker in workers:
+                worker.cancel()
+            self._queue = None
+            self._queued = dict()
+
+
+MEDIA_PROBER = MediaProber(
+    concurrency=settings.MEDIA_PROBE_CONCURRENCY,
+    timeout=settings.MEDIA_PROBE_TIMEOUT_SECONDS,
+)
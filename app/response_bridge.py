@@ -0,0 +1,335 @@
+import re
+import uuid
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+
+from db import AsyncRedisClient
+from settings import settings
+
+_STREAM_ID_PATTERN = re.compile(r'^\{"stream_id": "([0-9]+-[0-9]+)"')
+
+
+def get_response_queue_name(task_uuid: str) -> str:
+    return f"task:{task_uuid}:response"
+
+
+def get_response_stream_name(task_uuid: str) -> str:
+    return f"task:{task_uuid}:responses"
+
+
+def get_request_stream_name(task_uuid: str) -> str:
+    return f"task:{task_uuid}:requests"
+
+
+def parse_stream_id(stream_id: str) -> Tuple[int, int]:
+    """Orderable form of a stream entry id, raises ValueError when malformed"""
+    milliseconds, _, sequence = stream_id.partition("-")
+    return int(milliseconds), int(sequence or 0)
+
+
+def add_stream_id(data: str, stream_id: str) -> str:
+    """Adds the entry id to a worker response, clients resume from it
+
+    The response is not parsed, the id is spliced in as its first key.
+    """
+    if not data.startswith("{"):
+        return data
+    body = data[1:].lstrip()
+    separator = "" if body.startswith("}") else ", "
+    return f'{{"stream_id": "{stream_id}"{separator}{body}'
+
+
+def get_stream_id(data: str) -> Optional[str]:
+    """Entry id add_stream_id put in a response, None for list responses"""
+    match = _STREAM_ID_PATTERN.match(data)
+    return match.group(1) if match else None
+
+
+async def read_responses_after(
+    client: aioredis.Redis, task_uuid: str, last_id: str, batch_size: int = 100
+) -> List[Tuple[str, str]]:
+    """Responses of the task added after last_id, oldest first
+
+    Returns:
+        List[Tuple[str, str]]: entry ids and responses with their "stream_id"
+    """
+    responses = []
+    while True:
+        entries = await client.xrange(
+            get_response_stream_name(task_uuid), min=f"({last_id}", count=batch_size
+        )
+        for entry_id, fields in entries:
+            last_id = entry_id.decode("utf-8")
+            if b"data" in fields:
+                responses.append(
+                    (last_id, add_stream_id(fields[b"data"].decode("utf-8"), last_id))
+                )
+        if len(entries) < batch_size:
+            return responses
+
+
+async def read_last_response_id(client: aioredis.Redis, task_uuid: str) -> str:
+    """Id of the newest response of the task, "0-0" if there is none"""
+    entries = await client.xrevrange(get_response_stream_name(task_uuid), count=1)
+    return entries[0][0].decode("utf-8") if entries else "0-0"
+
+
+class ResponseBridge:
+    """Delivers SAM2 worker responses to the websockets of this process.
+
+    A single BRPOP on one connection waits on the response lists of every
+    task with an open websocket, instead of every socket polling its list.
+    Responses are delivered as soon as they are pushed, and an idle socket
+    costs no redis round trips.
+    Subscription changes push to a wake list of this process that is part
+    of the same BRPOP, so the watched lists are updated at once.
+    """
+
+    resumable = False
+
+    def __init__(self, block_timeout: float = 5, batch_size: int = 100) -> None:
+        self.block_timeout = block_timeout
+        self.batch_size = max(batch_size, 1)
+        self.wake_key = f"ws:bridge:{uuid.uuid4()}:wake"
+
+        self._subscribers: Dict[str, List[asyncio.Queue]] = dict()
+        self._client: Optional[aioredis.Redis] = None
+
+    async def _wake(self) -> None:
+        if self._client is None:
+            return
+        pipeline = self._client.pipeline(transaction=False)
+        pipeline.lpush(self.wake_key, 1)
+        # left behind if the process dies before popping it
+        pipeline.expire(self.wake_key, 60)
+        await pipeline.execute()
+
+    async def subscribe(
+        self, task_uuid: str, queue: asyncio.Queue, last_id: Optional[str] = None
+    ) -> None:
+        """Puts responses of the task into the queue until unsubscribed
+
+        Popped responses cannot be replayed, last_id is ignored.
+        """
+        queue_name = get_response_queue_name(task_uuid)
+        subscribers = self._subscribers.setdefault(queue_name, list())
+        subscribers.append(queue)
+        if len(subscribers) == 1:
+            await self._wake()
+
+    async def unsubscribe(self, task_uuid: str, queue: asyncio.Queue) -> None:
+        queue_name = get_response_queue_name(task_uuid)
+        subscribers = self._subscribers.get(queue_name, list())
+        if queue in subscribers:
+            subscribers.remove(queue)
+        if not subscribers and self._subscribers.pop(queue_name, None) is not None:
+            # stop popping responses nobody here waits for
+            await self._wake()
+
+    async def _dispatch(self, queue_name: str, values: List[bytes]) -> None:
+        subscribers = self._subscribers.get(queue_name)
+        if not subscribers:
+            # the socket closed while the pop was in flight, keep the order
+            await self._client.rpush(queue_name, *reversed(values))
+            return
+        for value in values:
+            data = value.decode("utf-8")
+            for queue in subscribers:
+                queue.put_nowait(data)
+
+    async def run(self, redis_client: AsyncRedisClient) -> None:
+        """Pops responses of subscribed tasks and hands them to their queues
+
+        Args:
+            redis_client (AsyncRedisClient): client of the app, the blocking pop
+                holds one connection of its pool while the bridge runs
+        """
+        self._client = redis_client.client
+        try:
+            while True:
+                try:
+                    popped = await self._client.brpop(
+                        [self.wake_key, *self._subscribers],
+                        timeout=self.block_timeout,
+                    )
+                    if popped is None:
+                        continue
+                    queue_name, value = popped[0].decode("utf-8"), popped[1]
+                    if queue_name == self.wake_key:
+                        continue
+                    values = [value]
+                    if self.batch_size > 1:
+                        # drain a burst without a round trip per response
+                        values += (
+                            await self._client.rpop(queue_name, self.batch_size - 1)
+                            or []
+                        )
+                    await self._dispatch(queue_name, values)
+                except RedisError as e:
+                    print(f"Error in response bridge: {e}")
+                    await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            print("Response bridge cancelled")
+        finally:
+            self._client = None
+
+
+class StreamResponseBridge:
+    """Delivers SAM2 worker responses from the response streams of the tasks.
+
+    Stream entries are not consumed: every socket keeps the id of the last
+    response it received, and a socket reconnecting with that id is first
+    replayed the responses it missed, without running inference again.
+    A single XREAD on one connection waits on the streams of every task with
+    an open websocket. Subscriptions are attached by the read loop itself,
+    after a wake entry is added to a stream of this process that is part of
+    the same XREAD, so replayed and live responses are never interleaved.
+    """
+
+    resumable = True
+
+    def __init__(self, block_timeout: float = 5, batch_size: int = 100) -> None:
+        self.block_timeout = block_timeout
+        self.batch_size = max(batch_size, 1)
+        self.wake_key = f"ws:bridge:{uuid.uuid4()}:wake"
+
+        # id of the last response every queue received, per stream
+        self._subscribers: Dict[str, Dict[asyncio.Queue, str]] = dict()
+        # id of the last entry read, per stream
+        self._cursors: Dict[str, str] = dict()
+        self._pending: List[Tuple[str, asyncio.Queue, Optional[str]]] = list()
+        self._client: Optional[aioredis.Redis] = None
+
+    async def _wake(self) -> None:
+        if self._client is None:
+            return
+        pipeline = self._client.pipeline(transaction=False)
+        pipeline.xadd(self.wake_key, {"wake": 1}, maxlen=10, approximate=False)
+        # left behind if the process dies before reading it
+        pipeline.expire(self.wake_key, 60)
+        await pipeline.execute()
+
+    async def subscribe(
+        self, task_uuid: str, queue: asyncio.Queue, last_id: Optional[str] = None
+    ) -> None:
+        """Puts responses of the task into the queue until unsubscribed
+
+        Args:
+            task_uuid (str): task of the responses
+            queue (asyncio.Queue): receives the responses, with their "stream_id"
+            last_id (Optional[str], optional): id of the last response the client
+                received, the responses after it are replayed first.
+                Defaults to None, only new responses.
+
+        Raises:
+            ValueError: last_id is not a stream entry id
+        """
+        if last_id is not None:
+            parse_stream_id(last_id)
+        self._pending.append((task_uuid, queue, last_id))
+        await self._wake()
+
+    async def unsubscribe(self, task_uuid: str, queue: asyncio.Queue) -> None:
+        stream_name = get_response_stream_name(task_uuid)
+        self._pending = [
+            pending for pending in self._pending if pending[1] is not queue
+        ]
+        subscribers = self._subscribers.get(stream_name, dict())
+        subscribers.pop(queue, None)
+        if not subscribers:
+            # the next read leaves the stream out
+            self._subscribers.pop(stream_name, None)
+            self._cursors.pop(stream_name, None)
+
+    async def _attach(
+        self, task_uuid: str, queue: asyncio.Queue, last_id: Optional[str]
+    ) -> None:
+        stream_name = get_response_stream_name(task_uuid)
+        if last_id is None:
+            last_id = self._cursors.get(stream_name) or await read_last_response_id(
+                self._client, task_uuid
+            )
+        else:
+            for last_id, data in await read_responses_after(
+                self._client, task_uuid, last_id, self.batch_size
+            ):
+                queue.put_nowait(data)
+        self._subscribers.setdefault(stream_name, dict())[queue] = last_id
+        # entries up to the replayed id are skipped for this queue on dispatch
+        self._cursors.setdefault(stream_name, last_id)
+
+    async def _dispatch(self, stream_name: str, entries: List) -> None:
+        subscribers = self._subscribers.get(stream_name)
+        if not subscribers:
+            return
+        for entry_id, fields in entries:
+            entry_id = entry_id.decode("utf-8")
+            if b"data" not in fields:
+                continue
+            data = add_stream_id(fields[b"data"].decode("utf-8"), entry_id)
+            entry_key = parse_stream_id(entry_id)
+            for queue, last_id in subscribers.items():
+                if entry_key > parse_stream_id(last_id):
+                    queue.put_nowait(data)
+                    subscribers[queue] = entry_id
+
+    async def run(self, redis_client: AsyncRedisClient) -> None:
+        """Reads responses of subscribed tasks and hands them to their queues
+
+        Args:
+            redis_client (AsyncRedisClient): client of the app, the blocking read
+                holds one connection of its pool while the bridge runs
+        """
+        self._client = redis_client.client
+        wake_cursor = "0-0"
+        try:
+            while True:
+                try:
+                    while self._pending:
+                        await self._attach(*self._pending[0])
+                        self._pending.pop(0)
+                    streams = {self.wake_key: wake_cursor}
+                    streams.update(
+                        (stream_name, self._cursors[stream_name])
+                        for stream_name in self._subscribers
+                    )
+                    read = await self._client.xread(
+                        streams,
+                        count=self.batch_size,
+                        block=int(self.block_timeout * 1000),
+                    )
+                    for stream_name, entries in read or []:
+                        stream_name = stream_name.decode("utf-8")
+                        last_entry_id = entries[-1][0].decode("utf-8")
+                        if stream_name == self.wake_key:
+                            wake_cursor = last_entry_id
+                            continue
+                        if stream_name in self._cursors:
+                            self._cursors[stream_name] = last_entry_id
+                        await self._dispatch(stream_name, entries)
+                except RedisError as e:
+                    print(f"Error in response bridge: {e}")
+                    await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            print("Response bridge cancelled")
+        finally:
+            self._client = None
+
+
+def create_response_bridge(config=settings):
+    """Bridge of the configured task channel transport, "stream" or "list" """
+    if config.TASK_CHANNEL_TRANSPORT == "list":
+        return ResponseBridge(
+            block_timeout=config.RESPONSE_BRIDGE_BLOCK_TIMEOUT_SECONDS,
+            batch_size=config.RESPONSE_BRIDGE_BATCH_SIZE,
+        )
+    return StreamResponseBridge(
+        block_timeout=config.RESPONSE_BRIDGE_BLOCK_TIMEOUT_SECONDS,
+        batch_size=config.RESPONSE_BRIDGE_BATCH_SIZE,
+    )
+
+
+RESPONSE_BRIDGE = create_response_bridge()
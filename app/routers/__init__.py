@@ -2,4 +2,5 @@ from .video import router as video_router
 from .ai_models import router as ai_model_router
 from .files import router as files_router
 from .frames import router as frames_router
-from .task import router as task_router
\ No newline at end of file
+from .task import router as task_router
+from .playback import router as playback_router
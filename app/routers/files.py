@@ -2,10 +2,19 @@ import os
 import uuid
 import shutil
 import asyncio
-from typing import List, Dict, Optional, Union
+from typing import List, Dict, Optional, Union, Literal
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Header
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    status,
+    BackgroundTasks,
+    Header,
+    Query,
+    Response,
+)
 from fastapi.responses import StreamingResponse
 
 import schemas
@@ -15,6 +24,8 @@ from utils import get_video_information
 from settings import settings
 from enums import VideoStatusEnum
 from background_tasks import extract_frames, convert_video_to_mp4
+from ..file_catalog import FILE_CATALOG, SortKey
+from ..media_prober import MEDIA_PROBER
 
 
 router = APIRouter(prefix="/files", tags=["files"])
@@ -36,28 +47,41 @@ def get_file_paths_in_directory(directory: str) -> List[str]:
     response_model=List[schemas.FileOut],
     status_code=status.HTTP_200_OK,
 )
-async def get_available_files() -> List[schemas.FileOut]:
-    final_file_names = []
-    # get all file absolute paths including subdirectories
-    for root, dirs, filenames in os.walk(settings.USER_FILES_DIRECTORY):
-        final_file_names.extend([os.path.abspath(os.path.join(root, filename)) for filename in filenames])
-        
-        #for d in dirs:
-        #    final_file_names.extend(get_file_paths_in_directory(os.path.join(root, d)))
-            
-            
-    out = []
-    for abs_file_path in final_file_names:
-        file_size = os.path.getsize(abs_file_path)
-        out.append(
-            schemas.FileOut(
-                file_name=os.path.basename(abs_file_path),
-                file_path=abs_file_path,
-                file_size=file_size,
-                created_at=datetime.fromtimestamp(os.path.getctime(abs_file_path))
-            )
-        )
-    
-    return out
-
-            
+async def get_available_files(
+    response: Response,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    extensions: Optional[str] = None,
+    sort_by: SortKey = "file_name",
+    order: Literal["asc", "desc"] = "asc",
+) -> List[schemas.FileOut]:
+    """Returns files under the user files directory from the file catalog
+
+    Media metadata is attached when already probed, it never waits for ffprobe.
+    Files without metadata are probed next, clients can poll for it.
+
+    Args:
+        offset (int, optional): number of files to skip. Defaults to 0.
+        limit (Optional[int], optional): page size, all files if not given.
+        extensions (Optional[str], optional): comma separated extensions, e.g. "mp4,mkv"
+        sort_by (SortKey, optional): sort field. Defaults to "file_name".
+        order (Literal["asc", "desc"], optional): sort order. Defaults to "asc".
+
+    Returns:
+        List[schemas.FileOut]: page of files, total count is in Total-Files header
+    """
+    await FILE_CATALOG.ensure_ready()
+    extension_filter = (
+        {e.strip().lstrip(".").lower() for e in extensions.split(",") if e.strip()}
+        if extensions
+        else None
+    )
+    total_count, files = FILE_CATALOG.list_files(
+        offset=offset,
+        limit=limit,
+        extensions=extension_filter,
+        sort_by=sort_by,
+        descending=order == "desc",
+    )
+    response.headers["Total-Files"] = str(total_count)
+    return MEDIA_PROBER.annotate(files)
@@ -19,12 +19,19 @@ from fastapi import (
     Response,
 )
 from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from db.redis_client import get_redis_client
 import schemas
 import database_models as dbmodels
-from db import get_db
-from utils import get_video_information, get_frame_count_by_duration
+from db import get_async_db, get_async_redis_client, AsyncRedisClient
+from utils import (
+    get_video_information,
+    get_frame_count_by_duration,
+    get_frame_mapping,
+    get_original_frame_number,
+    get_extracted_frame_count,
+)
 from settings import settings
 from enums import VideoStatusEnum
 
@@ -40,11 +47,13 @@ async def get_frame_by_number(
     video_id: str,
     frame_number: int,
     scale: float = 1,
-    db=Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> Response:
     video: Optional[dbmodels.Video] = (
-        db.query(dbmodels.Video).filter_by(video_id=video_id).first()
-    )
+        await db.scalars(
+            select(dbmodels.Video).filter_by(video_id=video_id, is_active=True)
+        )
+    ).first()
     # check if video exists
     if not video:
         raise HTTPException(
@@ -52,10 +61,7 @@ async def get_frame_by_number(
             detail="Video not found",
         )
 
-    # TODO: total frame count migrated to be in the db -> use that instead (after fulll migration)
-    total_frame_count = get_frame_count_by_duration(
-        duration=video.video_duration, fps=video.video_fps  # type: ignore
-    )
+    total_frame_count = get_extracted_frame_count(video)
     # check if frame number is out of range
     if frame_number < 0 or frame_number >= total_frame_count:
         raise HTTPException(
@@ -85,8 +91,13 @@ async def get_frame_by_number(
         with open(frame_path, "rb") as file:
             image_in_bytes = file.read()
 
+    original_frame_number = get_original_frame_number(
+        frame_number, get_frame_mapping(video)
+    )
+
     headers = {
         "Requested-Frame-Number": str(frame_number),
+        "Original-Frame-Number": str(original_frame_number),
         "Total-Frames": str(total_frame_count),
         "Frame-Scale": str(scale),
         "Image-Widht": str(image.width),
@@ -155,12 +166,14 @@ async def get_all_frames(
     start_frame: int = 0,
     end_frame: Optional[int] = None,
     thumbnail: bool = False,
-    db=Depends(get_db),
-    rcli=Depends(get_redis_client),
+    db: AsyncSession = Depends(get_async_db),
+    rcli: AsyncRedisClient = Depends(get_async_redis_client),
 ) -> Response:
     video: Optional[dbmodels.Video] = (
-        db.query(dbmodels.Video).filter_by(video_id=video_id).first()
-    )
+        await db.scalars(
+            select(dbmodels.Video).filter_by(video_id=video_id, is_active=True)
+        )
+    ).first()
     # check if video exists
     if not video:
         raise HTTPException(
@@ -168,12 +181,7 @@ async def get_all_frames(
             detail="Video not found",
         )
 
-    if video.frame_count is not None:
-        total_frame_count = int(video.frame_count)  # type: ignore
-    else:
-        total_frame_count = get_frame_count_by_duration(
-            duration=video.video_duration, fps=video.video_fps  # type: ignore
-        )
+    total_frame_count = get_extracted_frame_count(video)
 
     if start_frame < 0 or start_frame > total_frame_count:
         raise HTTPException(
@@ -192,7 +200,7 @@ async def get_all_frames(
         )
 
     print("Checking cache")
-    is_cached = rcli.get_json(f"frames:{video_id}:{start_frame}:{end_frame}:{scale}")
+    is_cached = await rcli.get_json(f"frames:{video_id}:{start_frame}:{end_frame}:{scale}")
 
     thumbnail_image = None
     if thumbnail:  # FIXME: thumbnail is not caching
@@ -233,17 +241,21 @@ async def get_all_frames(
 
     frames_data = await asyncio.gather(*tasks)
 
+    frame_mapping = get_frame_mapping(video)
     for frame_number, frame_data in enumerate(frames_data, start=start_frame):
         frames.append(
             {
                 "frame_number": frame_number,
+                "original_frame_number": get_original_frame_number(
+                    frame_number, frame_mapping
+                ),
                 "image_base64": frame_data["image_base64"],
             }
         )
 
     if not is_cached:
         print("Adding to cache")
-        rcli.add_json(
+        await rcli.add_json(
             f"frames:{video_id}:{start_frame}:{end_frame}:{scale}",
             {
                 "frames": frames,
@@ -0,0 +1,108 @@
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi.responses import FileResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import database_models as dbmodels
+from db import get_async_db
+from settings import settings
+from background_tasks import MASTER_PLAYLIST_NAME
+
+router = APIRouter(prefix="/playback", tags=["playback"])
+
+MEDIA_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".m4s": "video/iso.segment",
+    ".mp4": "video/mp4",
+}
+
+# segments never change for a packaged video, playlists are VOD but kept short
+# in case a video is re-packaged with different renditions
+SEGMENT_CACHE_CONTROL = "public, max-age=31536000, immutable"
+PLAYLIST_CACHE_CONTROL = "public, max-age=60"
+
+
+async def _get_segments_path(video_id: int, db: AsyncSession) -> str:
+    video: Optional[dbmodels.Video] = (
+        await db.scalars(
+            select(dbmodels.Video).filter_by(video_id=video_id, is_active=True)
+        )
+    ).first()
+    if not video:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Video not found",
+        )
+    if not video.segments_path:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Video is not packaged for segmented playback yet",
+        )
+    return str(video.segments_path)
+
+
+@router.get(
+    "/{video_id}/master.m3u8",
+    status_code=status.HTTP_200_OK,
+)
+async def get_master_playlist(
+    video_id: int, db: AsyncSession = Depends(get_async_db)
+) -> Response:
+    return await get_playback_file(video_id, MASTER_PLAYLIST_NAME, db=db)
+
+
+@router.get(
+    "/{video_id}/{file_path:path}",
+    status_code=status.HTTP_200_OK,
+)
+async def get_playback_file(
+    video_id: int, file_path: str, db: AsyncSession = Depends(get_async_db)
+) -> Response:
+    """Serves HLS playlists, init segments and media segments of a video
+
+    Args:
+        video_id (int): video id
+        file_path (str): path relative to the master playlist
+        db (AsyncSession, optional): DB Session. Defaults to Depends(get_async_db).
+
+    Returns:
+        Response: file response with long cache lifetime for segments
+    """
+    segments_path = os.path.realpath(await _get_segments_path(video_id, db))
+    requested_path = os.path.realpath(os.path.join(segments_path, file_path))
+    # do not let relative paths escape the video segments directory
+    if os.path.commonpath([segments_path, requested_path]) != segments_path:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found",
+        )
+
+    extension = os.path.splitext(requested_path)[1]
+    if extension not in MEDIA_TYPES or not os.path.isfile(requested_path):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found",
+        )
+
+    headers = {
+        "Cache-Control": (
+            PLAYLIST_CACHE_CONTROL if extension == ".m3u8" else SEGMENT_CACHE_CONTROL
+        ),
+        "X-Stream": "true",
+    }
+    if settings.STREAM_ACCEL_REDIRECT_PREFIX:
+        # reverse proxy serves the file itself with sendfile
+        relative_path = os.path.relpath(
+            requested_path, os.path.realpath(settings.SEGMENTED_VIDEO_DIRECTORY)
+        )
+        headers["X-Accel-Redirect"] = (
+            f"{settings.STREAM_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{relative_path}"
+        )
+        return Response(media_type=MEDIA_TYPES[extension], headers=headers)
+
+    return FileResponse(
+        requested_path, media_type=MEDIA_TYPES[extension], headers=headers
+    )
@@ -6,7 +6,7 @@ import shutil
 import asyncio
 
 from datetime import datetime, timezone
-from typing import List, Dict, Optional, Union, Any, Literal
+from typing import List, Dict, Optional, Union, Any, Literal, Iterator
 
 from fastapi import (
     APIRouter,
@@ -15,42 +15,54 @@ from fastapi import (
     WebSocketException,
     status,
     BackgroundTasks,
+    Query,
     Response,
     WebSocket,
     WebSocketDisconnect,
 )
+from fastapi.responses import StreamingResponse
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from redis.exceptions import RedisError
 
 
 import enums
 from enums import annotation
 import schemas
+import exporters
 import database_models as dbmodels
 
-from db import get_db, get_redis_client, RedisClient
+from db import get_async_db, get_redis_client, get_async_redis_client, AsyncRedisClient
 from schemas.annotation import ImageAnnotation
-from utils import validate_request
+from utils import (
+    validate_request_json,
+    get_frame_mapping,
+    get_original_frame_number,
+    get_extracted_frame_count,
+    iter_annotation_records,
+    load_image_annotation,
+    decode_annotation_json,
+    simplify_annotation,
+    get_annotation_records,
+    get_annotation_key,
+    AnnotationStore,
+)
 from settings import settings
-from ..websocket_manager import WebSocketManager
+from background_tasks import create_export_job, get_export_job, ANNOTATION_INDEXER
+from ..websocket_manager import WSMANAGER
+from ..websocket_queue import ClientTooSlowError, ConnectionQueue
+from ..task_hub import TASK_HUBS, HubMember
 from ..exceptions import CustomHTTPException
 
 from .frames import get_all_frames
 
-WSMANAGER = WebSocketManager()
-
 REDIS_MANAGER_QUEUE_NAME = os.environ.get("REDIS_MANAGER_QUEUE_NAME")
 if not REDIS_MANAGER_QUEUE_NAME:
     raise Exception("REDIS_MANAGER_QUEUE_NAME environment variable not found")
 else:
     REDIS_MANAGER_QUEUE_NAME = str(REDIS_MANAGER_QUEUE_NAME)
 
-MAX_SAM2_MODEL_INSTANCES = os.environ.get("MAX_SAM2_MODEL_INSTANCES")
-if not MAX_SAM2_MODEL_INSTANCES:
-    raise Exception("MAX_SAM2_MODEL_INSTANCES environment variable not found")
-else:
-    MAX_SAM2_MODEL_INSTANCES = int(MAX_SAM2_MODEL_INSTANCES)
-
 router = APIRouter(prefix="/tasks", tags=["tasks"])
 
 
@@ -61,11 +73,10 @@ router = APIRouter(prefix="/tasks", tags=["tasks"])
 )
 async def get_task_status(
     task_uuid: str,
-    db: Session = Depends(get_db),
-    rcli: RedisClient = Depends(get_redis_client),
+    rcli: AsyncRedisClient = Depends(get_async_redis_client),
 ) -> schemas.TaskStatusResponseCover:
     # get task status from redis
-    task_status = rcli.get(f"task:{task_uuid}:status")
+    task_status = await rcli.get(f"task:{task_uuid}:status")
     if not task_status:
         raise CustomHTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -85,24 +96,35 @@ async def get_task_status(
     response_model_exclude_unset=True,
 )
 async def get_all_tasks(
-    db: Session = Depends(get_db),
-    rcli: RedisClient = Depends(get_redis_client),
+    response: Response,
+    task_status: Optional[enums.TaskStatusEnum] = Query(None, alias="status"),
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    rcli: AsyncRedisClient = Depends(get_async_redis_client),
 ) -> Dict[str, schemas.TaskStatusResponseCover]:
-    # get all tasks from redis
-    task_keys = rcli.get_keys_with_pattern("task:*:status")
-    # filter out task keys
-    task_keys = [key for key in task_keys if len(key.split(":")) == 3]
-    tasks = dict()
-    for uuid in task_keys:
-        # get status of task
-        task_status = rcli.get(uuid)
-        if not task_status:
-            continue
-        tasks[uuid.split(":")[1]] = schemas.TaskStatusResponseCover(
-            data=schemas.TaskStatus(status=task_status),  # type: ignore
-        )
+    """Lists tasks newest first from the task registry
 
-    return tasks
+    Args:
+        task_status (Optional[enums.TaskStatusEnum], optional): only tasks with this status
+        offset (int, optional): number of tasks to skip. Defaults to 0.
+        limit (Optional[int], optional): page size, all tasks if not given.
+
+    Returns:
+        Dict[str, schemas.TaskStatusResponseCover]: statuses by task uuid,
+            total count is in Total-Tasks header
+    """
+    total_count, tasks = await rcli.list_tasks(
+        task_status=task_status.value if task_status else None,
+        offset=offset,
+        limit=limit,
+    )
+    response.headers["Total-Tasks"] = str(total_count)
+    return {
+        task_uuid: schemas.TaskStatusResponseCover(
+            data=schemas.TaskStatus(status=status_value),  # type: ignore
+        )
+        for task_uuid, status_value in tasks
+    }
 
 
 @router.get(
@@ -111,9 +133,13 @@ async def get_all_tasks(
 )
 async def get_task_information(
     task_uuid: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> schemas.TaskInformationOutputCover:
-    task = db.query(dbmodels.Task).filter(dbmodels.Task.task_uuid == task_uuid).first()
+    task = (
+        await db.scalars(
+            select(dbmodels.Task).filter(dbmodels.Task.task_uuid == task_uuid)
+        )
+    ).first()
     if not task:
         raise CustomHTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -130,12 +156,12 @@ async def get_task_information(
     "/",
 )
 async def delete_all_tasks(
-    db: Session = Depends(get_db),
-    rcli: RedisClient = Depends(get_redis_client),
+    db: AsyncSession = Depends(get_async_db),
+    rcli: AsyncRedisClient = Depends(get_async_redis_client),
 ) -> Response:
     # get all tasks
-    tasks: Dict[str, schemas.TaskStatusResponseCover] = await get_all_tasks(db, rcli)
-    for task in tasks:
+    _, tasks = await rcli.list_tasks()
+    for task, _ in tasks:
         # delete task
         try:
             is_deleted = await terminate_task(task, rcli=rcli, db=db)
@@ -152,11 +178,11 @@ async def delete_all_tasks(
 async def reset_task(
     task_uuid: str,
     scale: Optional[float] = None,
-    db: Session = Depends(get_db),
-    rcli: RedisClient = Depends(get_redis_client),
+    db: AsyncSession = Depends(get_async_db),
+    rcli: AsyncRedisClient = Depends(get_async_redis_client),
 ) -> Any:
     # check task exists
-    task_status = rcli.get(f"task:{task_uuid}:status")
+    task_status = await rcli.get(f"task:{task_uuid}:status")
     # TODO: Task checks will be transfered to db
     if not task_status:
         raise CustomHTTPException(
@@ -175,14 +201,13 @@ async def reset_task(
             ).model_dump(),
         )
 
-    rcli.set(f"task:{task_uuid}:status", enums.TaskStatusEnum.BUSY.value)
+    await rcli.set_task_status(task_uuid, enums.TaskStatusEnum.BUSY.value)
     # reset task body
     req = schemas.ResetTaskInputCover(
         msg_type="reset",
     )
-    is_published = rcli.queue(
-        queue_name=f"task:{task_uuid}:request",
-        value=req.model_dump_json(),
+    is_published = await rcli.publish_task_request(
+        task_uuid, req.model_dump_json()
     )
     if not is_published:
         raise CustomHTTPException(
@@ -196,7 +221,7 @@ async def reset_task(
         return Response(status_code=status.HTTP_202_ACCEPTED)
 
     # get task config to get video_id
-    task_config = rcli.get(f"task:{task_uuid}:config")
+    task_config = await rcli.get(f"task:{task_uuid}:config")
     if not task_config:
         raise CustomHTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -240,14 +265,17 @@ async def reset_task(
 
 async def _initialize_task(
     init_request: schemas.InitModelRequest,
-    db,
-    rcli: RedisClient,
+    db: AsyncSession,
+    rcli: AsyncRedisClient,
+    task_uuid: str,
 ) -> Optional[schemas.InitilizeModelResponseCover]:
     aimodel = (
-        db.query(dbmodels.AiModel)
-        .filter(dbmodels.AiModel.ai_model_id == init_request.ai_model_id)
-        .first()
-    )
+        await db.scalars(
+            select(dbmodels.AiModel).filter(
+                dbmodels.AiModel.ai_model_id == init_request.ai_model_id
+            )
+        )
+    ).first()
     if not aimodel:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -255,10 +283,13 @@ async def _initialize_task(
         )
 
     video = (
-        db.query(dbmodels.Video)
-        .filter(dbmodels.Video.video_id == init_request.video_id)
-        .first()
-    )
+        await db.scalars(
+            select(dbmodels.Video).filter(
+                dbmodels.Video.video_id == init_request.video_id,
+                dbmodels.Video.is_active.is_(True),
+            )
+        )
+    ).first()
     if not video:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -272,67 +303,56 @@ async def _initialize_task(
             detail=f"Video with id {init_request.video_id} is not ready for inference",
         )
 
-    # check model initialization count
-    # model_init_count = rcli.get(f"model:{aimodel.ai_model_id}:init_count")
-    try:
-        model_init_count = int(rcli.get("sam2-instances"))  # type: ignore
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Model initialization count not found. Check redis confiuguration",
-        )
-
+    # one lease per task, counted atomically across API replicas
     try:
-        max_model_init_count = int(rcli.get("max-sam2-instances"))  # type: ignore
-    except Exception as e:
+        is_leased, _ = await rcli.acquire_sam2_lease(task_uuid)
+    except RedisError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Maximum model initialization count not found. Check redis confiuguration",
+            detail=f"Error acquiring model lease: {e}",
         )
 
-    if model_init_count >= max_model_init_count:
+    if not is_leased:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"Model {aimodel.ai_model_id} has reached maximum initialization count",
         )
     else:
-        model_init_count = int(model_init_count)
-        # TODO: Initialize model exactly
-
+        # the lease is released only while the worker surely has not received
+        # INIT_MODEL, a lease of an unknown outcome expires unless a worker renews it
+        is_publishing = False
         try:
-            rcli.set("sam2-instances", model_init_count + 1)
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Error updating model initialization count: {e}",
+            task_intercom = schemas.Intercom(
+                task_type=enums.Task.INIT_MODEL.value,
+                task=schemas.InitModelIntercom(
+                    ai_model=aimodel,
+                    video=video,
+                ),
+                uuid=task_uuid,
             )
 
-        task_uuid = str(uuid.uuid4())
-        task_intercom = schemas.Intercom(
-            task_type=enums.Task.INIT_MODEL.value,
-            task=schemas.InitModelIntercom(
-                ai_model=aimodel,
-                video=video,
-            ),
-            uuid=task_uuid,
-        )
-
-        # is_published = rcli.queue(
-        #    str(REDIS_MANAGER_QUEUE_NAME), task_intercom.model_dump_json()
-        # )
-        # change list add to stream
-        is_published = rcli.stream_add(
-            stream_name=settings.REDIS_MANAGER_STREAM_NAME,
-            data={"task_uuid": task_uuid, "data": task_intercom.model_dump_json()},
-        )
+            # is_published = rcli.queue(
+            #    str(REDIS_MANAGER_QUEUE_NAME), task_intercom.model_dump_json()
+            # )
+            # change list add to stream
+            is_publishing = True
+            is_published = await rcli.stream_add(
+                stream_name=settings.REDIS_MANAGER_STREAM_NAME,
+                data={"task_uuid": task_uuid, "data": task_intercom.model_dump_json()},
+            )
+        except Exception:
+            if not is_publishing:
+                await rcli.release_sam2_lease(task_uuid)
+            raise
 
         if not is_published:
+            await rcli.release_sam2_lease(task_uuid)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Error publishing task to queue",
             )
 
-        is_config_set = rcli.set(
+        is_config_set = await rcli.set(
             f"task:{task_uuid}:config", task_intercom.model_dump_json()
         )
         if not is_config_set:
@@ -341,8 +361,8 @@ async def _initialize_task(
                 detail=f"Error setting task config",
             )
 
-        is_published = rcli.set(
-            f"task:{task_uuid}:status", enums.TaskStatusEnum.PENDING.value
+        is_published = await rcli.register_task(
+            task_uuid, enums.TaskStatusEnum.PENDING.value
         )
 
         if not is_published:
@@ -351,7 +371,7 @@ async def _initialize_task(
                 detail=f"Error setting task status",
             )
 
-        is_published = rcli.set(
+        is_published = await rcli.set(
             f"task:{task_uuid}:annotation:status",
             enums.AnnotationStatusEnum.WAITING.value,
         )
@@ -361,6 +381,12 @@ async def _initialize_task(
                 detail=f"Error setting task annotation status",
             )
 
+        if init_request.polygon_simplification is not None:
+            await rcli.set(
+                f"task:{task_uuid}:polygon_simplification",
+                init_request.polygon_simplification.model_dump_json(),
+            )
+
         return schemas.InitilizeModelResponseCover(data=task_intercom)
 
 
@@ -371,18 +397,21 @@ async def _initialize_task(
 )
 async def initialize_task(
     init_request: schemas.InitModelRequest,
-    db=Depends(get_db),
-    rcli=Depends(get_redis_client),
+    db: AsyncSession = Depends(get_async_db),
+    rcli: AsyncRedisClient = Depends(get_async_redis_client),
 ) -> Optional[schemas.InitilizeModelResponseCover]:
     lock = rcli.get_lock("model-init-lock")
+    task_uuid = str(uuid.uuid4())
     try:
-        is_acquired = lock.acquire(blocking=False, blocking_timeout=1)
+        is_acquired = await lock.acquire(blocking=False, blocking_timeout=1)
         if not is_acquired:
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                 detail=f"Model initialization is in progress. Try again later",
             )
-        init_task_response = await _initialize_task(init_request, db, rcli)
+        init_task_response = await _initialize_task(
+            init_request, db, rcli, task_uuid
+        )
         if not init_task_response:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -398,19 +427,19 @@ async def initialize_task(
                 task_config=init_task_response.data.model_dump_json(),
             )
             db.add(db_task)
-            db.commit()
-            db.refresh(db_task)
+            await db.commit()
+            await db.refresh(db_task)
         return init_task_response
     except Exception as e:
-        if lock.locked() and lock.owned():
-            lock.release()
+        if await lock.locked() and await lock.owned():
+            await lock.release()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error initializing model: {e}",
         )
     finally:
-        if lock.locked() and lock.owned():
-            lock.release()
+        if await lock.locked() and await lock.owned():
+            await lock.release()
 
 
 @router.post(
@@ -418,11 +447,11 @@ async def initialize_task(
 )
 async def terminate_task(
     task_uuid: str,
-    rcli=Depends(get_redis_client),
-    db=Depends(get_db),
+    rcli: AsyncRedisClient = Depends(get_async_redis_client),
+    db: AsyncSession = Depends(get_async_db),
 ) -> Optional[Response]:
     # check if task exists
-    task_status = rcli.get(f"task:{task_uuid}:status")
+    task_status = await rcli.get(f"task:{task_uuid}:status")
     if not task_status:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -440,22 +469,24 @@ async def terminate_task(
 
     # get task from db
     task_db = (
-        db.query(dbmodels.Task).filter(dbmodels.Task.task_uuid == task_uuid).first()
-    )
+        await db.scalars(
+            select(dbmodels.Task).filter(dbmodels.Task.task_uuid == task_uuid)
+        )
+    ).first()
     if not task_db:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Task with uuid {task_uuid} not found in database",
         )
     task_db.is_active = False
-    db.commit()
-    db.refresh(task_db)
+    await db.commit()
+    await db.refresh(task_db)
 
     terminate_msg = schemas.Intercom(
         task_type=enums.Task.TERMINATE_MODEL.value, uuid=task_uuid, task=None
     )
     # change list add to stream
-    is_published = rcli.stream_add(
+    is_published = await rcli.stream_add(
         stream_name=settings.REDIS_MANAGER_STREAM_NAME,
         data={"task_uuid": task_uuid, "data": terminate_msg.model_dump_json()},
     )
@@ -467,6 +498,9 @@ async def terminate_task(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error publishing terminate task to queue",
         )
+    await rcli.release_sam2_lease(task_uuid)
+    # clients can still resume the last responses for a while
+    await rcli.expire_task_channels(task_uuid, settings.TASK_STREAM_TTL_SECONDS)
 
     return Response(status_code=status.HTTP_200_OK)
 
@@ -475,20 +509,33 @@ async def terminate_task(
 async def inference_websocket(
     websocket: WebSocket,
     task_uuid: str,
-    rcli=Depends(get_redis_client),
-    rcli_client=Depends(get_redis_client),
-    rcli_server=Depends(get_redis_client),
+    last_id: Optional[str] = None,
+    role: enums.WebSocketRoleEnum = enums.WebSocketRoleEnum.ANNOTATOR,
+    rcli: AsyncRedisClient = Depends(get_async_redis_client),
 ):
     """Two threads will be created for each websocket connection
     1. One thread will listen user requests
     2. Another thread will deliver responses to the user
 
     There is an internal queue for these threads' communication
+    Worker responses are pushed by the process wide response bridge,
+    sockets do not poll redis. All sockets of a task share one task hub,
+    it receives each response once and broadcasts it to them. Viewers
+    (?role=viewer) receive the responses but cannot send requests
+
+    Messages are JSON text, clients offering the "autolabel.msgpack"
+    subprotocol exchange MessagePack binary messages instead
+
+    With the stream transport every response carries its "stream_id",
+    a client reconnecting with ?last_id=<stream_id> first receives the
+    responses it missed
 
     Args:
         websocket (WebSocket): _description_
         task_uuid (str): _description_
-        rcli (_type_, optional): _description_. Defaults to Depends(get_redis_client).
+        last_id (Optional[str], optional): stream id of the last response the client received. Defaults to None.
+        role (enums.WebSocketRoleEnum, optional): annotator or read-only viewer. Defaults to annotator.
+        rcli (AsyncRedisClient, optional): Redis client of the app. Defaults to Depends(get_async_redis_client).
 
     Raises:
         HTTPException: _description_
@@ -496,18 +543,20 @@ async def inference_websocket(
 
     async def user_to_redis_producer(
         task_uuid: str,
-        redis_client: RedisClient,
-        client_queue: asyncio.Queue[dict],
-        server_queue: asyncio.Queue[dict],
+        redis_client: AsyncRedisClient,
+        client_queue: asyncio.Queue[Union[str, bytes]],
+        server_queue: ConnectionQueue,
+        can_send: bool = True,
     ):
         """
         Delivers user requests to the redis queue to task service can consume
 
         Args:
             task_uuid (str): UUID of current managed task
-            redis_client (RedisClient): Thread-safe Redis client
-            client_queue (asyncio.Queue): communcation queue user messages will be stored here
-            server_queue (asyncio.Queue): communcation queue server messages will be stored here
+            redis_client (AsyncRedisClient): Redis client of the app
+            client_queue (asyncio.Queue): communcation queue user messages will be stored here, as JSON
+            server_queue (ConnectionQueue): communcation queue server messages will be stored here
+            can_send (bool, optional): False for viewers, their requests are answered with an error. Defaults to True.
 
         Raises:
             HTTPException: _description_
@@ -517,18 +566,23 @@ async def inference_websocket(
                 try:
                     data = await client_queue.get()
                     # await server_queue.put({"msg": "Received message"})
+                    if not can_send:
+                        await server_queue.put(
+                            schemas.ErrorResponseCover(
+                                message="Viewers cannot send requests"
+                            ).model_dump()
+                        )
+                        continue
                     try:
-                        parsed_request, is_ok = validate_request(data)
+                        parsed_request, is_ok = validate_request_json(data)
                     except Exception as e:
                         raise HTTPException(
                             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                             detail=f"Error validating user request: {e}",
                         )
                     if is_ok:
-                        redis_client.queue(
-                            f"task:{task_uuid}:request",
-                            parsed_request.model_dump_json(),
-                        )
+                        # validated as sent, forwarded without serializing again
+                        await redis_client.publish_task_request(task_uuid, data)
                     else:
                         await server_queue.put(parsed_request.model_dump())
 
@@ -557,51 +611,37 @@ async def inference_websocket(
 
     async def redis_to_user_consumer(
         task_uuid: str,
-        redis_client: RedisClient,
-        client_queue: asyncio.Queue[dict],
-        server_queue: asyncio.Queue[dict],
+        member: HubMember,
+        server_queue: ConnectionQueue,
     ):
         """
-        Consumes redis queue to deliver responses to the user via internal queue
-        for websocket manager can deliver the message to the user
+        Delivers responses the task hub broadcast to the user
+        via internal queue for websocket manager can deliver the message to the user
 
         Args:
             task_uuid (str): UUID of current managed task
-            redis_client (RedisClient): Thread-safe Redis client
-            client_queue (asyncio.Queue): communcation queue user messages will be stored here
-            server_queue (asyncio.Queue): communcation queue server messages will be stored here
+            member (HubMember): hub member of the websocket, receives the worker responses
+            server_queue (ConnectionQueue): communcation queue server messages will be stored here
 
         Raises:
-            HTTPException: _description_
+            WebSocketDisconnect: client is too far behind, the connection is closed
         """
         try:
             while True:
-                try:
-                    data = redis_client.dequeue(f"task:{task_uuid}:response", count=1)
-                    if not data:
-                        await asyncio.sleep(0.1)
-                        continue
-                    await server_queue.put(data[0].decode("utf-8"))  # type: ignore
-                except asyncio.QueueFull:
-                    pass  # Remember: Handle full queue case in the future
-                except Exception as e:
-                    raise HTTPException(
-                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                        detail=f"Error consuming redis response: {e}",
-                    )
+                data = await member.get()
+                await server_queue.put(data)
         except asyncio.CancelledError:
             print("redis_to_user_consumer task cancelled")
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Error consuming redis response: {e}",
+        except ClientTooSlowError as e:
+            print(f"Closing slow connection of task {task_uuid}. {e}")
+            await WSMANAGER.disconnect(
+                websocket, code=status.WS_1013_TRY_AGAIN_LATER, reason=str(e)
             )
+            raise WebSocketDisconnect(status.WS_1013_TRY_AGAIN_LATER, str(e))
 
-    # TODO: All redis communcations must be async
-
-    await WSMANAGER.connect(websocket)
+    await WSMANAGER.connect(websocket, task_uuid, role.value)
     # before creating corutines check if task exists
-    task_status = rcli.get(f"task:{task_uuid}:status")
+    task_status = await rcli.get(f"task:{task_uuid}:status")
     print(f"Task status: {task_status}")
     if not task_status:
         print(f"Task with uuid {task_uuid} not found")
@@ -624,75 +664,112 @@ async def inference_websocket(
             reason=f"Task with uuid {task_uuid} cannot be used at -{task_status}- status",
         )
 
-    user_to_redis_producer_task = asyncio.create_task(
-        user_to_redis_producer(
-            task_uuid,
-            rcli_client,
-            client_queue=WSMANAGER.communication_queues[websocket]["client"],
-            server_queue=WSMANAGER.communication_queues[websocket]["server"],
-        )
-    )
-    redis_to_user_consumer_task = asyncio.create_task(
-        redis_to_user_consumer(
-            task_uuid,
-            rcli_server,
-            client_queue=WSMANAGER.communication_queues[websocket]["client"],
-            server_queue=WSMANAGER.communication_queues[websocket]["server"],
-        )
-    )
-
-    receive_task = asyncio.create_task(WSMANAGER.receive_message(websocket))
-    send_task = asyncio.create_task(WSMANAGER.send_message(websocket))
-
+    tasks: List[asyncio.Task] = list()
     try:
+        try:
+            member = await TASK_HUBS.attach(
+                task_uuid, websocket, rcli, role, last_id
+            )
+        except ValueError:
+            await WSMANAGER.disconnect(
+                websocket,
+                code=status.WS_1008_POLICY_VIOLATION,
+                reason="Invalid last_id",
+            )
+            raise WebSocketException(
+                code=status.WS_1008_POLICY_VIOLATION,
+                reason=f"Invalid last_id {last_id}",
+            )
+        except RedisError as e:
+            print(f"Error attaching websocket of task {task_uuid}: {e}")
+            await WSMANAGER.disconnect(
+                websocket,
+                code=status.WS_1011_INTERNAL_ERROR,
+                reason="Responses are not available",
+            )
+            raise WebSocketException(
+                code=status.WS_1011_INTERNAL_ERROR,
+                reason=f"Error reading responses of task {task_uuid}: {e}",
+            )
 
-        await asyncio.gather(
+        user_to_redis_producer_task = asyncio.create_task(
+            user_to_redis_producer(
+                task_uuid,
+                rcli,
+                client_queue=WSMANAGER.communication_queues[websocket]["client"],
+                server_queue=WSMANAGER.communication_queues[websocket]["server"],
+                can_send=member.can_send,
+            )
+        )
+        redis_to_user_consumer_task = asyncio.create_task(
+            redis_to_user_consumer(
+                task_uuid,
+                member,
+                server_queue=WSMANAGER.communication_queues[websocket]["server"],
+            )
+        )
+        receive_task = asyncio.create_task(WSMANAGER.receive_message(websocket))
+        send_task = asyncio.create_task(WSMANAGER.send_message(websocket))
+        tasks = [
             receive_task,
             send_task,
             user_to_redis_producer_task,
             redis_to_user_consumer_task,
-        )
+        ]
+
+        await asyncio.gather(*tasks)
 
     except WebSocketDisconnect:
         print("*** WebSocket exception ***")
         # WSMANAGER.disconnect(websocket)
         pass
     finally:
+        # runs however attaching ended, the hub member and socket state are released
+        await TASK_HUBS.detach(task_uuid, websocket)
         await WSMANAGER.disconnect(websocket)
-        user_to_redis_producer_task.cancel()
-        redis_to_user_consumer_task.cancel()
-        receive_task.cancel()
-        send_task.cancel()
+        for task in tasks:
+            task.cancel()
 
 
 # FIXME: Multiple exports must be handled -> overwriting the previous one
-@router.post("/export/{task_uuid}", status_code=status.HTTP_200_OK)
+@router.post(
+    "/export/{task_uuid}",
+    response_model=schemas.ExportJobResponseCover,
+    status_code=status.HTTP_202_ACCEPTED,
+)
 async def export_task_annotation(
     task_uuid: str,
     overwrite: bool = True,
-    db=Depends(get_db),
-    rcli=Depends(get_redis_client),
-) -> Any:
-    annotations = await get_annotations(
-        task_uuid, annotation_format="all", db=db, rcli=rcli
-    )
-    if not annotations:
-        raise CustomHTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=schemas.ErrorResponseCover(
-                message=f"Annotations for task with uuid {task_uuid} not found"
-            ).model_dump(),
-        )
-    if not annotations.data:
-        raise CustomHTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=schemas.ErrorResponseCover(
-                message=f"Annotations for task with uuid {task_uuid} not found"
-            ).model_dump(),
-        )
+    simplify: Optional[enums.PolygonSimplificationMethodEnum] = None,
+    simplify_tolerance: Optional[float] = Query(None, ge=0),
+    keep_original: Optional[bool] = None,
+    db: AsyncSession = Depends(get_async_db),
+    rcli: AsyncRedisClient = Depends(get_async_redis_client),
+) -> schemas.ExportJobResponseCover:
+    """Queues an export of the task annotations to the db
+
+    The export runs on the export worker pool, poll the job for progress.
+    If the task already has a queued or running export, that job is returned.
+    Polygons are stored simplified with the task settings unless overridden.
+
+    Args:
+        task_uuid (str): task uuid
+        overwrite (bool, optional): export again if exported before. Defaults to True.
+        simplify (Optional[enums.PolygonSimplificationMethodEnum], optional): overrides the task simplification method.
+        simplify_tolerance (Optional[float], optional): overrides the task tolerance in pixels.
+        keep_original (Optional[bool], optional): store the original coordinates too.
+
+    Returns:
+        schemas.ExportJobResponseCover: export job
+    """
+    await _check_annotation_ready(task_uuid, rcli)
 
     # get task id by uuid
-    task = db.query(dbmodels.Task).filter(dbmodels.Task.task_uuid == task_uuid).first()
+    task = (
+        await db.scalars(
+            select(dbmodels.Task).filter(dbmodels.Task.task_uuid == task_uuid)
+        )
+    ).first()
     if not task:
         raise CustomHTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -711,48 +788,109 @@ async def export_task_annotation(
                 ).model_dump(),
             )
 
-    rows = []
-    for anno in annotations.data:
-        if task.exported_at:
-            existing_annotation = (
-                db.query(dbmodels.Annotation)
-                .filter(
-                    dbmodels.Annotation.task_id == task.task_id,
-                    dbmodels.Annotation.image_id == anno.image_id,
-                )
-                .first()
-            )
-            if existing_annotation:
-                existing_annotation.annotation_data = anno.model_dump_json()
-                existing_annotation.annotated_at = anno.meta.annotated_at
-                continue
-
-        annotation_row = dbmodels.Annotation(
-            task_id=task.task_id,
-            image_id=anno.image_id,
-            image_path=anno.image_path,
-            annotation_data=anno.model_dump_json(),
-            annotation_type="all",
-            frame_idx=anno.meta.frame_idx,
-            annotated_at=anno.meta.annotated_at,
-        )
-        rows.append(annotation_row)
-
-    if rows:
-        db.bulk_save_objects(rows)
-        
-    task.exported_at = datetime.now(timezone.utc)
-    db.commit()
-    return Response(status_code=status.HTTP_202_ACCEPTED)
+    polygon_simplification = await _get_polygon_simplification(
+        task_uuid, rcli, simplify, simplify_tolerance, keep_original
+    )
+    # job creation and lookup use the sync client of the export workers
+    export_job = await asyncio.to_thread(
+        create_export_job, get_redis_client(), task_uuid, polygon_simplification
+    )
+    return schemas.ExportJobResponseCover(data=export_job)
+
+
+@router.get("/export/{task_uuid}/dataset", status_code=status.HTTP_200_OK)
+async def export_task_dataset(
+    task_uuid: str,
+    dataset_format: exporters.DatasetFormat = "coco",
+    include_images: bool = False,
+    simplify: Optional[enums.PolygonSimplificationMethodEnum] = None,
+    simplify_tolerance: Optional[float] = Query(None, ge=0),
+    db: AsyncSession = Depends(get_async_db),
+    rcli: AsyncRedisClient = Depends(get_async_redis_client),
+) -> StreamingResponse:
+    """Streams the task annotations as a COCO, YOLO or CVAT dataset zip
+
+    The zip is written while annotations are read from redis chunk by chunk,
+    memory usage does not grow with the number of frames.
+
+    Args:
+        task_uuid (str): task uuid
+        dataset_format (exporters.DatasetFormat, optional): dataset format. Defaults to "coco".
+        include_images (bool, optional): add frame images to the zip. Defaults to False.
+        simplify (Optional[enums.PolygonSimplificationMethodEnum], optional): overrides the task simplification method.
+        simplify_tolerance (Optional[float], optional): overrides the task tolerance in pixels.
+
+    Returns:
+        StreamingResponse: zip file
+    """
+    await _check_annotation_ready(task_uuid, rcli)
+
+    video = await _get_task_video(task_uuid, db)
+    if not video:
+        raise CustomHTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=schemas.ErrorResponseCover(
+                message=f"Video of task with uuid {task_uuid} not found"
+            ).model_dump(),
+        )
+
+    exporter = exporters.get_dataset_exporter(
+        dataset_format,
+        exporters.DatasetInfo(
+            name=task_uuid,
+            image_width=video.video_width,
+            image_height=video.video_height,
+            include_images=include_images,
+        ),
+    )
+    records = iter_annotation_records(
+        task_uuid,
+        get_extracted_frame_count(video),
+        get_frame_mapping(video),
+        "all",
+        get_redis_client(),
+        chunk_size=settings.ANNOTATION_STREAM_CHUNK_SIZE,
+        simplification=await _get_polygon_simplification(
+            task_uuid, rcli, simplify, simplify_tolerance, keep_original=False
+        ),
+    )
+    return StreamingResponse(
+        exporter.iter_zip(records),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{task_uuid}_{dataset_format}.zip"'
+        },
+    )
+
+
+@router.get(
+    "/export/jobs/{job_id}",
+    response_model=schemas.ExportJobResponseCover,
+    status_code=status.HTTP_200_OK,
+)
+async def get_export_job_status(
+    job_id: str,
+    rcli: AsyncRedisClient = Depends(get_async_redis_client),
+) -> schemas.ExportJobResponseCover:
+    export_job = await asyncio.to_thread(get_export_job, get_redis_client(), job_id)
+    if not export_job:
+        raise CustomHTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=schemas.ErrorResponseCover(
+                message=f"Export job with id {job_id} not found"
+            ).model_dump(),
+        )
+    return schemas.ExportJobResponseCover(data=export_job)
 
 
 @router.get("/annotation/status", status_code=status.HTTP_200_OK)
 async def get_annotation_status(
-    task_uuid: str, db=Depends(get_db), rcli=Depends(get_redis_client)
+    task_uuid: str,
+    rcli: AsyncRedisClient = Depends(get_async_redis_client),
 ) -> schemas.AnnotationStatusResponseCover:
 
     # get task status from redis
-    annotation_status = rcli.get(f"task:{task_uuid}:annotation:status")
+    annotation_status = await rcli.get(f"task:{task_uuid}:annotation:status")
     if not annotation_status:
         raise CustomHTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -767,16 +905,20 @@ async def get_annotation_status(
     )
 
 
-@router.get("/annotation/", status_code=status.HTTP_200_OK)
-async def get_annotations(
-    task_uuid: str,
-    annotation_format: Literal["all", "bbox", "polygon"] = "all",
-    db=Depends(get_db),
-    rcli: RedisClient = Depends(get_redis_client),
-) -> schemas.ImageAnnotationResponseCover:
-    start = time.time()
-    # get annotation status
-    annotation_status = rcli.get(f"task:{task_uuid}:annotation:status")
+async def _get_task_video(
+    task_uuid: str, db: AsyncSession
+) -> Optional[dbmodels.Video]:
+    return (
+        await db.scalars(
+            select(dbmodels.Video)
+            .join(dbmodels.Task, dbmodels.Task.video_id == dbmodels.Video.video_id)
+            .filter(dbmodels.Task.task_uuid == task_uuid)
+        )
+    ).first()
+
+
+async def _check_annotation_ready(task_uuid: str, rcli: AsyncRedisClient) -> None:
+    annotation_status = await rcli.get(f"task:{task_uuid}:annotation:status")
     if not annotation_status:
         raise CustomHTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -787,23 +929,177 @@ async def get_annotations(
 
     if annotation_status not in [
         enums.AnnotationStatusEnum.READY.value,
+        enums.AnnotationStatusEnum.EXPORTED.value,
     ]:
         raise CustomHTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=schemas.ErrorResponseCover(
-                message=f"Annotation for task with uuid {task_uuid} is not ready for export.\nOnly 'ready' annotations can be exported."
+                message=f"Annotation for task with uuid {task_uuid} is not ready for export.\nOnly 'ready' and 'exported' annotations can be exported."
+            ).model_dump(),
+        )
+
+
+async def _get_polygon_simplification(
+    task_uuid: str,
+    rcli: AsyncRedisClient,
+    method: Optional[enums.PolygonSimplificationMethodEnum] = None,
+    tolerance: Optional[float] = None,
+    keep_original: Optional[bool] = None,
+) -> schemas.PolygonSimplification:
+    """Returns the polygon simplification of the task, with request overrides
+
+    Tasks without their own simplification use the defaults from settings.
+    """
+    task_simplification = await rcli.get(f"task:{task_uuid}:polygon_simplification")
+    if task_simplification:
+        simplification = schemas.PolygonSimplification.model_validate_json(
+            task_simplification
+        )
+    else:
+        simplification = schemas.PolygonSimplification(
+            method=settings.POLYGON_SIMPLIFICATION_METHOD,
+            tolerance=settings.POLYGON_SIMPLIFICATION_TOLERANCE,
+            keep_original=settings.POLYGON_SIMPLIFICATION_KEEP_ORIGINAL,
+        )
+    overrides = {
+        "method": method,
+        "tolerance": tolerance,
+        "keep_original": keep_original,
+    }
+    return simplification.model_copy(
+        update={key: value for key, value in overrides.items() if value is not None}
+    )
+
+
+@router.get(
+    "/{task_uuid}/polygon-simplification",
+    response_model=schemas.PolygonSimplificationResponseCover,
+    status_code=status.HTTP_200_OK,
+)
+async def get_polygon_simplification(
+    task_uuid: str,
+    rcli: AsyncRedisClient = Depends(get_async_redis_client),
+) -> schemas.PolygonSimplificationResponseCover:
+    if not await rcli.get(f"task:{task_uuid}:status"):
+        raise CustomHTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=schemas.ErrorResponseCover(
+                message=f"Task with uuid {task_uuid} not found"
+            ).model_dump(),
+        )
+    return schemas.PolygonSimplificationResponseCover(
+        data=await _get_polygon_simplification(task_uuid, rcli)
+    )
+
+
+@router.put(
+    "/{task_uuid}/polygon-simplification",
+    response_model=schemas.PolygonSimplificationResponseCover,
+    status_code=status.HTTP_200_OK,
+)
+async def set_polygon_simplification(
+    task_uuid: str,
+    polygon_simplification: schemas.PolygonSimplification,
+    rcli: AsyncRedisClient = Depends(get_async_redis_client),
+) -> schemas.PolygonSimplificationResponseCover:
+    """Sets how polygons of the task are simplified when they are read or exported
+
+    Annotations in redis are not changed, a new tolerance applies to
+    annotations already produced.
+    """
+    if not await rcli.get(f"task:{task_uuid}:status"):
+        raise CustomHTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=schemas.ErrorResponseCover(
+                message=f"Task with uuid {task_uuid} not found"
             ).model_dump(),
         )
+    await rcli.set(
+        f"task:{task_uuid}:polygon_simplification",
+        polygon_simplification.model_dump_json(),
+    )
+    return schemas.PolygonSimplificationResponseCover(data=polygon_simplification)
+
+
+async def _ensure_annotation_index(
+    annotation_store: AnnotationStore, video: Optional[dbmodels.Video]
+) -> None:
+    # without keyspace notifications worker writes are never indexed, so the
+    # index is rebuilt on every read until the indexer follows them again
+    await asyncio.to_thread(
+        annotation_store.ensure_index,
+        get_extracted_frame_count(video) if video else None,
+        settings.ANNOTATION_STREAM_CHUNK_SIZE,
+        not ANNOTATION_INDEXER.is_following,
+    )
+
+
+@router.get("/annotation/", status_code=status.HTTP_200_OK)
+async def get_annotations(
+    task_uuid: str,
+    annotation_format: Literal["all", "bbox", "polygon"] = "all",
+    simplify: Optional[enums.PolygonSimplificationMethodEnum] = None,
+    simplify_tolerance: Optional[float] = Query(None, ge=0),
+    keep_original: Optional[bool] = None,
+    since: Optional[int] = Query(None, ge=0),
+    db: AsyncSession = Depends(get_async_db),
+    rcli: AsyncRedisClient = Depends(get_async_redis_client),
+) -> schemas.ImageAnnotationResponseCover:
+    """Returns annotations of a task, or only the frames changed since a version
+
+    The response meta carries the annotation version of the task. Passing it
+    back as `since` returns only frames written after it, and the frames
+    deleted after it in meta.deleted_frames.
+    """
+    start = time.time()
+    # get annotation status
+    await _check_annotation_ready(task_uuid, rcli)
+
+    video = await _get_task_video(task_uuid, db)
+    # the index is maintained with the sync client, off the event loop
+    annotation_store = AnnotationStore(get_redis_client(), task_uuid)
 
     # get annotation keys
     # keys_to_retrieve = rcli.get_keys_with_pattern(f"task:{task_uuid}:annotation:*")
-    raw_annotations = rcli.get_values_with_pattern(
-        f"task:{task_uuid}:annotation:[0-9]*"
+    if since is None:
+        # versions are recorded when annotations are written, read before the
+        # annotations so a later `since` request never misses a frame
+        version = await asyncio.to_thread(annotation_store.get_version)
+        deleted_frames = list()
+        keys_to_retrieve = await rcli.get_keys_with_pattern(
+            f"task:{task_uuid}:annotation:[0-9]*"
+        )
+    else:
+        # rebuilt only if worker writes may have gone unindexed
+        await _ensure_annotation_index(annotation_store, video)
+        version, changed_frames, deleted_frames = await asyncio.to_thread(
+            annotation_store.get_changes, since
+        )
+        keys_to_retrieve = [
+            get_annotation_key(task_uuid, frame_idx) for frame_idx in changed_frames
+        ]
+    raw_annotations = await rcli.get_raw_values(keys_to_retrieve)
+    frame_mapping = get_frame_mapping(video) if video else None
+    simplification = await _get_polygon_simplification(
+        task_uuid, rcli, simplify, simplify_tolerance, keep_original
     )
     annotations: List[ImageAnnotation] = list()
     for anno in raw_annotations:
+        if anno is None:
+            continue
         try:
-            model = schemas.ImageAnnotation.model_validate_json(anno)
+            if simplification.is_active:
+                model = ImageAnnotation.model_validate(
+                    simplify_annotation(
+                        json.loads(decode_annotation_json(anno)), simplification
+                    )
+                )
+            else:
+                model = load_image_annotation(anno)
+            if frame_mapping is not None and model.meta.frame_idx is not None:
+                model.meta.original_frame_idx = get_original_frame_number(
+                    model.meta.frame_idx, frame_mapping
+                )
             if annotation_format == "bbox":
                 model.polygon_annotations = list()
             elif annotation_format == "polygon":
@@ -814,4 +1110,153 @@ async def get_annotations(
             continue
     end = time.time()
     print(f"Elapsed time: {end-start}")
-    return schemas.ImageAnnotationResponseCover(data=annotations)
+    return schemas.ImageAnnotationResponseCover(
+        data=annotations,
+        meta=schemas.AnnotationVersion(
+            version=version,
+            since=since,
+            deleted_frames=deleted_frames,
+        ),
+    )
+
+
+@router.get(
+    "/annotation/query",
+    response_model=schemas.ImageAnnotationResponseCover,
+    status_code=status.HTTP_200_OK,
+)
+async def query_annotations(
+    response: Response,
+    task_uuid: str,
+    start_frame: int = Query(0, ge=0),
+    end_frame: Optional[int] = Query(None, ge=0),
+    object_id: Optional[List[str]] = Query(None),
+    label: Optional[List[str]] = Query(None),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(200, ge=1, le=1000),
+    annotation_format: Literal["all", "bbox", "polygon"] = "all",
+    simplify: Optional[enums.PolygonSimplificationMethodEnum] = None,
+    simplify_tolerance: Optional[float] = Query(None, ge=0),
+    keep_original: Optional[bool] = None,
+    db: AsyncSession = Depends(get_async_db),
+    rcli: AsyncRedisClient = Depends(get_async_redis_client),
+) -> schemas.ImageAnnotationResponseCover:
+    """Returns annotations of a frame range, optionally only of some objects or labels
+
+    Frames are looked up in per-task indexes, so the cost grows with the
+    number of matching frames and not with the task size. The index is
+    rebuilt on the first query after the worker changed annotations.
+    The total number of matching frames is returned in the Total-Frames header.
+
+    Args:
+        task_uuid (str): task uuid
+        start_frame (int, optional): first frame index. Defaults to 0.
+        end_frame (Optional[int], optional): last frame index, inclusive. Defaults to None.
+        object_id (Optional[List[str]], optional): object ids to return. Defaults to None.
+        label (Optional[List[str]], optional): labels to return. Defaults to None.
+        offset (int, optional): matching frames to skip. Defaults to 0.
+        limit (int, optional): frames per page. Defaults to 200.
+        annotation_format (Literal["all", "bbox", "polygon"], optional): annotation types to keep. Defaults to "all".
+        simplify (Optional[enums.PolygonSimplificationMethodEnum], optional): overrides the task simplification method.
+        simplify_tolerance (Optional[float], optional): overrides the task tolerance in pixels.
+        keep_original (Optional[bool], optional): add the original coordinates of simplified polygons.
+
+    Returns:
+        schemas.ImageAnnotationResponseCover: annotations of the page in frame order
+    """
+    await _check_annotation_ready(task_uuid, rcli)
+
+    video = await _get_task_video(task_uuid, db)
+    # the index is maintained with the sync client, off the event loop
+    annotation_store = AnnotationStore(get_redis_client(), task_uuid)
+    await _ensure_annotation_index(annotation_store, video)
+    total, frame_indices, object_ids = await asyncio.to_thread(
+        annotation_store.query_frames,
+        start_frame=start_frame,
+        end_frame=end_frame,
+        object_ids=object_id,
+        labels=label,
+        offset=offset,
+        limit=limit,
+    )
+    records = await asyncio.to_thread(
+        get_annotation_records,
+        task_uuid,
+        frame_indices,
+        get_frame_mapping(video) if video else None,
+        annotation_format,
+        annotation_store.rcli,
+        simplification=await _get_polygon_simplification(
+            task_uuid, rcli, simplify, simplify_tolerance, keep_original
+        ),
+        object_ids=object_ids,
+        labels=set(label) if label else None,
+    )
+    response.headers["Total-Frames"] = str(total)
+    return schemas.ImageAnnotationResponseCover(
+        data=[ImageAnnotation.model_validate_json(record) for record in records]
+    )
+
+
+def _iter_json_array(records: Iterator[bytes]) -> Iterator[bytes]:
+    yield b"["
+    for idx, record in enumerate(records):
+        yield record if idx == 0 else b"," + record
+    yield b"]"
+
+
+@router.get("/annotation/stream", status_code=status.HTTP_200_OK)
+async def stream_annotations(
+    task_uuid: str,
+    annotation_format: Literal["all", "bbox", "polygon"] = "all",
+    stream_format: Literal["ndjson", "json"] = "ndjson",
+    simplify: Optional[enums.PolygonSimplificationMethodEnum] = None,
+    simplify_tolerance: Optional[float] = Query(None, ge=0),
+    keep_original: Optional[bool] = None,
+    db: AsyncSession = Depends(get_async_db),
+    rcli: AsyncRedisClient = Depends(get_async_redis_client),
+) -> StreamingResponse:
+    """Streams annotations of a task in frame order
+
+    Frames are fetched in chunks with MGET, memory usage does not grow
+    with the number of annotated frames.
+
+    Args:
+        task_uuid (str): task uuid
+        annotation_format (Literal["all", "bbox", "polygon"], optional): annotation types to keep. Defaults to "all".
+        stream_format (Literal["ndjson", "json"], optional): one annotation per line or a JSON array. Defaults to "ndjson".
+        simplify (Optional[enums.PolygonSimplificationMethodEnum], optional): overrides the task simplification method.
+        simplify_tolerance (Optional[float], optional): overrides the task tolerance in pixels.
+        keep_original (Optional[bool], optional): add the original coordinates of simplified polygons.
+        db (AsyncSession, optional): DB Session. Defaults to Depends(get_async_db).
+        rcli (AsyncRedisClient, optional): Redis client of the app. Defaults to Depends(get_async_redis_client).
+
+    Returns:
+        StreamingResponse: annotations as ImageAnnotation documents
+    """
+    await _check_annotation_ready(task_uuid, rcli)
+
+    video = await _get_task_video(task_uuid, db)
+    frame_count = get_extracted_frame_count(video) if video else None
+    frame_mapping = get_frame_mapping(video) if video else None
+    records = iter_annotation_records(
+        task_uuid,
+        frame_count,
+        frame_mapping,
+        annotation_format,
+        get_redis_client(),
+        chunk_size=settings.ANNOTATION_STREAM_CHUNK_SIZE,
+        simplification=await _get_polygon_simplification(
+            task_uuid, rcli, simplify, simplify_tolerance, keep_original
+        ),
+    )
+
+    # sync generators are iterated in the threadpool with the sync client,
+    # MGETs do not block the event loop
+    if stream_format == "json":
+        return StreamingResponse(
+            _iter_json_array(records), media_type="application/json"
+        )
+    return StreamingResponse(
+        (record + b"\n" for record in records), media_type="application/x-ndjson"
+    )
@@ -3,19 +3,27 @@ import uuid
 import shutil
 import pathlib
 import asyncio
-from typing import List, Dict, Optional, Union
-from datetime import datetime
+from typing import List, Dict, Optional, Union, Literal
+from datetime import datetime, timezone
 
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Header
 from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 import schemas
 import database_models as dbmodels
-from db import get_db
-from utils import get_video_information
+from db import get_db, get_async_db
+from utils import get_video_information, compute_video_content_hash
 from settings import settings
 from enums import VideoStatusEnum
-from background_tasks import extract_frames, convert_video_to_mp4
+from background_tasks import (
+    extract_frames,
+    convert_video_to_mp4,
+    package_video_segments,
+    create_proxy_video,
+    wake_video_reaper,
+)
 
 from .frames import process_image
 
@@ -34,7 +42,9 @@ async def add_video(
 ) -> schemas.VideoOut:
     # check video exists by name
     video_exists = (
-        db.query(dbmodels.Video).filter_by(video_name=video.video_name).first()
+        db.query(dbmodels.Video)
+        .filter_by(video_name=video.video_name, is_active=True)
+        .first()
     )
     if video_exists:
         raise HTTPException(
@@ -63,13 +73,57 @@ async def add_video(
             detail="Video file must be in mp4, avi, mov or mkv format",
         )
 
+    target_fps = video.target_fps if video.target_fps else None
+
+    # same clip with the same conversion parameters shares converted video and frames
+    try:
+        content_hash = await asyncio.to_thread(
+            compute_video_content_hash,
+            video.video_path,
+            {
+                "target_fps": target_fps,
+                "inc_audio": False,
+                "extraction_mode": video.extraction_mode.value,
+                "frame_stride": video.frame_stride,
+                "scene_threshold": video.scene_threshold,
+            },
+            mode=settings.VIDEO_HASH_MODE,  # type: ignore
+            sample_block_size=settings.VIDEO_HASH_SAMPLE_BLOCK_SIZE,
+            sample_block_count=settings.VIDEO_HASH_SAMPLE_BLOCK_COUNT,
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to read video file.\n{str(e)}",
+        )
+
+    source_video = (
+        db.query(dbmodels.Video)
+        .filter_by(
+            content_hash=content_hash,
+            is_active=True,
+            status=VideoStatusEnum.READY.value,
+        )
+        .first()
+    )
+    if source_video:
+        new_video = _add_shared_video(video.video_name, source_video, db)
+        if settings.STREAM_PACKAGING_ENABLED and not new_video.segments_path:
+            background_tasks.add_task(
+                package_video_segments, video_id=new_video.video_id  # type: ignore
+            )
+        if video.create_proxy and not new_video.proxy_path:
+            background_tasks.add_task(
+                create_proxy_video, video_id=new_video.video_id  # type: ignore
+            )
+        return new_video
+
     video_uuid = str(uuid.uuid4())
     internal_video_path = os.path.join(
         settings.RAW_VIDEO_DIRECTORY, f"{video_uuid}.mp4"
     )
 
     # convert video to mp4
-    target_fps = video.target_fps if video.target_fps else None
     conversion_success, error_msg = await convert_video_to_mp4(
         video.video_path, internal_video_path, inc_audio=False, target_fps=target_fps
     )
@@ -106,6 +160,10 @@ async def add_video(
             video_duration=video_information.video_duration,
             file_size=os.path.getsize(internal_video_path),
             frame_count=video_information.frame_count,
+            extraction_mode=video.extraction_mode.value,
+            frame_stride=video.frame_stride,
+            scene_threshold=video.scene_threshold,
+            content_hash=content_hash,
         )
         db.add(new_video)
         db.commit()
@@ -113,6 +171,15 @@ async def add_video(
 
         # add background task to extract frames
         background_tasks.add_task(extract_frames, video_id=new_video.video_id)  # type: ignore
+        if settings.STREAM_PACKAGING_ENABLED:
+            # runs after frame extraction, packages only ready videos
+            background_tasks.add_task(
+                package_video_segments, video_id=new_video.video_id  # type: ignore
+            )
+        if video.create_proxy:
+            background_tasks.add_task(
+                create_proxy_video, video_id=new_video.video_id  # type: ignore
+            )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -124,6 +191,54 @@ async def add_video(
     return new_video
 
 
+def _add_shared_video(
+    video_name: str, source_video: dbmodels.Video, db
+) -> dbmodels.Video:
+    """Adds a video row sharing converted video and extracted frames of source_video
+
+    Shared files are reference counted by the rows pointing to them,
+    the video reaper removes them after the last row is deleted.
+
+    Args:
+        video_name (str): name of the new video
+        source_video (dbmodels.Video): ready video with the same content hash
+        db (Session): DB Session
+
+    Returns:
+        dbmodels.Video: new video row
+    """
+    try:
+        new_video = dbmodels.Video(
+            video_name=video_name,
+            video_width=source_video.video_width,
+            video_height=source_video.video_height,
+            video_path=source_video.video_path,
+            frames_path=source_video.frames_path,
+            video_fps=source_video.video_fps,
+            video_duration=source_video.video_duration,
+            file_size=source_video.file_size,
+            frame_count=source_video.frame_count,
+            extraction_mode=source_video.extraction_mode,
+            frame_stride=source_video.frame_stride,
+            scene_threshold=source_video.scene_threshold,
+            extracted_frame_count=source_video.extracted_frame_count,
+            frame_mapping=source_video.frame_mapping,
+            segments_path=source_video.segments_path,
+            proxy_path=source_video.proxy_path,
+            content_hash=source_video.content_hash,
+            status=VideoStatusEnum.READY.value,
+        )
+        db.add(new_video)
+        db.commit()
+        db.refresh(new_video)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Internal Server Error\n{str(e)}",
+        )
+    return new_video
+
+
 @router.get(
     "/",
     response_model=List[schemas.VideoOut],
@@ -131,18 +246,18 @@ async def add_video(
     status_code=status.HTTP_200_OK,
 )
 async def get_videos(
-    thumbnail: bool = False, db=Depends(get_db)
+    thumbnail: bool = False, db: AsyncSession = Depends(get_async_db)
 ) -> List[schemas.VideoOut]:
     """Returns list of all videos
 
     Args:
         thumbnail (bool, optional): Get thumbnail with video information. Defaults to False.
-        db (_type_, optional): DB Session. Defaults to Depends(get_db).
+        db (AsyncSession, optional): DB Session. Defaults to Depends(get_async_db).
 
     Returns:
         List[Optional[schemas.VideoOut]]: _description_
     """
-    videos = db.query(dbmodels.Video).all()
+    videos = (await db.scalars(select(dbmodels.Video).filter_by(is_active=True))).all()
     videos = [schemas.VideoOut.model_validate(video) for video in videos]
     if thumbnail:
         for video in videos:
@@ -164,9 +279,15 @@ async def get_videos(
     response_model=schemas.VideoOutDetailed,
     status_code=status.HTTP_200_OK,
 )
-async def get_video(video_id: int, db=Depends(get_db)) -> schemas.VideoOutDetailed:
+async def get_video(
+    video_id: int, db: AsyncSession = Depends(get_async_db)
+) -> schemas.VideoOutDetailed:
     # check if video exists
-    video = db.query(dbmodels.Video).filter_by(video_id=video_id).first()
+    video = (
+        await db.scalars(
+            select(dbmodels.Video).filter_by(video_id=video_id, is_active=True)
+        )
+    ).first()
     if not video:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -182,7 +303,11 @@ async def get_video(video_id: int, db=Depends(get_db)) -> schemas.VideoOutDetail
 )
 async def delete_video(video_id: int, db=Depends(get_db)):
     # check if video exists
-    video = db.query(dbmodels.Video).filter_by(video_id=video_id).first()
+    video = (
+        db.query(dbmodels.Video)
+        .filter_by(video_id=video_id, is_active=True)
+        .first()
+    )
     if not video:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -200,18 +325,12 @@ async def delete_video(video_id: int, db=Depends(get_db)):
             detail="Video is processing. Please wait until processing is complete",
         )
 
-    # remove raw_video
-    if os.path.exists(video.video_path):
-        os.remove(video.video_path)
-
-    # remove extracted frames
-    if os.path.exists(video.frames_path):
-        shutil.rmtree(video.frames_path)
-
-    # delete video
-    db.delete(video)
+    # tombstone the video, files are reclaimed by the video reaper
+    video.is_active = False
+    video.deleted_at = datetime.now(timezone.utc)
+    video.status = VideoStatusEnum.DELETING.value
     db.commit()
-    db.close()
+    wake_video_reaper()
     return
 
 
@@ -220,9 +339,15 @@ async def delete_video(video_id: int, db=Depends(get_db)):
     response_model=schemas.VideoStatus,
     status_code=status.HTTP_200_OK,
 )
-async def get_video_status(video_id: int, db=Depends(get_db)) -> schemas.VideoStatus:
+async def get_video_status(
+    video_id: int, db: AsyncSession = Depends(get_async_db)
+) -> schemas.VideoStatus:
     # check if video exists
-    video = db.query(dbmodels.Video).filter_by(video_id=video_id).first()
+    video = (
+        await db.scalars(
+            select(dbmodels.Video).filter_by(video_id=video_id, is_active=True)
+        )
+    ).first()
     if not video:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -232,26 +357,53 @@ async def get_video_status(video_id: int, db=Depends(get_db)) -> schemas.VideoSt
     return schemas.VideoStatus(status=video.status)
 
 
+def _get_rendition_path(
+    video: dbmodels.Video, rendition: Literal["original", "proxy"]
+) -> str:
+    """Returns file path of the requested rendition of the video
+
+    Args:
+        video (dbmodels.Video): video row
+        rendition (Literal["original", "proxy"]): "proxy" is the low resolution
+            scrubbing rendition, "original" is the converted video
+
+    Returns:
+        str: path of the rendition
+    """
+    if rendition == "proxy":
+        if not video.proxy_path:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Proxy rendition is not available for this video",
+            )
+        return str(video.proxy_path)
+    return str(video.video_path)
+
+
 @router.get(
     "/stream/{video_id}",
     status_code=status.HTTP_200_OK,
 )
 async def stream_video(
     video_id: int,
-    db=Depends(get_db),
+    rendition: Literal["original", "proxy"] = "original",
+    db: AsyncSession = Depends(get_async_db),
     package_size: int = Header(1),
 ) -> StreamingResponse:
     # check if video exists
     video: Optional[dbmodels.Video] = (
-        db.query(dbmodels.Video).filter_by(video_id=video_id).first()
-    )
+        await db.scalars(
+            select(dbmodels.Video).filter_by(video_id=video_id, is_active=True)
+        )
+    ).first()
     if not video:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Video not found",
         )
+    video_path = _get_rendition_path(video, rendition)
     # check if video path exists
-    if not os.path.exists(video.video_path):  # type: ignore
+    if not os.path.exists(video_path):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Video path does not exists. Please re-upload the video",
@@ -265,9 +417,9 @@ async def stream_video(
         )
 
     def iterfile():
-        with open(video.video_path, "rb") as file:  # type: ignore
+        with open(video_path, "rb") as file:
             print(
-                f"Requested video size: {os.path.getsize(video.video_path)/ 1024 / 1024:.2f} MB with package size: {package_size} MB"  # type: ignore
+                f"Requested video size: {os.path.getsize(video_path)/ 1024 / 1024:.2f} MB with package size: {package_size} MB"
             )
 
             while chunk := file.read(
@@ -286,24 +438,30 @@ async def stream_video(
 
 @router.get("/stream-partial/{video_id}", status_code=status.HTTP_206_PARTIAL_CONTENT)
 def stream_video_partial(
-    video_id: int, db=Depends(get_db), range_header: str = Header(None, alias="range")
+    video_id: int,
+    rendition: Literal["original", "proxy"] = "original",
+    db=Depends(get_db),
+    range_header: str = Header(None, alias="range"),
 ):
     video: Optional[dbmodels.Video] = (
-        db.query(dbmodels.Video).filter_by(video_id=video_id).first()
+        db.query(dbmodels.Video)
+        .filter_by(video_id=video_id, is_active=True)
+        .first()
     )
     if not video:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Video not found"
         )
 
+    video_path = _get_rendition_path(video, rendition)
     # check if video path exists
-    if not os.path.exists(video.video_path):  # type: ignore
+    if not os.path.exists(video_path):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Video path does not exists. Communicate with administrator.",
         )
 
-    file_size_in_bytes = os.path.getsize(video.video_path)  # type: ignore
+    file_size_in_bytes = os.path.getsize(video_path)
 
     try:
         # Parse the range header
@@ -327,7 +485,7 @@ def stream_video_partial(
         )
 
     def iterfile():
-        with open(video.video_path, "rb") as video_file:  # type: ignore
+        with open(video_path, "rb") as video_file:
             video_file.seek(range_start)
             yield video_file.read(chunk_size)
 
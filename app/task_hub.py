@@ -0,0 +1,214 @@
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+import enums
+from db import AsyncRedisClient
+from settings import settings
+from .response_bridge import (
+    RESPONSE_BRIDGE,
+    get_stream_id,
+    parse_stream_id,
+    read_last_response_id,
+    read_responses_after,
+)
+from .websocket_queue import ClientTooSlowError, get_msg_type, parse_msg_types
+
+
+class HubMember:
+    """A websocket attached to a task hub
+
+    Live responses wait in a bounded queue, with the policy of ConnectionQueue:
+    coalesced message types are dropped when it is full, any other response
+    that does not fit means the socket fell behind, and `get` raises
+    ClientTooSlowError. Replayed responses are kept apart and come first, and
+    live responses up to the last replayed one are dropped.
+    """
+
+    def __init__(
+        self,
+        role: enums.WebSocketRoleEnum,
+        resuming: bool = False,
+        maxsize: int = 256,
+        coalesced_msg_types: Iterable[str] = (),
+    ) -> None:
+        self.role = role
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=max(maxsize, 1))
+        self.coalesced_msg_types = set(coalesced_msg_types)
+        self.replayed: Deque[str] = deque()
+        self.is_overflowed = False
+        # live responses wait here while the missed ones are replayed
+        self._held: Optional[List[str]] = list() if resuming else None
+        self._replayed_key: Optional[Tuple[int, int]] = None
+
+    @property
+    def can_send(self) -> bool:
+        return self.role == enums.WebSocketRoleEnum.ANNOTATOR
+
+    def _put(self, data: str) -> None:
+        try:
+            self.queue.put_nowait(data)
+        except asyncio.QueueFull:
+            if get_msg_type(data) not in self.coalesced_msg_types:
+                self.is_overflowed = True
+
+    def deliver(self, data: str) -> None:
+        if self._held is not None:
+            self._held.append(data)
+            return
+        if self._replayed_key is not None:
+            stream_id = get_stream_id(data)
+            if (
+                stream_id is not None
+                and parse_stream_id(stream_id) <= self._replayed_key
+            ):
+                return
+        self._put(data)
+
+    async def get(self) -> str:
+        if self.is_overflowed:
+            raise ClientTooSlowError(
+                f"More than {self.queue.maxsize} responses are waiting"
+            )
+        if self.replayed:
+            return self.replayed.popleft()
+        return await self.queue.get()
+
+    def release(self, last_id: str) -> None:
+        """Delivers held responses that were not part of the replay"""
+        held, self._held = self._held or list(), None
+        self._replayed_key = parse_stream_id(last_id)
+        for data in held:
+            self.deliver(data)
+
+
+class TaskHub:
+    """Broadcasts the responses of one task to its websockets in this process
+
+    The hub holds the only response subscription of the task: a response is
+    received once, however many annotators and viewers are attached.
+    """
+
+    def __init__(self, task_uuid: str, redis_client: AsyncRedisClient, bridge) -> None:
+        self.task_uuid = task_uuid
+        self.redis_client = redis_client
+        self.bridge = bridge
+        self.members: Dict[Any, HubMember] = dict()
+        self.responses: asyncio.Queue[str] = asyncio.Queue()
+        self._broadcast_task: Optional[asyncio.Task] = None
+
+    async def start(self, last_id: Optional[str] = None) -> None:
+        await self.bridge.subscribe(self.task_uuid, self.responses, last_id)
+        self._broadcast_task = asyncio.create_task(self._broadcast())
+
+    async def stop(self) -> None:
+        await self.bridge.unsubscribe(self.task_uuid, self.responses)
+        if self._broadcast_task is not None:
+            self._broadcast_task.cancel()
+            await asyncio.gather(self._broadcast_task, return_exceptions=True)
+
+    async def _broadcast(self) -> None:
+        while True:
+            data = await self.responses.get()
+            for member in list(self.members.values()):
+                member.deliver(data)
+
+    async def attach(
+        self, key: Any, role: enums.WebSocketRoleEnum, last_id: Optional[str] = None
+    ) -> HubMember:
+        resuming = last_id is not None and self.bridge.resumable
+        member = HubMember(
+            role,
+            resuming=resuming,
+            maxsize=settings.WEBSOCKET_SEND_QUEUE_SIZE,
+            coalesced_msg_types=parse_msg_types(settings.WEBSOCKET_COALESCED_MSG_TYPES),
+        )
+        self.members[key] = member
+        if resuming:
+            try:
+                for last_id, data in await read_responses_after(
+                    self.redis_client.client, self.task_uuid, last_id
+                ):
+                    member.replayed.append(data)
+            finally:
+                member.release(last_id)
+        return member
+
+    def get_metrics(self) -> Dict[str, int]:
+        roles = [member.role for member in self.members.values()]
+        return {
+            "annotators": roles.count(enums.WebSocketRoleEnum.ANNOTATOR),
+            "viewers": roles.count(enums.WebSocketRoleEnum.VIEWER),
+            "pending_responses": self.responses.qsize(),
+            "overflowed": sum(member.is_overflowed for member in self.members.values()),
+        }
+
+
+class TaskHubRegistry:
+    """Task hubs of this process, a hub lives while a websocket is attached"""
+
+    def __init__(self, bridge=RESPONSE_BRIDGE) -> None:
+        self.bridge = bridge
+        self.hubs: Dict[str, TaskHub] = dict()
+
+    async def attach(
+        self,
+        task_uuid: str,
+        key: Any,
+        redis_client: AsyncRedisClient,
+        role: enums.WebSocketRoleEnum = enums.WebSocketRoleEnum.ANNOTATOR,
+        last_id: Optional[str] = None,
+    ) -> HubMember:
+        """Attaches a websocket to the hub of the task
+
+        Args:
+            task_uuid (str): task the websocket watches
+            key (Any): identifies the websocket when detaching
+            redis_client (AsyncRedisClient): client of the app
+            role (enums.WebSocketRoleEnum, optional): viewers cannot send requests.
+                Defaults to annotator.
+            last_id (Optional[str], optional): stream id of the last response the
+                client received, the responses after it are replayed first.
+                Defaults to None.
+
+        Raises:
+            ValueError: last_id is not a stream entry id
+
+        Returns:
+            HubMember: its queue receives the responses of the task
+        """
+        if last_id is not None:
+            parse_stream_id(last_id)
+        hub = self.hubs.get(task_uuid)
+        try:
+            if hub is None:
+                hub = TaskHub(task_uuid, redis_client, self.bridge)
+                self.hubs[task_uuid] = hub
+                start_id = None
+                if last_id is not None and self.bridge.resumable:
+                    # the bridge attaches later than the replay reads, subscribing
+                    # from the tail read before it leaves no entry out between
+                    start_id = await read_last_response_id(
+                        redis_client.client, task_uuid
+                    )
+                await hub.start(start_id)
+            return await hub.attach(key, role, last_id)
+        except BaseException:
+            # the hub is stopped and removed if no other websocket is attached
+            await self.detach(task_uuid, key)
+            raise
+
+    async def detach(self, task_uuid: str, key: Any) -> None:
+        hub = self.hubs.get(task_uuid)
+        if hub is None:
+            return
+        hub.members.pop(key, None)
+        if not hub.members and self.hubs.get(task_uuid) is hub:
+            del self.hubs[task_uuid]
+            await hub.stop()
+
+    def get_metrics(self) -> Dict[str, Dict[str, int]]:
+        return {task_uuid: hub.get_metrics() for task_uuid, hub in self.hubs.items()}
+
+
+TASK_HUBS = TaskHubRegistry()
@@ -1,56 +1,131 @@
 import json
+import time
 import asyncio
-from typing import Dict, List
+from typing import Any, Dict, List, Optional
 
-from fastapi import WebSocket, WebSocketDisconnect
+from fastapi import WebSocket, WebSocketDisconnect, status
+from starlette.websockets import WebSocketState
 
+import schemas
 from settings import settings
 from db import get_redis_client
+from .websocket_protocol import (
+    MessageDecodeError,
+    WebSocketCodec,
+    get_codec,
+    select_subprotocol,
+)
+from .websocket_queue import ConnectionQueue, parse_msg_types
 
 
 class WebSocketManager:
     def __init__(self) -> None:
         self.activate_connections: List[WebSocket] = []
-        self.communication_queues: Dict[WebSocket, Dict[str, asyncio.Queue[dict]]] = (
-            dict()
-        )
+        self.communication_queues: Dict[WebSocket, Dict[str, Any]] = dict()
         self.connection_locks: Dict[WebSocket, asyncio.Lock] = dict()
+        self.codecs: Dict[WebSocket, WebSocketCodec] = dict()
+        self.connection_info: Dict[WebSocket, Dict[str, Any]] = dict()
+        self.coalesced_msg_types = parse_msg_types(
+            settings.WEBSOCKET_COALESCED_MSG_TYPES
+        )
 
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
+    async def connect(
+        self,
+        websocket: WebSocket,
+        task_uuid: Optional[str] = None,
+        role: Optional[str] = None,
+    ):
+        # JSON text unless the client offers the binary subprotocol
+        subprotocol = select_subprotocol(websocket.scope.get("subprotocols") or [])
+        await websocket.accept(subprotocol=subprotocol)
+        self.codecs[websocket] = get_codec(subprotocol)
         self.activate_connections.append(websocket)
         self.communication_queues[websocket] = {
-            "client": asyncio.Queue(),
-            "server": asyncio.Queue(),
+            # a full client queue stops reading the socket, tcp slows the client down
+            "client": asyncio.Queue(maxsize=settings.WEBSOCKET_RECEIVE_QUEUE_SIZE),
+            "server": ConnectionQueue(
+                maxsize=settings.WEBSOCKET_SEND_QUEUE_SIZE,
+                coalesced_msg_types=self.coalesced_msg_types,
+                send_timeout=settings.WEBSOCKET_SEND_TIMEOUT_SECONDS,
+                max_lag=settings.WEBSOCKET_MAX_LAG_SECONDS,
+            ),
         }
         self.connection_locks[websocket] = asyncio.Lock()
+        self.connection_info[websocket] = {
+            "task_uuid": task_uuid,
+            "subprotocol": subprotocol,
+            "role": role,
+            "connected_at": time.time(),
+        }
         print("Connection established")
 
-    async def disconnect(self, websocket: WebSocket):
+    async def disconnect(
+        self,
+        websocket: WebSocket,
+        code: int = status.WS_1000_NORMAL_CLOSURE,
+        reason: Optional[str] = None,
+    ):
+        # per-connection state is dropped first, closing the socket may fail
         if websocket in self.activate_connections:
             self.activate_connections.remove(websocket)
-        if websocket in self.communication_queues:
-            del self.communication_queues[websocket]
-        if websocket in self.connection_locks:
-            async with self.connection_locks[websocket]:
-                if websocket.client_state == 1:
-                    await websocket.close()
-                    del self.connection_locks[websocket]
+        self.communication_queues.pop(websocket, None)
+        self.codecs.pop(websocket, None)
+        self.connection_info.pop(websocket, None)
+        lock = self.connection_locks.pop(websocket, None)
+        if lock is None:
+            return
+        async with lock:
+            if websocket.client_state == WebSocketState.CONNECTED:
+                try:
+                    await websocket.close(code=code, reason=reason)
+                except RuntimeError as e:
+                    print(f"Error closing connection. {e}")
         print("Connection terminated")
 
+    def get_metrics(self) -> List[Dict[str, Any]]:
+        """Queue depth and lag of every open connection"""
+        metrics = []
+        now = time.time()
+        for websocket, queues in list(self.communication_queues.items()):
+            info = self.connection_info.get(websocket, {})
+            metrics.append(
+                {
+                    "task_uuid": info.get("task_uuid"),
+                    "subprotocol": info.get("subprotocol"),
+                    "role": info.get("role"),
+                    "connected_seconds": now - info.get("connected_at", now),
+                    "receive_depth": queues["client"].qsize(),
+                    "send": queues["server"].get_metrics(),
+                }
+            )
+        return metrics
+
     async def receive_message(self, websocket: WebSocket):
         try:
             while True:
                 #async with self.connection_locks[websocket]:
                 #    data = await websocket.receive_text()
-                data = await websocket.receive_text()
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(message.get("code", 1000))
+                data = message.get("text")
+                if data is None:
+                    data = message.get("bytes")
                 try:
-                    await self.communication_queues[websocket]["client"].put(
-                        json.loads(data)
-                    )
+                    queues = self.communication_queues[websocket]
+                    codec = self.codecs[websocket]
                 except KeyError:
                     print("Error receiving message. Connection closed.")
                     break
+                try:
+                    data = codec.to_json(data)
+                except MessageDecodeError as e:
+                    # the client is answered, the connection stays open
+                    await queues["server"].put(
+                        schemas.ErrorResponseCover(message=str(e)).model_dump()
+                    )
+                    continue
+                await queues["client"].put(data)
         except asyncio.CancelledError or WebSocketDisconnect:
             await self.disconnect(websocket)
 
@@ -59,15 +134,22 @@ class WebSocketManager:
             while True:
                 try:
                     data = await self.communication_queues[websocket]["server"].get()
+                    codec = self.codecs[websocket]
                 except KeyError:
                     print("Error sending message. Connection closed.")
                     break
                 try:
                     #async with self.connection_locks[websocket]:
                     #    await websocket.send_text(json.dumps(data))
-                    to_send = json.dumps(data) if isinstance(data, dict) else data
-                    await websocket.send_text(to_send)
+                    to_send = codec.encode(data)
+                    if codec.binary:
+                        await websocket.send_bytes(to_send)
+                    else:
+                        await websocket.send_text(to_send)
                 except RuntimeError as e:
                     print(f"Error sending message. Connection closed. {e}")
         except asyncio.CancelledError or WebSocketDisconnect:
             await self.disconnect(websocket)
+
+
+WSMANAGER = WebSocketManager()
@@ -0,0 +1,103 @@
+import json
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Union
+
+import msgpack
+
+from settings import settings
+
+JSON_SUBPROTOCOL = "autolabel.json"
+MSGPACK_SUBPROTOCOL = "autolabel.msgpack"
+
+
+class MessageDecodeError(ValueError):
+    """A client message could not be converted to JSON"""
+
+
+@lru_cache(maxsize=64)
+def _json_to_msgpack(data: Union[str, bytes]) -> bytes:
+    # a response broadcast to every socket of a task is converted only once
+    return msgpack.packb(json.loads(data))
+
+
+class WebSocketCodec:
+    """JSON text messages, used when the client negotiates no subprotocol"""
+
+    binary = False
+
+    def decode(self, payload: Union[str, bytes]) -> Dict[str, Any]:
+        return json.loads(payload)
+
+    def to_json(self, payload: Union[str, bytes]) -> Union[str, bytes]:
+        """Client message as JSON, validated and forwarded without parsing"""
+        return payload
+
+    def encode(self, data: Union[Dict[str, Any], str]) -> Union[str, bytes]:
+        # worker responses arrive as JSON already
+        return json.dumps(data) if isinstance(data, dict) else data
+
+
+class MsgpackCodec(WebSocketCodec):
+    """MessagePack binary messages
+
+    Floats keep double precision, as in the JSON the worker sends. Text
+    frames are still read as JSON.
+    """
+
+    binary = True
+
+    def decode(self, payload: Union[str, bytes]) -> Dict[str, Any]:
+        if isinstance(payload, str):
+            return json.loads(payload)
+        return msgpack.unpackb(payload)
+
+    def to_json(self, payload: Union[str, bytes]) -> Union[str, bytes]:
+        """Client message as JSON
+
+        Raises:
+            MessageDecodeError: malformed MessagePack, or values JSON cannot hold
+        """
+        if isinstance(payload, str):
+            return payload
+        try:
+            return json.dumps(msgpack.unpackb(payload))
+        except (ValueError, TypeError) as e:
+            # msgpack format errors are ValueErrors, bytes values are TypeErrors
+            raise MessageDecodeError(
+                f"Invalid MessagePack message: {e or type(e).__name__}"
+            ) from e
+
+    def encode(self, data: Union[Dict[str, Any], str]) -> Union[str, bytes]:
+        if isinstance(data, (str, bytes)):
+            return _json_to_msgpack(data)
+        return msgpack.packb(data)
+
+
+CODECS: Dict[str, WebSocketCodec] = {
+    JSON_SUBPROTOCOL: WebSocketCodec(),
+    MSGPACK_SUBPROTOCOL: MsgpackCodec(),
+}
+
+
+def select_subprotocol(offered: List[str]) -> Optional[str]:
+    """First subprotocol the client offered that the server supports
+
+    Args:
+        offered (List[str]): Sec-WebSocket-Protocol values in client preference order
+
+    Returns:
+        Optional[str]: accepted subprotocol, None for plain JSON
+    """
+    for subprotocol in offered:
+        if (
+            subprotocol == MSGPACK_SUBPROTOCOL
+            and not settings.WEBSOCKET_MSGPACK_ENABLED
+        ):
+            continue
+        if subprotocol in CODECS:
+            return subprotocol
+    return None
+
+
+def get_codec(subprotocol: Optional[str]) -> WebSocketCodec:
+    return CODECS.get(subprotocol or JSON_SUBPROTOCOL, CODECS[JSON_SUBPROTOCOL])
@@ -0,0 +1,147 @@
+import re
+import time
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Union
+
+# msg_type is looked up in the head of worker JSON, results are not parsed
+_MSG_TYPE_PATTERN = re.compile(r'"msg_type"\s*:\s*"([^"]*)"')
+_MSG_TYPE_SEARCH_LENGTH = 512
+
+Message = Union[Dict[str, Any], str]
+
+
+class ClientTooSlowError(Exception):
+    """The client does not read its messages fast enough to be served"""
+
+
+def get_msg_type(data: Message) -> Optional[str]:
+    if isinstance(data, dict):
+        return data.get("msg_type")
+    match = _MSG_TYPE_PATTERN.search(data, 0, _MSG_TYPE_SEARCH_LENGTH)
+    return match.group(1) if match else None
+
+
+class _QueuedMessage:
+    __slots__ = ("data", "msg_type", "enqueued_at")
+
+    def __init__(self, data: Message, msg_type: Optional[str]) -> None:
+        self.data = data
+        self.msg_type = msg_type
+        self.enqueued_at = time.monotonic()
+
+
+class ConnectionQueue:
+    """Bounded queue of the messages a websocket has yet to send
+
+    Message types listed as coalesced (progress updates) replace the queued
+    message of the same type, a full queue drops them. Every other message
+    is a result and is never dropped: a full queue makes the producer wait,
+    and a client that stays behind for the send timeout, or whose oldest
+    message waits longer than the maximum lag, raises ClientTooSlowError.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        coalesced_msg_types: Iterable[str] = (),
+        send_timeout: float = 10,
+        max_lag: float = 30,
+    ) -> None:
+        self.maxsize = max(maxsize, 1)
+        self.coalesced_msg_types = set(coalesced_msg_types)
+        self.send_timeout = send_timeout
+        self.max_lag = max_lag
+
+        self._messages: Deque[_QueuedMessage] = deque()
+        self._coalesced: Dict[str, _QueuedMessage] = dict()
+        self._changed = asyncio.Condition()
+
+        self.enqueued = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.last_send_lag = 0.0
+
+    def qsize(self) -> int:
+        return len(self._messages)
+
+    def full(self) -> bool:
+        return len(self._messages) >= self.maxsize
+
+    @property
+    def lag(self) -> float:
+        """Seconds the oldest queued message has been waiting"""
+        if not self._messages:
+            return 0.0
+        return time.monotonic() - self._messages[0].enqueued_at
+
+    def _check_lag(self) -> None:
+        if self.lag > self.max_lag:
+            raise ClientTooSlowError(
+                f"Oldest message is waiting for {self.lag:.1f} seconds"
+            )
+
+    def _append(self, message: _QueuedMessage) -> None:
+        self._messages.append(message)
+        if message.msg_type in self.coalesced_msg_types:
+            self._coalesced[message.msg_type] = message
+        self.enqueued += 1
+        self.max_depth = max(self.max_depth, len(self._messages))
+        self._changed.notify_all()
+
+    async def put(self, data: Message) -> None:
+        msg_type = get_msg_type(data)
+        async with self._changed:
+            self._check_lag()
+            if msg_type in self.coalesced_msg_types:
+                pending = self._coalesced.get(msg_type)
+                if pending is not None:
+                    # keeps its place in the queue, only the latest update is sent
+                    pending.data = data
+                    self.coalesced += 1
+                elif self.full():
+                    self.dropped += 1
+                else:
+                    self._append(_QueuedMessage(data, msg_type))
+                return
+
+            try:
+                await asyncio.wait_for(
+                    self._changed.wait_for(lambda: not self.full()),
+                    self.send_timeout,
+                )
+            except asyncio.TimeoutError:
+                raise ClientTooSlowError(
+                    f"Send queue stayed full for {self.send_timeout} seconds"
+                )
+            self._append(_QueuedMessage(data, msg_type))
+
+    async def get(self) -> Message:
+        async with self._changed:
+            await self._changed.wait_for(lambda: bool(self._messages))
+            message = self._messages.popleft()
+            if self._coalesced.get(message.msg_type) is message:
+                del self._coalesced[message.msg_type]
+            self.sent += 1
+            self.last_send_lag = time.monotonic() - message.enqueued_at
+            self._changed.notify_all()
+            return message.data
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            "depth": self.qsize(),
+            "max_depth": self.max_depth,
+            "maxsize": self.maxsize,
+            "lag_seconds": self.lag,
+            "last_send_lag_seconds": self.last_send_lag,
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+        }
+
+
+def parse_msg_types(value: str) -> List[str]:
+    return [msg_type.strip() for msg_type in value.split(",") if msg_type.strip()]
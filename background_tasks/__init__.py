@@ -1 +1,18 @@
 from .video_processing import extract_frames, convert_video_to_mp4
+from .video_reaper import run_video_reaper, wake_video_reaper
+from .video_packaging import (
+    package_video_segments,
+    create_proxy_video,
+    MASTER_PLAYLIST_NAME,
+)
+from .annotation_export import (
+    get_annotation_row,
+    upsert_annotations,
+    create_export_job,
+    get_export_job,
+    run_export_workers,
+)
+from .sam2_leases import run_sam2_lease_keeper
+from .annotation_indexer import run_annotation_indexer, ANNOTATION_INDEXER
+from .task_streams import run_task_stream_trimmer
+from .task_registry import run_task_registry_reconciler
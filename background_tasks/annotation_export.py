@@ -0,0 +1,380 @@
+import json
+import uuid
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy.dialects.postgresql import insert
+
+import schemas
+import database_models as dbmodels
+
+from db import get_db, get_redis_client, RedisClient
+from enums import AnnotationStatusEnum, ExportJobStatusEnum as ExportJobStatus
+from settings import settings
+from utils import (
+    get_frame_mapping,
+    get_extracted_frame_count,
+    iter_annotation_frame_chunks,
+    get_annotation_records,
+    encode_annotation,
+)
+
+EXPORT_JOB_QUEUE_NAME = "export:queue"
+EXPORT_ACTIVE_JOBS_KEY = "export:jobs:active"
+EXPORT_JOB_POP_TIMEOUT_SECONDS = 5
+# a worker that failed waits this long, doubled after every failure in a row
+EXPORT_WORKER_BACKOFF_SECONDS = 1
+EXPORT_WORKER_MAX_BACKOFF_SECONDS = 60
+
+
+def get_annotation_row(task_id: int, raw_annotation: bytes) -> Optional[Dict[str, Any]]:
+    """Builds an annotation table row from an ImageAnnotation JSON document
+
+    With ANNOTATION_CODEC set to "float32" or "int16" the annotation is stored
+    binary encoded in annotation_encoded and annotation_data is left empty.
+
+    Args:
+        task_id (int): task id
+        raw_annotation (bytes): ImageAnnotation JSON
+
+    Returns:
+        Optional[Dict[str, Any]]: row values, None if the annotation has no frame index
+    """
+    annotation = json.loads(raw_annotation)
+    meta = annotation.get("meta") or dict()
+    if meta.get("frame_idx") is None:
+        return None
+    annotation_data, annotation_encoded = raw_annotation.decode("utf-8"), None
+    if settings.ANNOTATION_CODEC != "json":
+        annotation_data = None
+        annotation_encoded = encode_annotation(
+            annotation, coordinate_type=settings.ANNOTATION_CODEC
+        )
+    return {
+        "task_id": task_id,
+        "image_id": annotation["image_id"],
+        "image_path": annotation["image_path"],
+        "annotation_data": annotation_data,
+        "annotation_encoded": annotation_encoded,
+        "annotation_type": "all",
+        "frame_idx": meta["frame_idx"],
+        "annotated_at": meta.get("annotated_at") or datetime.now(timezone.utc),
+    }
+
+
+def _iter_batches(
+    rows: Iterable[Dict[str, Any]], batch_size: int
+) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def upsert_annotations(
+    db,
+    rows: Iterable[Dict[str, Any]],
+    batch_size: int = settings.ANNOTATION_EXPORT_BATCH_SIZE,
+) -> int:
+    """Writes annotation rows with INSERT ... ON CONFLICT DO UPDATE in batches
+
+    Each batch is a single multi-row statement, frames exported before are
+    updated in place through the (task_id, image_id) unique constraint, so
+    re-exports do not look rows up one by one.
+    The caller commits.
+
+    Args:
+        db (Session): DB Session
+        rows (Iterable[Dict[str, Any]]): rows from get_annotation_row
+        batch_size (int, optional): rows per statement. Defaults to settings.ANNOTATION_EXPORT_BATCH_SIZE.
+
+    Returns:
+        int: number of written rows
+    """
+    written = 0
+    for batch in _iter_batches(rows, batch_size):
+        # a statement cannot update the same row twice, keep the last one
+        batch = list({row["image_id"]: row for row in batch}.values())
+        statement = insert(dbmodels.Annotation).values(batch)
+        statement = statement.on_conflict_do_update(
+            constraint="uq_annotation_task_id_image_id",
+            set_={
+                "image_path": statement.excluded.image_path,
+                "annotation_data": statement.excluded.annotation_data,
+                "annotation_encoded": statement.excluded.annotation_encoded,
+                "annotation_type": statement.excluded.annotation_type,
+                "frame_idx": statement.excluded.frame_idx,
+                "annotated_at": statement.excluded.annotated_at,
+                "is_active": True,
+            },
+        )
+        db.execute(statement)
+        written += len(batch)
+    return written
+
+
+def _get_export_job_key(job_id: str) -> str:
+    return f"export:job:{job_id}"
+
+
+def _get_export_job_lock_name(job_id: str) -> str:
+    return f"export:job:{job_id}:lock"
+
+
+def _get_task_export_job_key(task_uuid: str) -> str:
+    return f"task:{task_uuid}:export:job"
+
+
+def get_export_job(rcli: RedisClient, job_id: str) -> Optional[schemas.ExportJob]:
+    data = rcli.client.hgetall(_get_export_job_key(job_id))
+    if not data:
+        return None
+    return schemas.ExportJob.model_validate(
+        {key.decode("utf-8"): value.decode("utf-8") for key, value in data.items()}
+    )
+
+
+def _update_export_job(rcli: RedisClient, job_id: str, **fields) -> None:
+    fields["updated_at"] = datetime.now(timezone.utc).isoformat()
+    mapping = {
+        key: value.value if isinstance(value, ExportJobStatus) else str(value)
+        for key, value in fields.items()
+    }
+    rcli.client.hset(_get_export_job_key(job_id), mapping=mapping)
+
+
+def create_export_job(
+    rcli: RedisClient,
+    task_uuid: str,
+    polygon_simplification: Optional[schemas.PolygonSimplification] = None,
+) -> schemas.ExportJob:
+    """Queues an export of the task annotations, a task has at most one active job
+
+    Args:
+        rcli (RedisClient): Redis client
+        task_uuid (str): task uuid
+        polygon_simplification (Optional[schemas.PolygonSimplification], optional): applied to polygons before they are stored. Defaults to None.
+
+    Returns:
+        schemas.ExportJob: the queued job, or the active job of the task
+    """
+    with rcli.get_lock(f"task:{task_uuid}:export:lock", timeout=10):
+        active_job_id = rcli.get(_get_task_export_job_key(task_uuid))
+        if active_job_id:
+            active_job = get_export_job(rcli, active_job_id)
+            if active_job and active_job.status in [
+                ExportJobStatus.QUEUED,
+                ExportJobStatus.RUNNING,
+            ]:
+                return active_job
+
+        now = datetime.now(timezone.utc)
+        job = schemas.ExportJob(
+            job_id=str(uuid.uuid4()),
+            task_uuid=task_uuid,
+            status=ExportJobStatus.QUEUED,
+            polygon_simplification=polygon_simplification,
+            created_at=now,
+            updated_at=now,
+        )
+        mapping = job.model_dump(
+            mode="json", exclude_none=True, exclude={"polygon_simplification"}
+        )
+        if polygon_simplification is not None:
+            mapping["polygon_simplification"] = polygon_simplification.model_dump_json()
+        pipeline = rcli.client.pipeline(transaction=True)
+        pipeline.hset(_get_export_job_key(job.job_id), mapping=mapping)
+        pipeline.set(_get_task_export_job_key(task_uuid), job.job_id)
+        pipeline.sadd(EXPORT_ACTIVE_JOBS_KEY, job.job_id)
+        pipeline.lpush(EXPORT_JOB_QUEUE_NAME, job.job_id)
+        pipeline.execute()
+        return job
+
+
+def _finish_export_job(rcli: RedisClient, job_id: str, **fields) -> None:
+    _update_export_job(rcli, job_id, **fields)
+    rcli.client.srem(EXPORT_ACTIVE_JOBS_KEY, job_id)
+
+
+def run_export_job(job_id: str, rcli: RedisClient) -> None:
+    """Writes task annotations to the db batch by batch.
+
+    Every batch is committed on its own and checkpointed in the job, a job
+    interrupted by a crash continues after the last committed frame.
+    Upserts are idempotent, a batch committed but not checkpointed is
+    written again without harm.
+
+    Args:
+        job_id (str): export job id
+        rcli (RedisClient): Redis client
+    """
+    lock = rcli.get_lock(
+        _get_export_job_lock_name(job_id),
+        timeout=settings.EXPORT_JOB_LOCK_TIMEOUT_SECONDS,
+    )
+    if not lock.acquire(blocking=False):
+        # another worker runs the job
+        return
+
+    db = next(get_db())
+    try:
+        job = get_export_job(rcli, job_id)
+        if not job or job.status not in [
+            ExportJobStatus.QUEUED,
+            ExportJobStatus.RUNNING,
+        ]:
+            return
+
+        task = (
+            db.query(dbmodels.Task)
+            .filter(dbmodels.Task.task_uuid == job.task_uuid)
+            .first()
+        )
+        if not task:
+            raise ValueError(f"Task with uuid {job.task_uuid} not found in the db")
+        video = (
+            db.query(dbmodels.Video)
+            .filter(dbmodels.Video.video_id == task.video_id)
+            .first()
+        )
+        frame_count = get_extracted_frame_count(video) if video else None
+        frame_mapping = get_frame_mapping(video) if video else None
+
+        start_frame = job.last_frame + 1 if job.last_frame is not None else 0
+        exported_frames = job.exported_frames
+        progress = {"status": ExportJobStatus.RUNNING}
+        if frame_count is not None:
+            progress["total_frames"] = frame_count
+        _update_export_job(rcli, job_id, **progress)
+
+        for frame_indices in iter_annotation_frame_chunks(
+            job.task_uuid,
+            frame_count,
+            rcli,
+            chunk_size=settings.ANNOTATION_EXPORT_BATCH_SIZE,
+            start_frame=start_frame,
+        ):
+            records = get_annotation_records(
+                job.task_uuid,
+                frame_indices,
+                frame_mapping,
+                "all",
+                rcli,
+                simplification=job.polygon_simplification,
+            )
+            rows = [get_annotation_row(task.task_id, record) for record in records]
+            exported_frames += upsert_annotations(db, [row for row in rows if row])
+            db.commit()
+            _update_export_job(
+                rcli,
+                job_id,
+                exported_frames=exported_frames,
+                last_frame=frame_indices[-1],
+            )
+            # keep the job owned while it makes progress
+            lock.reacquire()
+
+        if not exported_frames:
+            raise ValueError(
+                f"Annotations for task with uuid {job.task_uuid} not found"
+            )
+
+        task.exported_at = datetime.now(timezone.utc)
+        db.commit()
+        rcli.set(
+            f"task:{job.task_uuid}:annotation:status",
+            AnnotationStatusEnum.EXPORTED.value,
+        )
+        _finish_export_job(rcli, job_id, status=ExportJobStatus.COMPLETED)
+    except Exception as e:
+        db.rollback()
+        print(f"Error in export job {job_id}: {e}")
+        _finish_export_job(rcli, job_id, status=ExportJobStatus.FAILED, error=e)
+    finally:
+        db.close()
+        if lock.owned():
+            lock.release()
+
+
+def requeue_interrupted_export_jobs(rcli: RedisClient) -> int:
+    """Queues active jobs again whose worker is gone.
+
+    A running job without its lock belongs to a crashed worker, a queued job
+    missing from the queue was popped by one.
+
+    Returns:
+        int: number of requeued jobs
+    """
+    requeued = 0
+    for job_id in rcli.client.smembers(EXPORT_ACTIVE_JOBS_KEY):
+        job_id = job_id.decode("utf-8")
+        job = get_export_job(rcli, job_id)
+        if job is None:
+            rcli.client.srem(EXPORT_ACTIVE_JOBS_KEY, job_id)
+            continue
+        if rcli.client.exists(_get_export_job_lock_name(job_id)):
+            continue
+        if (
+            job.status == ExportJobStatus.QUEUED
+            and rcli.client.lpos(EXPORT_JOB_QUEUE_NAME, job_id) is not None
+        ):
+            continue
+        _update_export_job(rcli, job_id, status=ExportJobStatus.QUEUED)
+        rcli.client.lpush(EXPORT_JOB_QUEUE_NAME, job_id)
+        requeued += 1
+    return requeued
+
+
+def _pop_export_job(rcli: RedisClient) -> Optional[str]:
+    popped = rcli.dequeue(EXPORT_JOB_QUEUE_NAME, timeout=EXPORT_JOB_POP_TIMEOUT_SECONDS)
+    return popped[1].decode("utf-8") if popped else None
+
+
+async def _run_export_worker() -> None:
+    backoff = EXPORT_WORKER_BACKOFF_SECONDS
+    while True:
+        try:
+            rcli = get_redis_client()
+            if rcli is None:
+                raise ConnectionError("Redis client is not available")
+            job_id = await asyncio.to_thread(_pop_export_job, rcli)
+            if job_id:
+                await asyncio.to_thread(run_export_job, job_id, rcli)
+            backoff = EXPORT_WORKER_BACKOFF_SECONDS
+        except Exception as e:
+            # a job left behind is requeued once its lock expires
+            print(f"Error in export worker, retrying in {backoff} seconds: {e}")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, EXPORT_WORKER_MAX_BACKOFF_SECONDS)
+
+
+async def run_export_workers() -> None:
+    """Runs the export worker pool, and requeues jobs of crashed workers."""
+    workers = [
+        asyncio.create_task(_run_export_worker())
+        for _ in range(settings.EXPORT_WORKER_COUNT)
+    ]
+    try:
+        while True:
+            try:
+                rcli = get_redis_client()
+                if rcli is None:
+                    raise ConnectionError("Redis client is not available")
+                requeued = await asyncio.to_thread(
+                    requeue_interrupted_export_jobs, rcli
+                )
+                if requeued:
+                    print(f"Export jobs requeued: {requeued}")
+            except Exception as e:
+                print(f"Error requeuing export jobs: {e}")
+            await asyncio.sleep(settings.EXPORT_JOB_LOCK_TIMEOUT_SECONDS)
+    except asyncio.CancelledError:
+        print("Export workers cancelled")
+    finally:
+        for worker in workers:
+            worker.cancel()
@@ -0,0 +1,177 @@
+import re
+import time
+import asyncio
+from collections import defaultdict
+from typing import Dict, Optional, Set
+
+from redis.exceptions import RedisError
+
+from db import AsyncRedisClient, get_redis_client
+from utils import AnnotationStore, bump_annotation_index_generation
+
+# keyspace events of generic commands, strings, expired and evicted keys
+KEYSPACE_EVENT_FLAGS = "Kg$xe"
+# the worker writes and deletes task:{uuid}:annotation:{frame}
+_ANNOTATION_CHANNEL_PATTERN = re.compile(
+    rb"^__keyspace@\d+__:task:([^:]+):annotation:(\d+)$"
+)
+_ANNOTATION_EVENTS = {b"set", b"del", b"expired", b"evicted"}
+
+
+async def _get_keyspace_events(redis_client: AsyncRedisClient) -> str:
+    config = await redis_client.client.config_get("notify-keyspace-events")
+    events = next(iter(config.values()), b"")
+    if isinstance(events, bytes):
+        events = events.decode("utf-8")
+    return events
+
+
+def _get_missing_flags(events: str) -> str:
+    # A is the alias of every key event class
+    enabled = events.replace("A", "g$lshzxet")
+    return "".join(flag for flag in KEYSPACE_EVENT_FLAGS if flag not in enabled)
+
+
+async def enable_keyspace_notifications(redis_client: AsyncRedisClient) -> str:
+    """Adds the events the indexer needs to notify-keyspace-events
+
+    The setting is read back afterwards, CONFIG SET may be disabled or
+    renamed, or the setting changed by someone else.
+
+    Returns:
+        str: flags still missing, empty if notifications are enabled
+    """
+    events = await _get_keyspace_events(redis_client)
+    missing = _get_missing_flags(events)
+    if missing:
+        try:
+            await redis_client.client.config_set(
+                "notify-keyspace-events", events + missing
+            )
+        except RedisError as e:
+            print(f"Error enabling keyspace notifications: {e}")
+        missing = _get_missing_flags(await _get_keyspace_events(redis_client))
+    return missing
+
+
+def _get_sync_client():
+    rcli = get_redis_client()
+    if rcli is None:
+        raise RedisError("Redis client is not available")
+    return rcli
+
+
+def _bump_index_generation() -> int:
+    return bump_annotation_index_generation(_get_sync_client())
+
+
+def _index_annotation_frames(touched: Dict[str, Set[int]]) -> None:
+    rcli = _get_sync_client()
+    for task_uuid, frame_indices in touched.items():
+        AnnotationStore(rcli, task_uuid).index_frames(frame_indices)
+
+
+class AnnotationIndexer:
+    """Indexes the annotations the SAM2 worker writes, runs in every API replica.
+
+    Writes are followed through keyspace notifications, so the indexes and
+    versions stay current whether or not a websocket of the task is open.
+    Frames touched within batch_seconds are indexed together. Indexing is
+    idempotent, every replica may index the same write.
+
+    Notifications sent while nobody listened are lost, so every subscription
+    bumps the index generation and each index is rebuilt by its next reader.
+    While notifications are not enabled on the server the indexer is not
+    following, readers then rebuild the index on every read.
+    """
+
+    def __init__(
+        self,
+        batch_seconds: float = 0.1,
+        batch_size: int = 1000,
+        check_interval: float = 30,
+    ) -> None:
+        self.batch_seconds = batch_seconds
+        self.batch_size = batch_size
+        self.check_interval = check_interval
+        self.is_following = False
+        self.missing_flags: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self.subscriptions = 0
+        self.indexed_frames = 0
+
+    def get_metrics(self) -> Dict:
+        return {
+            "following": self.is_following,
+            "missing_keyspace_event_flags": self.missing_flags,
+            "last_error": self.last_error,
+            "subscriptions": self.subscriptions,
+            "indexed_frames": self.indexed_frames,
+        }
+
+    async def _check_notifications(self, redis_client: AsyncRedisClient) -> bool:
+        self.missing_flags = await enable_keyspace_notifications(redis_client)
+        if self.missing_flags:
+            self.last_error = (
+                f"notify-keyspace-events lacks {self.missing_flags}, "
+                "annotation indexes are rebuilt on every read"
+            )
+            print(self.last_error)
+            return False
+        return True
+
+    async def _follow(self, pubsub) -> None:
+        checked_at = time.monotonic()
+        while True:
+            touched: Dict[str, Set[int]] = defaultdict(set)
+            message = await pubsub.get_message(timeout=1.0)
+            deadline = time.monotonic() + self.batch_seconds
+            count = 0
+            while message is not None and count < self.batch_size:
+                if message["data"] in _ANNOTATION_EVENTS:
+                    match = _ANNOTATION_CHANNEL_PATTERN.match(message["channel"])
+                    if match:
+                        touched[match.group(1).decode("utf-8")].add(int(match.group(2)))
+                        count += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                message = await pubsub.get_message(timeout=remaining)
+            if touched:
+                await asyncio.to_thread(_index_annotation_frames, touched)
+                self.indexed_frames += count
+            if time.monotonic() - checked_at >= self.check_interval:
+                return
+
+    async def run(self, redis_client: AsyncRedisClient) -> None:
+        db = redis_client.pool.connection_kwargs.get("db", 0)
+        channel_pattern = f"__keyspace@{db}__:task:*:annotation:*"
+        try:
+            while True:
+                pubsub = redis_client.client.pubsub(ignore_subscribe_messages=True)
+                try:
+                    await pubsub.psubscribe(channel_pattern)
+                    while await self._check_notifications(redis_client):
+                        if not self.is_following:
+                            # writes before the subscription may be unindexed
+                            await asyncio.to_thread(_bump_index_generation)
+                            self.subscriptions += 1
+                            self.is_following = True
+                            self.last_error = None
+                        await self._follow(pubsub)
+                except RedisError as e:
+                    self.last_error = f"Error indexing annotations: {e}"
+                    print(self.last_error)
+                finally:
+                    self.is_following = False
+                    await pubsub.aclose()
+                await asyncio.sleep(self.check_interval if self.missing_flags else 1)
+        except asyncio.CancelledError:
+            print("Annotation indexer cancelled")
+
+
+ANNOTATION_INDEXER = AnnotationIndexer()
+
+
+async def run_annotation_indexer(redis_client: AsyncRedisClient) -> None:
+    await ANNOTATION_INDEXER.run(redis_client)
@@ -0,0 +1,37 @@
+import asyncio
+
+from redis.exceptions import RedisError
+
+from db import AsyncRedisClient
+from enums import TaskStatusEnum
+from settings import settings
+
+# the model of a task in these statuses is gone, its lease is released
+TERMINAL_TASK_STATUSES = [
+    TaskStatusEnum.FAILED.value,
+    TaskStatusEnum.CANCELLED.value,
+    TaskStatusEnum.STOPPED.value,
+]
+
+
+async def run_sam2_lease_keeper(redis_client: AsyncRedisClient) -> None:
+    """Heartbeat of the SAM2 model leases, runs in every API replica.
+
+    Leases of failed or stopped tasks are released, and leases nobody renewed
+    within their ttl, e.g. of a crashed worker or of a replica that crashed
+    while initializing a task, are reclaimed. With SAM2_LEASE_RENEWED_BY_API
+    the leases of tasks with a live worker heartbeat are renewed.
+    """
+    try:
+        while True:
+            try:
+                active, released = await redis_client.renew_sam2_leases(
+                    TERMINAL_TASK_STATUSES, renew=settings.SAM2_LEASE_RENEWED_BY_API
+                )
+                if released:
+                    print(f"SAM2 leases released: {released}, active: {active}")
+            except RedisError as e:
+                print(f"Error renewing SAM2 leases: {e}")
+            await asyncio.sleep(settings.SAM2_LEASE_HEARTBEAT_SECONDS)
+    except asyncio.CancelledError:
+        print("SAM2 lease keeper cancelled")
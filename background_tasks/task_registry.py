@@ -0,0 +1,29 @@
+import asyncio
+
+from redis.exceptions import RedisError
+
+from db import AsyncRedisClient
+from settings import settings
+
+
+async def run_task_registry_reconciler(redis_client: AsyncRedisClient) -> None:
+    """Keeps the task registry in sync with the task statuses workers write.
+
+    Listing tasks only reads the registry, its status hash and its per-status
+    sorted sets. Statuses written by SAM2 workers and tasks whose status
+    expired are picked up here.
+    """
+    try:
+        while True:
+            try:
+                updated, unregistered = await redis_client.reconcile_task_registry()
+                if updated or unregistered:
+                    print(
+                        f"Task registry reconciled, updated: {updated}, "
+                        f"unregistered: {unregistered}"
+                    )
+            except RedisError as e:
+                print(f"Error reconciling task registry: {e}")
+            await asyncio.sleep(settings.TASK_REGISTRY_RECONCILE_INTERVAL_SECONDS)
+    except asyncio.CancelledError:
+        print("Task registry reconciler cancelled")
@@ -0,0 +1,27 @@
+import asyncio
+
+from redis.exceptions import RedisError
+
+from db import AsyncRedisClient
+from settings import settings
+
+
+async def run_task_stream_trimmer(redis_client: AsyncRedisClient) -> None:
+    """Keeps the response streams of all tasks within TASK_STREAM_MAX_LENGTH.
+
+    Runs only with the stream transport. Streams are trimmed whether or not a
+    websocket of their task is open in any replica.
+    """
+    if settings.TASK_CHANNEL_TRANSPORT != "stream":
+        return
+    try:
+        while True:
+            try:
+                trimmed = await redis_client.trim_task_streams()
+                if trimmed:
+                    print(f"Task stream entries trimmed: {trimmed}")
+            except RedisError as e:
+                print(f"Error trimming task streams: {e}")
+            await asyncio.sleep(settings.TASK_STREAM_TRIM_INTERVAL_SECONDS)
+    except asyncio.CancelledError:
+        print("Task stream trimmer cancelled")
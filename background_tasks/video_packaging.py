@@ -0,0 +1,299 @@
+import os
+import shutil
+import tempfile
+import subprocess
+from typing import List, Tuple
+
+import database_models as dbmodels
+
+from db import get_db
+from enums import VideoStatusEnum as VideoStatus
+from settings import settings
+
+MASTER_PLAYLIST_NAME = "master.m3u8"
+
+
+def parse_renditions(renditions: str) -> List[Tuple[int, str]]:
+    """Parses "<height>:<bitrate>" pairs, e.g. "720:2500k,360:800k"
+
+    Args:
+        renditions (str): comma separated rendition definitions
+
+    Returns:
+        List[Tuple[int, str]]: (height, bitrate) pairs
+    """
+    out = []
+    for rendition in renditions.split(","):
+        if not rendition.strip():
+            continue
+        height, bitrate = rendition.strip().split(":")
+        out.append((int(height), bitrate))
+    return out
+
+
+def _bitrate_in_kbits(bitrate: str) -> int:
+    if bitrate.lower().endswith("k"):
+        return int(float(bitrate[:-1]))
+    if bitrate.lower().endswith("m"):
+        return int(float(bitrate[:-1]) * 1000)
+    return int(float(bitrate) / 1000)
+
+
+def get_hls_command(
+    video_path: str,
+    output_path: str,
+    renditions: List[Tuple[int, str]],
+    fps: float,
+    segment_duration: int = 2,
+    gop_seconds: float = 1,
+) -> List[str]:
+    """Return ffmpeg command packaging a video as HLS with fMP4 segments.
+
+    Every rendition uses a fixed, short GOP aligned across renditions so the
+    player can start decoding at any segment boundary and switch bitrates.
+
+    Args:
+        video_path (str): src video path
+        output_path (str): dst directory, master playlist is written here
+        renditions (List[Tuple[int, str]]): (height, bitrate) pairs
+        fps (float): fps of the video, used for GOP size
+        segment_duration (int, optional): target segment duration in seconds. Defaults to 2.
+        gop_seconds (float, optional): keyframe interval in seconds. Defaults to 1.
+
+    Returns:
+        List[str]: command to run with subprocess.run
+    """
+    gop_size = str(max(int(round(fps * gop_seconds)), 1))
+    split_outputs = "".join(f"[v{idx}]" for idx in range(len(renditions)))
+    filters = [f"[0:v]split={len(renditions)}{split_outputs}"]
+    for idx, (height, _) in enumerate(renditions):
+        filters.append(f"[v{idx}]scale=-2:'min({height},ih)'[v{idx}out]")
+
+    command = [
+        "ffmpeg",
+        "-y",
+        "-i",
+        video_path,
+        "-filter_complex",
+        ";".join(filters),
+    ]
+    for idx, (_, bitrate) in enumerate(renditions):
+        command.extend(
+            [
+                "-map",
+                f"[v{idx}out]",
+                f"-c:v:{idx}",
+                "libx264",
+                f"-b:v:{idx}",
+                bitrate,
+                f"-maxrate:v:{idx}",
+                bitrate,
+                f"-bufsize:v:{idx}",
+                f"{_bitrate_in_kbits(bitrate) * 2}k",
+            ]
+        )
+    command.extend(
+        [
+            "-pix_fmt",
+            "yuv420p",
+            "-g",
+            gop_size,
+            "-keyint_min",
+            gop_size,
+            "-sc_threshold",
+            "0",
+            "-an",
+            "-f",
+            "hls",
+            "-hls_time",
+            str(segment_duration),
+            "-hls_playlist_type",
+            "vod",
+            "-hls_segment_type",
+            "fmp4",
+            "-hls_flags",
+            "independent_segments",
+            "-hls_fmp4_init_filename",
+            "init.mp4",
+            "-master_pl_name",
+            MASTER_PLAYLIST_NAME,
+            "-var_stream_map",
+            " ".join(f"v:{idx}" for idx in range(len(renditions))),
+            "-hls_segment_filename",
+            os.path.join(output_path, "stream_%v", "segment_%05d.m4s"),
+            os.path.join(output_path, "stream_%v", "playlist.m3u8"),
+        ]
+    )
+    return command
+
+
+def package_video_segments(
+    video_id: int,
+) -> None:
+    """
+    Packages the converted video as HLS renditions for segmented playback.
+    Segments are written to a temporary directory and moved in place when complete,
+    segments_path is set only after packaging succeeds.
+
+    Args:
+        video_id (int): video_id from database
+    """
+    db = next(get_db())
+    try:
+        video: dbmodels.Video = (
+            db.query(dbmodels.Video)
+            .filter_by(video_id=video_id, is_active=True)
+            .first()
+        )
+        if not video or video.status != VideoStatus.READY.value:
+            return
+        # deduplicated videos share the converted video, so they share segments too
+        segments_path = os.path.join(
+            settings.SEGMENTED_VIDEO_DIRECTORY,
+            os.path.splitext(os.path.basename(video.video_path))[0],
+        )
+        if os.path.exists(os.path.join(segments_path, MASTER_PLAYLIST_NAME)):
+            video.segments_path = segments_path
+            db.commit()
+            return
+
+        staging_path = tempfile.mkdtemp(
+            prefix=".staging-", dir=settings.SEGMENTED_VIDEO_DIRECTORY
+        )
+        try:
+            process = subprocess.run(
+                get_hls_command(
+                    video.video_path,
+                    staging_path,
+                    parse_renditions(settings.STREAM_RENDITIONS),
+                    fps=video.video_fps,
+                    segment_duration=settings.STREAM_SEGMENT_DURATION_SECONDS,
+                    gop_seconds=settings.STREAM_GOP_SECONDS,
+                ),
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            if process.returncode != 0:
+                print(f"Error packaging video {video_id} segments")
+                return
+            shutil.rmtree(segments_path, ignore_errors=True)
+            os.rename(staging_path, segments_path)
+        finally:
+            shutil.rmtree(staging_path, ignore_errors=True)
+
+        video.segments_path = segments_path
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Error packaging video {video_id} segments: {e}")
+    finally:
+        db.close()
+
+
+def get_proxy_command(
+    video_path: str,
+    proxy_path: str,
+    height: int = 360,
+    gop_size: int = 1,
+    crf: int = 28,
+) -> List[str]:
+    """Return ffmpeg command creating a low resolution scrubbing proxy.
+
+    A GOP size of 1 makes every frame a keyframe so any seek decodes one frame,
+    faststart moves the moov atom to the front so playback starts before download ends.
+
+    Args:
+        video_path (str): src video path
+        proxy_path (str): dst proxy video path
+        height (int, optional): maximum height of the proxy. Defaults to 360.
+        gop_size (int, optional): keyframe interval in frames. Defaults to 1.
+        crf (int, optional): x264 constant rate factor. Defaults to 28.
+
+    Returns:
+        List[str]: command to run with subprocess.run
+    """
+    return [
+        "ffmpeg",
+        "-y",
+        "-i",
+        video_path,
+        "-vf",
+        f"scale=-2:'min({height},ih)'",
+        "-c:v",
+        "libx264",
+        "-preset",
+        "veryfast",
+        "-crf",
+        str(crf),
+        "-pix_fmt",
+        "yuv420p",
+        "-g",
+        str(gop_size),
+        "-keyint_min",
+        str(gop_size),
+        "-sc_threshold",
+        "0",
+        "-an",
+        "-movflags",
+        "+faststart",
+        "-f",
+        "mp4",
+        proxy_path,
+    ]
+
+
+def create_proxy_video(
+    video_id: int,
+) -> None:
+    """
+    Creates the scrubbing proxy rendition of the converted video.
+    proxy_path is set only after the proxy is completely written.
+
+    Args:
+        video_id (int): video_id from database
+    """
+    db = next(get_db())
+    try:
+        video: dbmodels.Video = (
+            db.query(dbmodels.Video)
+            .filter_by(video_id=video_id, is_active=True)
+            .first()
+        )
+        if not video:
+            return
+
+        # deduplicated videos share the converted video, so they share the proxy too
+        proxy_path = os.path.join(
+            settings.PROXY_VIDEO_DIRECTORY, os.path.basename(video.video_path)
+        )
+        if not os.path.exists(proxy_path):
+            staging_path = os.path.join(
+                settings.PROXY_VIDEO_DIRECTORY, f".staging-{video_id}.mp4"
+            )
+            try:
+                process = subprocess.run(
+                    get_proxy_command(
+                        video.video_path,
+                        staging_path,
+                        height=settings.PROXY_VIDEO_HEIGHT,
+                        gop_size=settings.PROXY_VIDEO_GOP_SIZE,
+                        crf=settings.PROXY_VIDEO_CRF,
+                    ),
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+                if process.returncode != 0:
+                    print(f"Error creating proxy of video {video_id}")
+                    return
+                os.replace(staging_path, proxy_path)
+            finally:
+                if os.path.exists(staging_path):
+                    os.remove(staging_path)
+
+        video.proxy_path = proxy_path
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Error creating proxy of video {video_id}: {e}")
+    finally:
+        db.close()
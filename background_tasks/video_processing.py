@@ -1,6 +1,9 @@
 import os
+import re
+import json
 import time
 import pathlib
+import tempfile
 import asyncio
 import cv2 as cv
 import subprocess
@@ -12,10 +15,19 @@ import database_models as dbmodels
 
 from db import get_db
 from enums import VideoStatusEnum as VideoStatus
+from enums import FrameExtractionModeEnum as FrameExtractionMode
+
+
+SHOWINFO_PTS_TIME_PATTERN = re.compile(r"pts_time:\s*(-?[0-9.]+)")
 
 
 def get_ffmpeg_command(
-    video_path: str, frames_path: str, digit_count: int = 8
+    video_path: str,
+    frames_path: str,
+    digit_count: int = 8,
+    extraction_mode: str = FrameExtractionMode.ALL.value,
+    frame_stride: Optional[int] = None,
+    scene_threshold: Optional[float] = None,
 ) -> List[str]:
     """Return ffmpeg command to extract frames from video.
 
@@ -23,16 +35,65 @@ def get_ffmpeg_command(
         video_path (str): src video path
         frames_path (str): dst frames path
         digit_count (int, optional): %0{count}d.jpg Defaults to 8.
+        extraction_mode (str, optional): one of "all", "stride", "scene_change". Defaults to "all".
+        frame_stride (Optional[int], optional): keep every n-th frame in "stride" mode.
+        scene_threshold (Optional[float], optional): scene score threshold in "scene_change" mode.
 
     Returns:
         List[str]: command to run with subprocess.run
     """
-    return [
-        "ffmpeg",
-        "-i",
-        video_path,
-        os.path.join(frames_path, f"%0{digit_count}d.jpg"),
-    ]
+    command = ["ffmpeg", "-i", video_path]
+    if extraction_mode == FrameExtractionMode.STRIDE.value:
+        command.extend(
+            ["-vf", f"select='not(mod(n,{int(frame_stride or 1)}))'", "-vsync", "vfr"]
+        )
+    elif extraction_mode == FrameExtractionMode.SCENE_CHANGE.value:
+        # first frame is always kept, showinfo logs pts_time of every selected frame
+        command.extend(
+            [
+                "-vf",
+                f"select='eq(n,0)+gt(scene,{scene_threshold})',showinfo",
+                "-vsync",
+                "vfr",
+            ]
+        )
+    command.append(os.path.join(frames_path, f"%0{digit_count}d.jpg"))
+    return command
+
+
+def build_frame_mapping(
+    extraction_mode: str,
+    extracted_frame_count: int,
+    fps: float,
+    frame_stride: Optional[int] = None,
+    ffmpeg_log: str = "",
+) -> Optional[List[int]]:
+    """Build extracted frame index -> original frame number mapping.
+
+    Args:
+        extraction_mode (str): extraction mode used for the video
+        extracted_frame_count (int): number of extracted frames on disk
+        fps (float): fps of the source (converted) video
+        frame_stride (Optional[int], optional): stride used in "stride" mode
+        ffmpeg_log (str, optional): ffmpeg stderr output, required for "scene_change" mode
+
+    Returns:
+        Optional[List[int]]: mapping list, None if every frame is extracted (identity)
+    """
+    if extraction_mode == FrameExtractionMode.STRIDE.value:
+        stride = int(frame_stride or 1)
+        return [idx * stride for idx in range(extracted_frame_count)]
+    if extraction_mode == FrameExtractionMode.SCENE_CHANGE.value:
+        mapping = [
+            int(round(float(pts_time) * fps))
+            for pts_time in SHOWINFO_PTS_TIME_PATTERN.findall(ffmpeg_log)
+        ]
+        if len(mapping) != extracted_frame_count:
+            raise RuntimeError(
+                f"Frame mapping size mismatch: {len(mapping)} != {extracted_frame_count}"
+            )
+        return mapping
+    return None
 
 
 # FIXME: Fix the type hinting for this function
@@ -41,7 +102,7 @@ def extract_frames(
 ) -> None:
     """
     Extract frames from video and store them to defined folder.
-    Updates database job_status.
+    Updates database job_status, extracted frame count and frame mapping.
 
     Args:
         video_id (int): video_id from database
@@ -60,19 +121,44 @@ def extract_frames(
     extract_frame_path = video.frames_path
 
     try:
-        process = subprocess.Popen(
-            get_ffmpeg_command(video.video_path, extract_frame_path),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
-        while process.poll() is None:
-            if video.status == VideoStatus.PENDING.value:
-                video.status = VideoStatus.PROCESSING.value
-                db.commit()
-                db.refresh(video)
-            time.sleep(0.25)
+        # stderr is written to a file, showinfo output can fill a pipe and block ffmpeg
+        with tempfile.TemporaryFile() as ffmpeg_log:
+            process = subprocess.Popen(
+                get_ffmpeg_command(
+                    video.video_path,
+                    extract_frame_path,
+                    extraction_mode=video.extraction_mode,
+                    frame_stride=video.frame_stride,
+                    scene_threshold=video.scene_threshold,
+                ),
+                stdout=subprocess.DEVNULL,
+                stderr=ffmpeg_log,
+            )
+            while process.poll() is None:
+                if video.status == VideoStatus.PENDING.value:
+                    video.status = VideoStatus.PROCESSING.value
+                    db.commit()
+                    db.refresh(video)
+                time.sleep(0.25)
+
+            ffmpeg_log.seek(0)
+            ffmpeg_output = ffmpeg_log.read().decode("utf-8", errors="ignore")
 
         if process.returncode == 0:
+            extracted_frame_count = len(
+                [f for f in os.listdir(extract_frame_path) if f.endswith(".jpg")]
+            )
+            frame_mapping = build_frame_mapping(
+                extraction_mode=video.extraction_mode,
+                extracted_frame_count=extracted_frame_count,
+                fps=video.video_fps,
+                frame_stride=video.frame_stride,
+                ffmpeg_log=ffmpeg_output,
+            )
+            video.extracted_frame_count = extracted_frame_count
+            video.frame_mapping = (
+                json.dumps(frame_mapping) if frame_mapping is not None else None
+            )
             video.status = VideoStatus.READY.value
         else:
             video.status = VideoStatus.FAILED.value
@@ -0,0 +1,244 @@
+import os
+import time
+import shutil
+import asyncio
+from typing import Optional, Set
+
+from sqlalchemy.exc import IntegrityError
+
+import database_models as dbmodels
+
+from db import get_db, get_redis_client
+from enums import VideoStatusEnum as VideoStatus
+from settings import settings
+
+REAPER_LOCK_NAME = "video-reaper-lock"
+REAPER_LOCK_TIMEOUT_SECONDS = 30 * 60
+
+REAPER_WAKEUP = asyncio.Event()
+
+
+def _remove_directory_throttled(directory: str) -> None:
+    """Removes a directory in batches so disk I/O is spread over time.
+
+    Frame directories can hold hundreds of thousands of files, removing them
+    at once saturates the disk for every other request.
+
+    Args:
+        directory (str): directory to remove
+    """
+    if not os.path.isdir(directory):
+        return
+    removed = 0
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                else:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+            removed += 1
+            if removed % settings.VIDEO_REAPER_BATCH_SIZE == 0:
+                time.sleep(settings.VIDEO_REAPER_BATCH_SLEEP_SECONDS)
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def _remove_file(path: Optional[str]) -> None:
+    if path and os.path.isfile(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _is_shared(db, video: dbmodels.Video, path_column) -> bool:
+    """Checks if another row still references the same file.
+
+    Deduplicated videos share converted video and frames, rows pointing to
+    a path are its reference count. Reaped tombstones do not count.
+
+    Args:
+        db (Session): DB Session
+        video (dbmodels.Video): tombstoned video
+        path_column: dbmodels.Video.video_path or dbmodels.Video.frames_path
+
+    Returns:
+        bool: True if the file must be kept
+    """
+    path = getattr(video, path_column.key)
+    reference_count = (
+        db.query(dbmodels.Video)
+        .filter(
+            path_column == path,
+            dbmodels.Video.video_id != video.video_id,
+            dbmodels.Video.status != VideoStatus.DELETED.value,
+        )
+        .count()
+    )
+    return reference_count > 0
+
+
+def reap_deleted_videos(db) -> int:
+    """Reclaims disk space of tombstoned videos.
+
+    Rows are removed after their files are gone. If a row is still referenced
+    by a task it is kept with "deleted" status.
+
+    Args:
+        db (Session): DB Session
+
+    Returns:
+        int: number of reaped videos
+    """
+    tombstones = (
+        db.query(dbmodels.Video)
+        .filter(
+            dbmodels.Video.is_active.is_(False),
+            dbmodels.Video.status == VideoStatus.DELETING.value,
+        )
+        .all()
+    )
+    for video in tombstones:
+        if not _is_shared(db, video, dbmodels.Video.video_path):
+            _remove_file(video.video_path)
+        if video.frames_path and not _is_shared(db, video, dbmodels.Video.frames_path):
+            _remove_directory_throttled(video.frames_path)
+        if video.segments_path and not _is_shared(
+            db, video, dbmodels.Video.segments_path
+        ):
+            _remove_directory_throttled(video.segments_path)
+        if video.proxy_path and not _is_shared(db, video, dbmodels.Video.proxy_path):
+            _remove_file(video.proxy_path)
+
+        try:
+            db.delete(video)
+            db.commit()
+        except IntegrityError:
+            # referenced by tasks, keep the tombstone
+            db.rollback()
+            video.status = VideoStatus.DELETED.value
+            db.commit()
+    return len(tombstones)
+
+
+def _is_older_than_grace_period(path: str) -> bool:
+    """Checks last modification of a file, or of a directory and its subdirectories.
+
+    Segment packaging writes into subdirectories, their mtime tells that it is still running.
+    """
+    try:
+        modified_at = os.path.getmtime(path)
+        if os.path.isdir(path):
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        modified_at = max(modified_at, entry.stat().st_mtime)
+    except FileNotFoundError:
+        return False
+    return time.time() - modified_at > settings.VIDEO_REAPER_ORPHAN_GRACE_SECONDS
+
+
+def sweep_orphaned_files(db) -> int:
+    """Removes raw videos, proxies, frame and segment directories no video row points to.
+
+    Failed ingests leave converted videos, empty frame directories and
+    staging segment directories behind.
+    Recently modified entries are skipped, they may belong to an ingest in progress.
+
+    Args:
+        db (Session): DB Session
+
+    Returns:
+        int: number of removed entries
+    """
+    referenced_paths: Set[str] = set()
+    for paths in db.query(
+        dbmodels.Video.video_path,
+        dbmodels.Video.frames_path,
+        dbmodels.Video.segments_path,
+        dbmodels.Video.proxy_path,
+    ).all():
+        referenced_paths.update(os.path.abspath(path) for path in paths if path)
+
+    removed = 0
+    for directory in [settings.RAW_VIDEO_DIRECTORY, settings.PROXY_VIDEO_DIRECTORY]:
+        if not os.path.isdir(directory):
+            continue
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                path = os.path.abspath(entry.path)
+                if not entry.is_file() or path in referenced_paths:
+                    continue
+                if not _is_older_than_grace_period(path):
+                    continue
+                _remove_file(path)
+                removed += 1
+
+    for directory in [
+        settings.EXTRACTED_FRAMES_DIRECTORY,
+        settings.SEGMENTED_VIDEO_DIRECTORY,
+    ]:
+        if not os.path.isdir(directory):
+            continue
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                path = os.path.abspath(entry.path)
+                if not entry.is_dir() or path in referenced_paths:
+                    continue
+                if not _is_older_than_grace_period(path):
+                    continue
+                _remove_directory_throttled(path)
+                removed += 1
+    return removed
+
+
+def reap_videos() -> None:
+    """Runs one reaper pass, only one API replica reaps at a time."""
+    rcli = get_redis_client()
+    lock = (
+        rcli.get_lock(REAPER_LOCK_NAME, timeout=REAPER_LOCK_TIMEOUT_SECONDS)
+        if rcli
+        else None
+    )
+    if lock is not None and not lock.acquire(blocking=False):
+        return
+
+    db = next(get_db())
+    try:
+        reaped = reap_deleted_videos(db)
+        swept = sweep_orphaned_files(db)
+        if reaped or swept:
+            print(
+                f"Video reaper: {reaped} deleted videos reaped, {swept} orphans swept"
+            )
+    except Exception as e:
+        db.rollback()
+        print(f"Error in video reaper: {e}")
+    finally:
+        db.close()
+        if lock is not None and lock.owned():
+            lock.release()
+
+
+def wake_video_reaper() -> None:
+    """Runs the next reaper pass without waiting for the interval"""
+    REAPER_WAKEUP.set()
+
+
+async def run_video_reaper() -> None:
+    """Periodically reclaims disk space of deleted videos in a worker thread."""
+    try:
+        while True:
+            await asyncio.to_thread(reap_videos)
+            try:
+                await asyncio.wait_for(
+                    REAPER_WAKEUP.wait(),
+                    timeout=settings.VIDEO_REAPER_INTERVAL_SECONDS,
+                )
+            except asyncio.TimeoutError:
+                pass
+            REAPER_WAKEUP.clear()
+    except asyncio.CancelledError:
+        print("Video reaper cancelled")
@@ -0,0 +1,160 @@
+"""Benchmarks binary annotation encoding against the JSON representation.
+
+Generates frames with dense polygons, then reports payload size, parse time
+and memory held per frame for JSON and for float32 / int16 encoding.
+
+Usage:
+    python -m benchmarks.annotation_codec --frames 2000 --objects 10 --points 400
+"""
+
+import gc
+import json
+import time
+import argparse
+import tracemalloc
+
+import numpy as np
+
+import schemas
+from utils.annotation_codec import EncodedAnnotation, encode_annotation
+
+
+def make_annotation(frame_idx: int, objects: int, points: int, rng) -> bytes:
+    polygons, bboxes = [], []
+    for object_idx in range(objects):
+        center = rng.uniform((200, 200), (1720, 880))
+        angles = np.sort(rng.uniform(0, 2 * np.pi, points))
+        radii = rng.uniform(40, 160, points)
+        coordinates = center + np.stack(
+            [np.cos(angles) * radii, np.sin(angles) * radii], axis=1
+        )
+        xmin, ymin = coordinates.min(axis=0)
+        xmax, ymax = coordinates.max(axis=0)
+        polygons.append(
+            {
+                "id": str(object_idx),
+                "label": "object",
+                "confidence": 0.9,
+                "coordinates": coordinates.round(4).tolist(),
+            }
+        )
+        bboxes.append(
+            {
+                "id": str(object_idx),
+                "xmin": xmin,
+                "ymin": ymin,
+                "xmax": xmax,
+                "ymax": ymax,
+                "label": "object",
+                "confidence": 0.9,
+            }
+        )
+    return (
+        schemas.ImageAnnotation(
+            image_id=f"frame-{frame_idx}",
+            image_path=f"/frames/{frame_idx + 1:08d}.jpg",
+            bbox_annotations=bboxes,
+            polygon_annotations=polygons,
+            meta={"annotation_model": "sam2", "frame_idx": frame_idx},
+        )
+        .model_dump_json()
+        .encode("utf-8")
+    )
+
+
+def timed(fn, payloads) -> float:
+    for payload in payloads[:50]:
+        fn(payload)
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for payload in payloads:
+            fn(payload)
+        return (time.perf_counter() - start) / len(payloads) * 1e6
+    finally:
+        gc.enable()
+
+
+def held_memory(fn, payloads) -> float:
+    gc.collect()
+    tracemalloc.start()
+    held = [fn(payload) for payload in payloads]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del held
+    return size / len(payloads) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--objects", type=int, default=10)
+    parser.add_argument("--points", type=int, default=400)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    payloads = [
+        make_annotation(idx, args.objects, args.points, rng)
+        for idx in range(args.frames)
+    ]
+    encoded = {
+        coordinate_type: [
+            encode_annotation(json.loads(payload), coordinate_type)
+            for payload in payloads
+        ]
+        for coordinate_type in ["float32", "int16"]
+    }
+    print(
+        f"{args.frames} frames, {args.objects} polygons x {args.points} points per frame\n"
+    )
+
+    print(f"{'representation':<34}{'bytes/frame':>12}")
+    print(f"{'json':<34}{np.mean([len(p) for p in payloads]):>12.0f}")
+    for coordinate_type, values in encoded.items():
+        print(f"{coordinate_type:<34}{np.mean([len(v) for v in values]):>12.0f}")
+
+    print(f"\n{'operation':<34}{'us/frame':>12}{'KiB held/frame':>16}")
+    rows = [
+        ("json -> pydantic", schemas.ImageAnnotation.model_validate_json, payloads),
+        ("json -> dict", json.loads, payloads),
+    ]
+    for coordinate_type, values in encoded.items():
+        rows += [
+            (
+                f"{coordinate_type} -> header only",
+                lambda v: EncodedAnnotation(v).frame_idx,
+                values,
+            ),
+            (
+                f"{coordinate_type} -> numpy points",
+                lambda v: EncodedAnnotation(v).polygon_points,
+                values,
+            ),
+            (
+                f"{coordinate_type} -> pydantic",
+                lambda v: EncodedAnnotation(v).to_model(),
+                values,
+            ),
+        ]
+    for label, fn, values in rows:
+        print(
+            f"{label:<34}{timed(fn, values):>12.1f}{held_memory(fn, values[:200]):>16.1f}"
+        )
+
+    int16_error = max(
+        float(
+            np.abs(
+                EncodedAnnotation(value).polygon_points
+                - EncodedAnnotation(
+                    encode_annotation(json.loads(payload), "float32")
+                ).polygon_points
+            ).max()
+        )
+        for payload, value in zip(payloads[:100], encoded["int16"][:100])
+    )
+    print(f"\nmax int16 quantization error: {int16_error:.4f} px")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Benchmarks annotation export into PostgreSQL.
+
+Compares the previous export path (bulk_save_objects on first export, one
+SELECT and ORM update per frame on re-export) with batched
+INSERT ... ON CONFLICT DO UPDATE. Runs against the database configured in
+the environment, rows are written under a throwaway task and removed after.
+
+Usage:
+    python -m benchmarks.annotation_export --frames 100000 --batch-size 500 1000 5000
+"""
+
+import time
+import uuid
+import argparse
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+import database_models as dbmodels
+from db.database import SessionLocal
+from background_tasks.annotation_export import upsert_annotations
+
+
+def make_rows(task_id: int, frame_count: int) -> List[Dict[str, Any]]:
+    annotated_at = datetime.now(timezone.utc)
+    annotation_data = (
+        '{"image_id": "%s", "image_path": "/frames/%08d.jpg", "bbox_annotations": '
+        '[{"id": "0", "xmin": 10.0, "ymin": 20.0, "xmax": 110.0, "ymax": 220.0}], '
+        '"polygon_annotations": [], "meta": {"annotation_model": "sam2", "frame_idx": %d}}'
+    )
+    return [
+        {
+            "task_id": task_id,
+            "image_id": f"frame-{idx}",
+            "image_path": f"/frames/{idx + 1:08d}.jpg",
+            "annotation_data": annotation_data % (f"frame-{idx}", idx + 1, idx),
+            "annotation_type": "all",
+            "frame_idx": idx,
+            "annotated_at": annotated_at,
+        }
+        for idx in range(frame_count)
+    ]
+
+
+def export_legacy(db, task_id: int, rows: List[Dict[str, Any]], exported: bool):
+    new_rows = []
+    for row in rows:
+        if exported:
+            existing_annotation = (
+                db.query(dbmodels.Annotation)
+                .filter(
+                    dbmodels.Annotation.task_id == task_id,
+                    dbmodels.Annotation.image_id == row["image_id"],
+                )
+                .first()
+            )
+            if existing_annotation:
+                existing_annotation.annotation_data = row["annotation_data"]
+                existing_annotation.annotated_at = row["annotated_at"]
+                continue
+        new_rows.append(dbmodels.Annotation(**row))
+    if new_rows:
+        db.bulk_save_objects(new_rows)
+    db.commit()
+
+
+def export_upsert(db, rows: List[Dict[str, Any]], batch_size: int):
+    upsert_annotations(db, rows, batch_size=batch_size)
+    db.commit()
+
+
+def clear_annotations(db, task_id: int):
+    db.query(dbmodels.Annotation).filter(
+        dbmodels.Annotation.task_id == task_id
+    ).delete()
+    db.commit()
+
+
+def timed(label: str, fn, *args) -> None:
+    start = time.perf_counter()
+    fn(*args)
+    print(f"{label:<40} {time.perf_counter() - start:10.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[1000])
+    parser.add_argument(
+        "--skip-legacy", action="store_true", help="legacy re-export is very slow"
+    )
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    task = dbmodels.Task(
+        task_uuid=f"benchmark-{uuid.uuid4()}", task_name="export benchmark"
+    )
+    db.add(task)
+    db.commit()
+    db.refresh(task)
+    rows = make_rows(task.task_id, args.frames)
+    print(f"{args.frames} frames")
+
+    try:
+        if not args.skip_legacy:
+            timed("legacy first export", export_legacy, db, task.task_id, rows, False)
+            timed("legacy re-export", export_legacy, db, task.task_id, rows, True)
+            clear_annotations(db, task.task_id)
+
+        for batch_size in args.batch_size:
+            timed(
+                f"upsert first export (batch {batch_size})",
+                export_upsert,
+                db,
+                rows,
+                batch_size,
+            )
+            timed(
+                f"upsert re-export (batch {batch_size})",
+                export_upsert,
+                db,
+                rows,
+                batch_size,
+            )
+            clear_annotations(db, task.task_id)
+    finally:
+        clear_annotations(db, task.task_id)
+        db.delete(task)
+        db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Benchmarks validation of websocket requests for high-rate click streams.
+
+A click stream is a sequence of add_points requests with one object and a
+few points each, as a client sends while the user clicks on a frame. The
+previous path parsed every request into a dict, looked up its schema by
+msg_type, validated the dict and serialized the model again before queueing
+it. The compiled codec validates the raw JSON with one discriminated-union
+TypeAdapter and queues the original payload.
+It reports per-request time and requests per second for both paths.
+
+Usage:
+    python -m benchmarks.request_codec --requests 20000 --points 1 3 10
+"""
+
+import json
+import time
+import random
+import argparse
+from typing import Callable, Dict, List, Type
+
+import schemas
+from utils import validate_request_json
+
+SCHEMA_MAPPING: Dict[str, Type[schemas.ResponseCover]] = {
+    "add_points": schemas.SingleFramePointPromptInputCover,
+    "run_inference": schemas.RunInferenceInputCover,
+    "remove_object": schemas.RemoveObjectInputCover,
+    "reset": schemas.ResetTaskInputCover,
+}
+
+
+def build_click_stream(
+    request_count: int, point_count: int, seed: int = 0
+) -> List[str]:
+    rng = random.Random(seed)
+    requests = []
+    for request_idx in range(request_count):
+        # add_points prompts one frame
+        frame_number = rng.randrange(0, 3000)
+        points = [
+            {
+                "id": f"point-{request_idx}-{point_idx}",
+                "frameNumber": frame_number,
+                "x": rng.uniform(0.01, 0.99),
+                "y": rng.uniform(0.01, 0.99),
+                "markerType": rng.randrange(0, 2),
+            }
+            for point_idx in range(point_count)
+        ]
+        request = {
+            "msg_type": "add_points",
+            "data": [
+                {
+                    "id": f"object-{request_idx % 5}",
+                    "label": "car",
+                    "objectColor": [255, 0, 0],
+                    "child": points,
+                }
+            ],
+        }
+        requests.append(json.dumps(request))
+    return requests
+
+
+def dict_lookup_path(payload: str) -> str:
+    request = json.loads(payload)
+    validation_schema = SCHEMA_MAPPING[request["msg_type"]]
+    return validation_schema.model_validate(request).model_dump_json()
+
+
+def compiled_codec_path(payload: str) -> str:
+    _, is_ok = validate_request_json(payload)
+    assert is_ok
+    return payload
+
+
+def best_time_s(
+    function: Callable[[str], str], requests: List[str], repeat: int
+) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for payload in requests:
+            function(payload)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(args: argparse.Namespace) -> None:
+    for point_count in args.points:
+        requests = build_click_stream(args.requests, point_count)
+        print(f"requests={args.requests} points per request={point_count}")
+        for name, function in [
+            ("dict lookup", dict_lookup_path),
+            ("compiled codec", compiled_codec_path),
+        ]:
+            elapsed = best_time_s(function, requests, args.repeat)
+            print(
+                f"  {name:16s} {elapsed / len(requests) * 1e6:8.2f} us/request "
+                f"{len(requests) / elapsed:10.0f} requests/s"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--points", type=int, nargs="+", default=[1, 3, 10])
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
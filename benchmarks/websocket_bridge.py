@@ -0,0 +1,149 @@
+"""Benchmarks delivery of worker responses to websocket connections.
+
+Compares the previous consumer, which polled every socket's response list
+with a synchronous RPOP and slept 100 ms when it was empty, with the response
+bridge, which waits on all lists with a single BRPOP. Sockets are simulated
+as consumer coroutines on one event loop, as in the API process.
+
+For every socket count it reports, while all sockets are idle, process CPU
+and redis commands per second. While a producer thread pushes responses to
+random tasks, it reports delivery latency percentiles.
+Runs against the redis configured in the environment, under throwaway keys.
+
+Usage:
+    python -m benchmarks.websocket_bridge --sockets 10 100 500 --idle-seconds 10 --rate 200
+"""
+
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import threading
+from typing import Dict, List
+
+import numpy as np
+
+from db import AsyncRedisClient, RedisClient
+from app.response_bridge import ResponseBridge, get_response_queue_name
+
+
+def get_commands_processed(rcli: RedisClient) -> int:
+    return int(rcli.client.info("stats")["total_commands_processed"])
+
+
+async def run_polling_consumer(
+    rcli: RedisClient, task_uuid: str, latencies: List[float]
+) -> None:
+    queue_name = get_response_queue_name(task_uuid)
+    while True:
+        data = rcli.dequeue(queue_name, count=1)
+        if not data:
+            await asyncio.sleep(0.1)
+            continue
+        latencies.append(time.perf_counter() - json.loads(data[0])["sent_at"])
+
+
+async def run_bridge_consumer(queue: asyncio.Queue, latencies: List[float]) -> None:
+    while True:
+        data = await queue.get()
+        latencies.append(time.perf_counter() - json.loads(data)["sent_at"])
+
+
+def produce(
+    task_uuids: List[str], rate: float, duration: float, stop: threading.Event
+) -> int:
+    rcli = RedisClient()
+    sent = 0
+    interval = 1 / rate
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline and not stop.is_set():
+        task_uuid = random.choice(task_uuids)
+        rcli.queue(
+            get_response_queue_name(task_uuid),
+            json.dumps({"sent_at": time.perf_counter()}),
+        )
+        sent += 1
+        time.sleep(interval)
+    return sent
+
+
+async def measure(
+    mode: str, socket_count: int, idle_seconds: float, rate: float, duration: float
+) -> Dict[str, float]:
+    rcli = RedisClient()
+    task_uuids = [f"benchmark-{uuid.uuid4()}" for _ in range(socket_count)]
+    latencies: List[float] = []
+    tasks = []
+
+    redis_client = await AsyncRedisClient.create()
+    if mode == "bridge":
+        bridge = ResponseBridge(block_timeout=5, batch_size=100)
+        tasks.append(asyncio.create_task(bridge.run(redis_client)))
+        await asyncio.sleep(0.2)
+        for task_uuid in task_uuids:
+            queue: asyncio.Queue = asyncio.Queue()
+            await bridge.subscribe(task_uuid, queue)
+            tasks.append(asyncio.create_task(run_bridge_consumer(queue, latencies)))
+    else:
+        # every socket had its own client, sharing one is the best case
+        for task_uuid in task_uuids:
+            tasks.append(
+                asyncio.create_task(run_polling_consumer(rcli, task_uuid, latencies))
+            )
+    await asyncio.sleep(1)
+
+    commands_before = get_commands_processed(rcli)
+    cpu_before, wall_before = time.process_time(), time.perf_counter()
+    await asyncio.sleep(idle_seconds)
+    idle_wall = time.perf_counter() - wall_before
+    idle_cpu = (time.process_time() - cpu_before) / idle_wall
+    commands_per_second = (get_commands_processed(rcli) - commands_before) / idle_wall
+
+    stop = threading.Event()
+    sent = await asyncio.to_thread(produce, task_uuids, rate, duration, stop)
+    await asyncio.sleep(0.5)
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await redis_client.close()
+    rcli.client.delete(*[get_response_queue_name(u) for u in task_uuids])
+
+    latencies_ms = np.asarray(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "idle_cpu_percent": idle_cpu * 100,
+        "idle_redis_commands_per_second": commands_per_second,
+        "delivered": len(latencies),
+        "sent": sent,
+        "latency_p50_ms": float(np.percentile(latencies_ms, 50)),
+        "latency_p99_ms": float(np.percentile(latencies_ms, 99)),
+        "latency_max_ms": float(latencies_ms.max()),
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    for socket_count in args.sockets:
+        for mode in ["polling", "bridge"]:
+            result = await measure(
+                mode, socket_count, args.idle_seconds, args.rate, args.duration
+            )
+            print(
+                f"{mode:8s} sockets={socket_count:5d} "
+                f"idle cpu={result['idle_cpu_percent']:6.1f}% "
+                f"redis cmd/s={result['idle_redis_commands_per_second']:8.0f} "
+                f"delivered={result['delivered']}/{result['sent']} "
+                f"latency p50={result['latency_p50_ms']:6.1f} ms "
+                f"p99={result['latency_p99_ms']:6.1f} ms "
+                f"max={result['latency_max_ms']:6.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sockets", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--idle-seconds", type=float, default=10)
+    parser.add_argument("--rate", type=float, default=200, help="responses per second")
+    parser.add_argument("--duration", type=float, default=10)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,144 @@
+"""Benchmarks websocket message encodings for propagation results.
+
+A propagation result is a response cover with one ImageAnnotation per frame,
+each with a box and a polygon for every object. For the JSON default and the
+msgpack subprotocol, with and without permessage-deflate, it reports bytes
+on the wire, server encode time (from the worker JSON the response bridge
+delivers) and client decode time.
+permessage-deflate is emulated with a raw deflate stream flushed per message,
+as websocket servers do with context takeover.
+
+Usage:
+    python -m benchmarks.websocket_codec --frames 1 30 120 --objects 5 --points 200
+"""
+
+import json
+import time
+import zlib
+import argparse
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from app.websocket_protocol import MsgpackCodec, WebSocketCodec
+
+
+def build_propagation_result(
+    frame_count: int, object_count: int, point_count: int, seed: int = 0
+) -> Dict[str, Any]:
+    rng = np.random.default_rng(seed)
+    annotations = []
+    for frame_idx in range(frame_count):
+        bbox_annotations, polygon_annotations = [], []
+        for object_idx in range(object_count):
+            center = rng.uniform([200, 200], [1720, 880])
+            angles = np.sort(rng.uniform(0, 2 * np.pi, point_count))
+            radii = rng.uniform(60, 180, point_count)
+            points = (
+                center + np.stack([np.cos(angles), np.sin(angles)], 1) * radii[:, None]
+            )
+            bbox = np.concatenate([points.min(0), points.max(0)])
+            object_id = f"object-{object_idx}"
+            bbox_annotations.append(
+                {
+                    "id": object_id,
+                    "xmin": float(bbox[0]),
+                    "ymin": float(bbox[1]),
+                    "xmax": float(bbox[2]),
+                    "ymax": float(bbox[3]),
+                    "label": "car",
+                    "confidence": float(rng.uniform()),
+                }
+            )
+            polygon_annotations.append(
+                {
+                    "id": object_id,
+                    "label": "car",
+                    "confidence": float(rng.uniform()),
+                    "coordinates": points.tolist(),
+                }
+            )
+        annotations.append(
+            {
+                "image_id": str(frame_idx),
+                "image_path": f"/data/frames/{str(frame_idx + 1).zfill(8)}.jpg",
+                "bbox_annotations": bbox_annotations,
+                "polygon_annotations": polygon_annotations,
+                "meta": {"annotation_model": "sam2", "frame_idx": frame_idx},
+            }
+        )
+    return {"msg_type": "run_inference", "data": annotations, "meta": None}
+
+
+def deflate(payload: bytes) -> bytes:
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    # permessage-deflate drops the trailing empty block of the sync flush
+    return (compressor.compress(payload) + compressor.flush(zlib.Z_SYNC_FLUSH))[:-4]
+
+
+def inflate(payload: bytes) -> bytes:
+    return zlib.decompressobj(wbits=-zlib.MAX_WBITS).decompress(
+        payload + b"\x00\x00\xff\xff"
+    )
+
+
+def best_time_ms(function: Callable[[], Any], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def measure(worker_json: str, repeat: int) -> List[Dict[str, Any]]:
+    results = []
+    for name, codec in [("json", WebSocketCodec()), ("msgpack", MsgpackCodec())]:
+        message = codec.encode(worker_json)
+        payload = message if isinstance(message, bytes) else message.encode("utf-8")
+        encode_ms = best_time_ms(lambda: codec.encode(worker_json), repeat)
+        decode_ms = best_time_ms(lambda: codec.decode(message), repeat)
+        results.append(
+            {
+                "encoding": name,
+                "bytes": len(payload),
+                "encode_ms": encode_ms,
+                "decode_ms": decode_ms,
+            }
+        )
+
+        compressed = deflate(payload)
+        results.append(
+            {
+                "encoding": f"{name}+deflate",
+                "bytes": len(compressed),
+                "encode_ms": encode_ms + best_time_ms(lambda: deflate(payload), repeat),
+                "decode_ms": decode_ms
+                + best_time_ms(lambda: inflate(compressed), repeat),
+            }
+        )
+    return results
+
+
+def main(args: argparse.Namespace) -> None:
+    for frame_count in args.frames:
+        result = build_propagation_result(frame_count, args.objects, args.points)
+        worker_json = json.dumps(result)
+        print(
+            f"frames={frame_count} objects={args.objects} points={args.points} "
+            f"worker json={len(worker_json) / 1024:.1f} KiB"
+        )
+        for row in measure(worker_json, args.repeat):
+            print(
+                f"  {row['encoding']:16s} {row['bytes'] / 1024:9.1f} KiB "
+                f"encode={row['encode_ms']:8.2f} ms decode={row['decode_ms']:8.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, nargs="+", default=[1, 30, 120])
+    parser.add_argument("--objects", type=int, default=5)
+    parser.add_argument("--points", type=int, default=200, help="points per polygon")
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
@@ -3,7 +3,15 @@ import json
 from datetime import datetime
 from re import S
 
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    ForeignKey,
+    Boolean,
+    LargeBinary,
+    UniqueConstraint,
+)
 from sqlalchemy import event, insert, update
 from sqlalchemy.sql.sqltypes import TIMESTAMP
 from sqlalchemy.sql.expression import text
@@ -14,12 +22,20 @@ from db_base import Base
 
 class Annotation(Base):
     __tablename__ = "annotation"
+    # re-exports upsert on this key
+    __table_args__ = (
+        UniqueConstraint(
+            "task_id", "image_id", name="uq_annotation_task_id_image_id"
+        ),
+    )
     annotation_id = Column(Integer, primary_key=True, nullable=False)
     task_id = Column(Integer, ForeignKey("task.task_id"))
 
     image_id = Column(String, nullable=False)
     image_path = Column(String, nullable=False)
     annotation_data = Column(String, nullable=True, server_default=text("'{}'"))
+    # binary encoded annotation, see utils.annotation_codec
+    annotation_encoded = Column(LargeBinary, nullable=True)
     annotation_type = Column(String, nullable=False)
     frame_idx = Column(Integer, nullable=False)
     is_active = Column(Boolean, nullable=False, server_default=text("true"))
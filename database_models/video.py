@@ -1,7 +1,7 @@
 import os
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, Float
+from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, Float, Index
 from sqlalchemy import event, insert, update
 from sqlalchemy.sql.sqltypes import TIMESTAMP
 from sqlalchemy.sql.expression import text
@@ -13,7 +13,7 @@ from db_base import Base
 class Video(Base):
     __tablename__ = "video"
     video_id = Column(Integer, primary_key=True, nullable=False)
-    video_name = Column(String, nullable=False, unique=True)
+    video_name = Column(String, nullable=False)
     created_at = Column(
         TIMESTAMP(timezone=True), nullable=False, server_default=text("now()")
     )
@@ -25,7 +25,30 @@ class Video(Base):
     frame_count = Column(Integer, nullable=True)
 
     frames_path = Column(String, nullable=True)
+    extraction_mode = Column(String, nullable=False, server_default="all")
+    frame_stride = Column(Integer, nullable=True)
+    scene_threshold = Column(Float, nullable=True)
+    extracted_frame_count = Column(Integer, nullable=True)
+    # JSON list, extracted frame index -> original frame number (null means identity)
+    frame_mapping = Column(String, nullable=True)
+    # directory of the HLS master playlist and segments, null until packaged
+    segments_path = Column(String, nullable=True)
+    # low resolution, short GOP rendition for scrubbing, null if not requested
+    proxy_path = Column(String, nullable=True)
     file_size = Column(Integer, nullable=True)
+    # source content + conversion parameters, rows with the same hash share files
+    content_hash = Column(String, nullable=True, index=True)
     status = Column(String, nullable=False, server_default="pending")
 
     is_active = Column(Boolean, nullable=False, server_default="true")
+    deleted_at = Column(TIMESTAMP(timezone=True), nullable=True)
+
+    # video names are unique among active videos only, tombstones keep their names
+    __table_args__ = (
+        Index(
+            "ix_video_video_name_active",
+            "video_name",
+            unique=True,
+            postgresql_where=text("is_active"),
+        ),
+    )
@@ -1,4 +1,5 @@
 from .database import get_db, Base, engine
+from .database import get_async_db, dispose_async_engine
 from .redis_client import RedisClient
 from .redis_client import get_redis_client
-from .async_redis_client import AsyncRedisClient
+from .async_redis_client import AsyncRedisClient, get_async_redis_client
@@ -1,41 +1,378 @@
-import json
-import urllib.parse
+import time
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple, Union
 
+from fastapi.requests import HTTPConnection
 from redis import asyncio as aioredis
+from redis.asyncio.lock import Lock
+from redis.exceptions import ConnectionError, RedisError
 
+from settings import settings
+from .redis_client import TASK_REGISTRY_KEY, TASK_STATUS_HASH_KEY
+from .redis_client import LIST_TASKS_CHUNK_SIZE, get_task_page, get_task_status_set_key
+from .redis_client import (
+    INDEX_TASK_STATUS_SCRIPT,
+    LIST_TASKS_SCRIPT,
+    get_index_task_status_call,
+    get_list_tasks_call,
+)
+from .redis_client import (
+    ACQUIRE_LEASE_SCRIPT,
+    RELEASE_LEASE_SCRIPT,
+    RENEW_LEASES_SCRIPT,
+    SAM2_LEASES_KEY,
+    get_sam2_lease_key,
+    get_task_heartbeat_key,
+)
 
-from typing import List, Any, Optional, Awaitable, Union
 
-from settings import settings
+class MeteredConnectionPool(aioredis.BlockingConnectionPool):
+    """Bounded connection pool that counts checkouts and waits that timed out"""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.peak_in_use = 0
+
+    async def get_connection(self, command_name, *keys, **options):
+        try:
+            connection = await super().get_connection(command_name, *keys, **options)
+        except ConnectionError as err:
+            # raised from the wait timeout when the pool stayed exhausted
+            if isinstance(err.__cause__, asyncio.TimeoutError):
+                self.timeouts += 1
+            raise
+        self.checkouts += 1
+        self.peak_in_use = max(self.peak_in_use, len(self._in_use_connections))
+        return connection
 
 
 class AsyncRedisClient:
+    """Redis client of the API process, one per process.
+
+    It is created in the application lifespan and injected into routes with
+    get_async_redis_client. All requests and websockets share its pool, which
+    is bounded: when every connection is busy, callers wait for one instead of
+    opening more. Connections idle longer than the health check interval are
+    pinged before they are used again.
+    """
+
     def __init__(self, config=settings) -> None:
         self.config = config
-        self.client: aioredis.Redis = None  # Initialize client as None
+        self.pool = MeteredConnectionPool(
+            host=config.REDIS_HOSTNAME,
+            port=int(config.REDIS_PORT),
+            password=config.REDIS_PASSWORD,
+            db=int(config.REDIS_DB),
+            max_connections=config.REDIS_POOL_MAX_CONNECTIONS,
+            timeout=config.REDIS_POOL_TIMEOUT_SECONDS,
+            health_check_interval=config.REDIS_HEALTH_CHECK_INTERVAL_SECONDS,
+            socket_keepalive=True,
+        )
+        self.client = aioredis.Redis(connection_pool=self.pool)
+        self.acquire_lease_script = self.client.register_script(ACQUIRE_LEASE_SCRIPT)
+        self.release_lease_script = self.client.register_script(RELEASE_LEASE_SCRIPT)
+        self.renew_leases_script = self.client.register_script(RENEW_LEASES_SCRIPT)
+        self.index_task_status_script = self.client.register_script(
+            INDEX_TASK_STATUS_SCRIPT
+        )
+        self.list_tasks_script = self.client.register_script(LIST_TASKS_SCRIPT)
 
     @classmethod
     async def create(cls, config=settings) -> "AsyncRedisClient":
+        """Creates the client and checks that redis is reachable"""
         instance = cls(config)
-        instance.client = await aioredis.from_url(url=instance._get_connection_url())
+        await instance.client.ping()
         return instance
 
-    def _get_connection_url(self) -> str:
-        password = urllib.parse.quote(self.config.REDIS_PASSWORD)
-        return f"redis://:{password}@{self.config.REDIS_HOSTNAME}:{self.config.REDIS_PORT}/{self.config.REDIS_DB}"
+    async def close(self) -> None:
+        await self.client.aclose()
+        await self.pool.disconnect()
 
-    async def get(self, key: str) -> Awaitable[str | bytes]:
-        value = self.client.get(key)
-        return value
+    async def ping(self) -> Tuple[bool, Optional[float]]:
+        """Round trip to redis
+
+        Returns:
+            Tuple[bool, Optional[float]]: whether redis answered and the latency in ms
+        """
+        start = time.perf_counter()
+        try:
+            await self.client.ping()
+        except RedisError:
+            return False, None
+        return True, (time.perf_counter() - start) * 1000
+
+    def get_pool_metrics(self) -> Dict[str, int]:
+        return {
+            "max_connections": self.pool.max_connections,
+            "in_use": len(self.pool._in_use_connections),
+            "idle": len(self.pool._available_connections),
+            "peak_in_use": self.pool.peak_in_use,
+            "checkouts": self.pool.checkouts,
+            "timeouts": self.pool.timeouts,
+        }
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self.client.get(key)
+        return value.decode("utf-8") if value else None
 
     async def set(
-        self, key: str, value: str, ttl: Optional[int] = None
-    ) -> Awaitable[bool]:
-        is_added: Awaitable = self.client.set(key, value)
-        if ttl:
-            await is_added
-            return self.set_expiration(key, ttl)
-        return is_added
+        self, key: str, value: Union[str, int, float], ttl: Optional[int] = None
+    ) -> bool:
+        is_added = await self.client.set(key, value, ex=ttl)
+        return bool(is_added)
 
     async def set_expiration(self, key: str, seconds: int) -> Any:
         return await self.client.expire(key, seconds)
+
+    def get_lock(self, lock_name: str, timeout: Optional[float] = None) -> Lock:
+        return self.client.lock(lock_name, timeout=timeout)
+
+    async def get_keys_with_pattern(self, pattern: str) -> List[str]:
+        keys = await self.client.keys(pattern)
+        return [key.decode("utf-8") for key in keys]
+
+    async def get_raw_values(self, keys: List[str]) -> List[Optional[bytes]]:
+        """MGET without decoding, missing keys are None"""
+        if not keys:
+            return []
+        return await self.client.mget(keys)
+
+    async def add_json(self, key: str, value: dict, ttl: Optional[int] = None) -> bool:
+        is_added = await self.client.json().set(key, "$", value)
+        if ttl and is_added:
+            await self.set_expiration(key, ttl)
+        return bool(is_added)
+
+    async def get_json(self, key: str) -> Optional[dict]:
+        return await self.client.json().get(key)
+
+    async def queue(self, queue_name: str, value: str) -> int:
+        return await self.client.lpush(queue_name, value)
+
+    async def stream_add(self, stream_name: str, data: dict) -> bool:
+        pub_idx = await self.client.xadd(stream_name, data)
+        return True if pub_idx else False
+
+    async def publish_task_request(
+        self, task_uuid: str, value: Union[str, bytes]
+    ) -> bool:
+        """Sends a request to the worker of the task
+
+        With the stream transport requests are added to task:{uuid}:requests,
+        trimmed to TASK_STREAM_MAX_LENGTH, otherwise pushed to task:{uuid}:request
+        """
+        if self.config.TASK_CHANNEL_TRANSPORT == "list":
+            return bool(await self.queue(f"task:{task_uuid}:request", value))
+        entry_id = await self.client.xadd(
+            f"task:{task_uuid}:requests",
+            {"data": value},
+            maxlen=self.config.TASK_STREAM_MAX_LENGTH or None,
+            approximate=True,
+        )
+        return bool(entry_id)
+
+    async def trim_task_streams(self, batch_size: int = 100) -> int:
+        """Trims the response streams of all tasks to TASK_STREAM_MAX_LENGTH
+
+        The worker adds responses without a limit, request streams are trimmed
+        when requests are added. Trimming is approximate, in whole macro nodes.
+
+        Returns:
+            int: number of entries removed
+        """
+        if not self.config.TASK_STREAM_MAX_LENGTH:
+            return 0
+        trimmed = 0
+        stream_names = list()
+        async for stream_name in self.client.scan_iter(
+            match="task:*:responses", count=batch_size, _type="stream"
+        ):
+            stream_names.append(stream_name)
+            if len(stream_names) >= batch_size:
+                trimmed += await self._trim_streams(stream_names)
+                stream_names = list()
+        if stream_names:
+            trimmed += await self._trim_streams(stream_names)
+        return trimmed
+
+    async def _trim_streams(self, stream_names: List) -> int:
+        pipeline = self.client.pipeline(transaction=False)
+        for stream_name in stream_names:
+            pipeline.xtrim(
+                stream_name,
+                maxlen=self.config.TASK_STREAM_MAX_LENGTH,
+                approximate=True,
+            )
+        return sum(await pipeline.execute())
+
+    async def expire_task_channels(self, task_uuid: str, seconds: int) -> None:
+        pipeline = self.client.pipeline(transaction=False)
+        for channel in ["request", "response", "requests", "responses"]:
+            pipeline.expire(f"task:{task_uuid}:{channel}", seconds)
+        await pipeline.execute()
+
+    async def register_task(self, task_uuid: str, task_status: str) -> bool:
+        """Sets the status of a new task and adds it to the task registry"""
+        keys, args = get_index_task_status_call(task_uuid, task_status, time.time())
+        return bool(await self.index_task_status_script(keys=keys, args=args))
+
+    async def set_task_status(self, task_uuid: str, task_status: str) -> bool:
+        """Sets the status of a task, keeping the task registry in sync"""
+        keys, args = get_index_task_status_call(task_uuid, task_status)
+        return bool(await self.index_task_status_script(keys=keys, args=args))
+
+    async def list_tasks(
+        self,
+        task_status: Optional[str] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> Tuple[int, List[Tuple[str, str]]]:
+        """Lists registered tasks newest first, see RedisClient.list_tasks"""
+        keys, args = get_list_tasks_call(task_status, offset, limit)
+        total, task_uuids, statuses = await self.list_tasks_script(keys=keys, args=args)
+        return int(total), get_task_page(task_uuids, statuses)
+
+    async def reconcile_task_registry(
+        self, batch_size: int = LIST_TASKS_CHUNK_SIZE
+    ) -> Tuple[int, int]:
+        """Syncs the status index with task:<uuid>:status, written by the workers
+
+        Tasks whose status differs from the hash, or that are missing from the
+        sorted set of their status, are indexed again. Tasks whose status key
+        is gone are unregistered.
+
+        Returns:
+            Tuple[int, int]: updated statuses and unregistered tasks
+        """
+        updated, unregistered = 0, 0
+        chunk_start = 0
+        while True:
+            entries = await self.client.zrange(
+                TASK_REGISTRY_KEY,
+                chunk_start,
+                chunk_start + batch_size - 1,
+                withscores=True,
+            )
+            if not entries:
+                return updated, unregistered
+            task_uuids = [task_uuid for task_uuid, _ in entries]
+            pipeline = self.client.pipeline(transaction=False)
+            pipeline.mget(
+                [f"task:{task_uuid.decode('utf-8')}:status" for task_uuid in task_uuids]
+            )
+            pipeline.hmget(TASK_STATUS_HASH_KEY, task_uuids)
+            statuses, indexed_statuses = await pipeline.execute()
+
+            pipeline = self.client.pipeline(transaction=False)
+            for task_uuid, task_status in zip(task_uuids, statuses):
+                pipeline.zscore(
+                    get_task_status_set_key((task_status or b"").decode("utf-8")),
+                    task_uuid,
+                )
+            scores = await pipeline.execute()
+
+            pipeline = self.client.pipeline(transaction=False)
+            for (task_uuid, registered_at), task_status, indexed_status, score in zip(
+                entries, statuses, indexed_statuses, scores
+            ):
+                if (
+                    task_status is not None
+                    and task_status == indexed_status
+                    and score == registered_at
+                ):
+                    continue
+                keys, args = get_index_task_status_call(task_uuid.decode("utf-8"))
+                await self.index_task_status_script(
+                    keys=keys, args=args, client=pipeline
+                )
+            results = await pipeline.execute() if len(pipeline) else []
+            removed = results.count(0)
+            updated += results.count(2)
+            unregistered += removed
+            # removed tasks no longer shift the next chunk
+            chunk_start += batch_size - removed
+
+    async def acquire_sam2_lease(self, task_uuid: str) -> Tuple[bool, int]:
+        """Takes one of the MAX_SAM2_MODEL_INSTANCES model slots for the task
+
+        Expired leases are reclaimed first, count and grant are atomic across
+        API replicas.
+
+        Returns:
+            Tuple[bool, int]: whether the task holds a lease and the active leases
+        """
+        leased = await self._get_leased_tasks()
+        is_leased, active = await self.acquire_lease_script(
+            keys=[
+                SAM2_LEASES_KEY,
+                get_sam2_lease_key(task_uuid),
+                *[get_sam2_lease_key(leased_uuid) for leased_uuid in leased],
+            ],
+            args=[
+                task_uuid,
+                self.config.MAX_SAM2_MODEL_INSTANCES,
+                int(self.config.SAM2_LEASE_TTL_SECONDS * 1000),
+                time.time(),
+                *leased,
+            ],
+        )
+        return bool(is_leased), int(active)
+
+    async def _get_leased_tasks(self) -> List[str]:
+        return [
+            task_uuid.decode("utf-8")
+            for task_uuid in await self.client.zrange(SAM2_LEASES_KEY, 0, -1)
+        ]
+
+    async def release_sam2_lease(self, task_uuid: str) -> bool:
+        return bool(
+            await self.release_lease_script(
+                keys=[SAM2_LEASES_KEY, get_sam2_lease_key(task_uuid)],
+                args=[task_uuid],
+            )
+        )
+
+    async def renew_sam2_leases(
+        self, terminal_statuses: List[str], renew: bool = True
+    ) -> Tuple[int, int]:
+        """Heartbeat of the model leases, see RENEW_LEASES_SCRIPT
+
+        Args:
+            terminal_statuses (List[str]): leases of tasks in these statuses are released
+            renew (bool, optional): renew leases of tasks with a worker heartbeat.
+                Defaults to True.
+
+        Returns:
+            Tuple[int, int]: active leases and leases released by this call
+        """
+        leased = await self._get_leased_tasks()
+        keys = [SAM2_LEASES_KEY]
+        for task_uuid in leased:
+            keys.extend(
+                [
+                    get_sam2_lease_key(task_uuid),
+                    f"task:{task_uuid}:status",
+                    get_task_heartbeat_key(task_uuid),
+                ]
+            )
+        active, released = await self.renew_leases_script(
+            keys=keys,
+            args=[
+                int(self.config.SAM2_LEASE_TTL_SECONDS * 1000),
+                "1" if renew else "0",
+                len(terminal_statuses),
+                *terminal_statuses,
+                *leased,
+            ],
+        )
+        return int(active), int(released)
+
+
+def get_async_redis_client(connection: HTTPConnection) -> AsyncRedisClient:
+    """Returns the client the lifespan stored in the app state
+
+    Works for both requests and websockets.
+    """
+    return connection.app.state.redis
@@ -1,13 +1,209 @@
 import json
+import time
 import redis
 
 
-from typing import List, Any, Optional, Awaitable, Union, Literal, Tuple
+from typing import List, Any, Optional, Awaitable, Union, Literal, Tuple, Iterator
 
 import redis.typing
 
+import enums
 from settings import settings
 
+TASK_REGISTRY_KEY = "tasks:registry"
+TASK_STATUS_HASH_KEY = "tasks:status"
+TASK_STATUSES = [task_status.value for task_status in enums.TaskStatusEnum]
+
+# registry entries the reconciler reads per batch
+LIST_TASKS_CHUNK_SIZE = 500
+
+
+def get_task_status_set_key(task_status: str) -> str:
+    """Sorted set of the registered tasks with a status, scored like the registry"""
+    return f"tasks:status:{task_status}"
+
+
+# Writes the status of a task, or reads the one a SAM2 worker wrote, and files
+# the task under it in the status hash and in the sorted set of its status.
+# task:<uuid>:status stays the source of truth, a task whose status key is
+# gone is unregistered.
+# KEYS[1]: task status key, KEYS[2]: registry, KEYS[3]: status hash,
+# KEYS[4..]: status sorted sets, in the order of their statuses in ARGV
+# ARGV[1]: task uuid, ARGV[2]: status to write, empty to keep the stored one,
+# ARGV[3]: registration time, empty for a registered task, ARGV[4..]: statuses
+# Returns 0 if the task was unregistered, 2 if its index changed, 1 otherwise
+INDEX_TASK_STATUS_SCRIPT = """
+local task_uuid = ARGV[1]
+if ARGV[2] ~= '' then
+    redis.call('SET', KEYS[1], ARGV[2])
+end
+if ARGV[3] ~= '' then
+    redis.call('ZADD', KEYS[2], ARGV[3], task_uuid)
+end
+local task_status = redis.call('GET', KEYS[1])
+local registered = redis.call('ZSCORE', KEYS[2], task_uuid)
+if not task_status then
+    redis.call('ZREM', KEYS[2], task_uuid)
+    redis.call('HDEL', KEYS[3], task_uuid)
+    for i = 4, #KEYS do
+        redis.call('ZREM', KEYS[i], task_uuid)
+    end
+    return 0
+end
+if not registered then
+    return 1
+end
+local changed = 0
+if redis.call('HGET', KEYS[3], task_uuid) ~= task_status then
+    redis.call('HSET', KEYS[3], task_uuid, task_status)
+    changed = 1
+end
+for i = 4, #KEYS do
+    if ARGV[i] == task_status then
+        changed = changed + redis.call('ZADD', KEYS[i], registered, task_uuid)
+    else
+        changed = changed + redis.call('ZREM', KEYS[i], task_uuid)
+    end
+end
+if changed > 0 then
+    return 2
+end
+return 1
+"""
+
+# A page of the registry or of a status sorted set, newest first, with the
+# statuses of its tasks.
+# KEYS[1]: sorted set, KEYS[2]: status hash, ARGV[1]: start, ARGV[2]: stop
+# Returns the size of the sorted set, the task uuids and their statuses
+LIST_TASKS_SCRIPT = """
+local task_uuids = redis.call('ZREVRANGE', KEYS[1], ARGV[1], ARGV[2])
+local statuses = {}
+for i = 1, #task_uuids, 1000 do
+    local chunk = redis.call(
+        'HMGET', KEYS[2], unpack(task_uuids, i, math.min(i + 999, #task_uuids))
+    )
+    for _, task_status in ipairs(chunk) do
+        statuses[#statuses + 1] = task_status
+    end
+end
+return {redis.call('ZCARD', KEYS[1]), task_uuids, statuses}
+"""
+
+
+def get_index_task_status_call(
+    task_uuid: str, task_status: str = "", registered_at: Union[float, str] = ""
+) -> Tuple[List[str], List[Any]]:
+    """KEYS and ARGV of INDEX_TASK_STATUS_SCRIPT"""
+    keys = [
+        f"task:{task_uuid}:status",
+        TASK_REGISTRY_KEY,
+        TASK_STATUS_HASH_KEY,
+        *[get_task_status_set_key(status_value) for status_value in TASK_STATUSES],
+    ]
+    return keys, [task_uuid, task_status, registered_at, *TASK_STATUSES]
+
+
+def get_list_tasks_call(
+    task_status: Optional[str], offset: int, limit: Optional[int]
+) -> Tuple[List[str], List[Any]]:
+    """KEYS and ARGV of LIST_TASKS_SCRIPT"""
+    if task_status is None:
+        key = TASK_REGISTRY_KEY
+    else:
+        key = get_task_status_set_key(task_status)
+    stop = -1 if limit is None else offset + limit - 1
+    return [key, TASK_STATUS_HASH_KEY], [offset, stop]
+
+
+def get_task_page(task_uuids: List[bytes], statuses: List[Optional[bytes]]):
+    """(uuid, status) pairs of a registry page, tasks without a status are skipped"""
+    return [
+        (task_uuid.decode("utf-8"), task_status.decode("utf-8"))
+        for task_uuid, task_status in zip(task_uuids, statuses)
+        if task_status is not None
+    ]
+
+
+SAM2_LEASES_KEY = "sam2:leases"
+
+
+def get_sam2_lease_key(task_uuid: str) -> str:
+    return f"sam2:lease:{task_uuid}"
+
+
+def get_task_heartbeat_key(task_uuid: str) -> str:
+    """Written by the worker with a ttl while the model of the task is loaded"""
+    return f"task:{task_uuid}:heartbeat"
+
+
+# A task holds one of MAX_SAM2_MODEL_INSTANCES GPU slots while sam2:lease:<uuid>
+# exists. The key expires unless it is renewed, the leases sorted set indexes
+# the keys so a slot is counted and reclaimed in the same script.
+# Every key is passed in KEYS, the caller reads the leased tasks beforehand.
+# Tasks leased in between are counted but reclaimed only by a later call.
+# KEYS[1]: leases sorted set, KEYS[2]: lease key of the task,
+# KEYS[3..]: lease keys of the leased tasks
+# ARGV[1]: task uuid, ARGV[2]: maximum leases, ARGV[3]: ttl in ms, ARGV[4]: now,
+# ARGV[5..]: leased tasks, in the order of their lease keys
+ACQUIRE_LEASE_SCRIPT = """
+for i = 3, #KEYS do
+    if redis.call('EXISTS', KEYS[i]) == 0 then
+        redis.call('ZREM', KEYS[1], ARGV[i + 2])
+    end
+end
+local lease_key = KEYS[2]
+local active = redis.call('ZCARD', KEYS[1])
+if redis.call('EXISTS', lease_key) == 1 then
+    redis.call('PEXPIRE', lease_key, ARGV[3])
+    return {1, active}
+end
+if active >= tonumber(ARGV[2]) then
+    return {0, active}
+end
+redis.call('SET', lease_key, ARGV[4], 'PX', ARGV[3])
+redis.call('ZADD', KEYS[1], ARGV[4], ARGV[1])
+return {1, active + 1}
+"""
+
+# KEYS[1]: leases sorted set, KEYS[2]: lease key of the task, ARGV[1]: task uuid
+RELEASE_LEASE_SCRIPT = """
+redis.call('DEL', KEYS[2])
+return redis.call('ZREM', KEYS[1], ARGV[1])
+"""
+
+# Heartbeat of all leases: leases of tasks in a terminal status are released and
+# expired leases are reclaimed. With ARGV[2] == '1' the leases of tasks whose
+# worker heartbeat key exists are renewed. The status key alone proves nothing,
+# a crashed worker leaves it behind, so its lease expires.
+# KEYS[1]: leases sorted set, then per leased task its lease, status and
+# heartbeat keys
+# ARGV[1]: ttl in ms, ARGV[2]: renew, ARGV[3]: number of terminal statuses n,
+# ARGV[4..3+n]: terminal statuses, ARGV[4+n..]: leased tasks
+RENEW_LEASES_SCRIPT = """
+local terminal = {}
+local status_count = tonumber(ARGV[3])
+for i = 4, 3 + status_count do
+    terminal[ARGV[i]] = true
+end
+local released = 0
+for i = 1, (#KEYS - 1) / 3 do
+    local task_uuid = ARGV[3 + status_count + i]
+    local lease_key = KEYS[3 * i - 1]
+    local task_status = redis.call('GET', KEYS[3 * i])
+    if task_status and terminal[task_status] then
+        redis.call('DEL', lease_key)
+        redis.call('ZREM', KEYS[1], task_uuid)
+        released = released + 1
+    elseif redis.call('EXISTS', lease_key) == 0 then
+        redis.call('ZREM', KEYS[1], task_uuid)
+        released = released + 1
+    elseif ARGV[2] == '1' and redis.call('EXISTS', KEYS[3 * i + 1]) == 1 then
+        redis.call('PEXPIRE', lease_key, ARGV[1])
+    end
+end
+return {redis.call('ZCARD', KEYS[1]), released}
+"""
+
 
 class RedisClient:
     def __init__(self, config=settings) -> None:
@@ -18,6 +214,10 @@ class RedisClient:
             password=config.REDIS_PASSWORD,
             db=int(config.REDIS_DB),
         )
+        self.index_task_status_script = self.client.register_script(
+            INDEX_TASK_STATUS_SCRIPT
+        )
+        self.list_tasks_script = self.client.register_script(LIST_TASKS_SCRIPT)
         
     def get_keys_with_pattern(self, pattern: str) -> List[str]:
         keys = self.client.keys(pattern)
@@ -29,6 +229,17 @@ class RedisClient:
         return [value.decode("utf-8") for value in values] # type: ignore
 
 
+    def iter_keys_with_pattern(self, pattern: str, count: int = 1000) -> Iterator[str]:
+        """Iterates keys with SCAN, unlike KEYS it does not block redis"""
+        for key in self.client.scan_iter(match=pattern, count=count):
+            yield key.decode("utf-8")
+
+    def get_raw_values(self, keys: List[str]) -> List[Optional[bytes]]:
+        """MGET without decoding, missing keys are None"""
+        if not keys:
+            return []
+        return self.client.mget(keys)  # type: ignore
+
     def set(
         self, key: str, value: Union[str, int, float], ttl: Optional[int] = None
     ) -> bool:
@@ -41,8 +252,61 @@ class RedisClient:
         value = self.client.get(key)
         return value.decode("utf-8") if value else None  # type: ignore
 
-    def get_lock(self, lock_name):
-        return self.client.lock(lock_name)
+    def get_lock(self, lock_name, timeout: Optional[float] = None):
+        return self.client.lock(lock_name, timeout=timeout)
+
+    def register_task(self, task_uuid: str, task_status: str) -> bool:
+        """Sets the status of a new task and adds it to the task registry"""
+        keys, args = get_index_task_status_call(task_uuid, task_status, time.time())
+        return bool(self.index_task_status_script(keys=keys, args=args))
+
+    def set_task_status(self, task_uuid: str, task_status: str) -> bool:
+        """Sets the status of a task, keeping the task registry in sync"""
+        keys, args = get_index_task_status_call(task_uuid, task_status)
+        return bool(self.index_task_status_script(keys=keys, args=args))
+
+    def list_tasks(
+        self,
+        task_status: Optional[str] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> Tuple[int, List[Tuple[str, str]]]:
+        """Lists registered tasks newest first
+
+        A page is read in one script call, from the registry or from the
+        sorted set of the status, with the statuses from the status hash.
+
+        Args:
+            task_status (Optional[str], optional): only tasks with this status. Defaults to None.
+            offset (int, optional): number of tasks to skip. Defaults to 0.
+            limit (Optional[int], optional): page size, all tasks if None. Defaults to None.
+
+        Returns:
+            Tuple[int, List[Tuple[str, str]]]: total matching tasks and (uuid, status) pairs
+        """
+        keys, args = get_list_tasks_call(task_status, offset, limit)
+        total, task_uuids, statuses = self.list_tasks_script(keys=keys, args=args)
+        return int(total), get_task_page(task_uuids, statuses)
+
+    def backfill_task_registry(self) -> int:
+        """Registers tasks created before the registry existed.
+
+        Uses SCAN, so the keyspace is walked incrementally without blocking Redis.
+        Creation time of these tasks is unknown, they are listed as the oldest.
+
+        Returns:
+            int: number of registered tasks
+        """
+        registered = 0
+        pipeline = self.client.pipeline(transaction=False)
+        for key in self.client.scan_iter(match="task:*:status", count=1000):
+            parts = key.decode("utf-8").split(":")
+            if len(parts) != 3:
+                continue
+            pipeline.zadd(TASK_REGISTRY_KEY, {parts[1]: 0}, nx=True)
+            registered += 1
+        pipeline.execute()
+        return registered
 
     def add_set(self, key: str, values: List[str]) -> Any:
         return self.client.sadd(key, *values)
@@ -207,9 +471,16 @@ class RedisClient:
         return out
 
 
+_REDIS_CLIENT: Optional[RedisClient] = None
+
+
 def get_redis_client() -> Optional[RedisClient]:
-    try:
-        return RedisClient()
-    except Exception as e:
-        print(f"Error connecting to redis: {e}")
-        return None
+    """Returns the client of the process, all callers share its connection pool"""
+    global _REDIS_CLIENT
+    if _REDIS_CLIENT is None:
+        try:
+            _REDIS_CLIENT = RedisClient()
+        except Exception as e:
+            print(f"Error connecting to redis: {e}")
+            return None
+    return _REDIS_CLIENT
@@ -1,3 +1,7 @@
 from .video_status import VideoStatus as VideoStatusEnum
 from .task import Task, TaskStatusEnum
 from .annotation import AnnotationStatusEnum
+from .frame_extraction import FrameExtractionModeEnum
+from .export_job import ExportJobStatusEnum
+from .polygon_simplification import PolygonSimplificationMethodEnum
+from .websocket import WebSocketRoleEnum
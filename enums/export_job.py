@@ -0,0 +1,8 @@
+from enum import Enum
+
+
+class ExportJobStatusEnum(Enum):
+    QUEUED = "queued"  # waiting for an export worker
+    RUNNING = "running"  # batches are being written, progress is checkpointed
+    COMPLETED = "completed"
+    FAILED = "failed"
@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class FrameExtractionModeEnum(Enum):
+    ALL = "all"  # extract every frame of the video
+    STRIDE = "stride"  # extract every n-th frame
+    SCENE_CHANGE = "scene_change"  # extract frames where the scene changes
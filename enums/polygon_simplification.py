@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class PolygonSimplificationMethodEnum(Enum):
+    NONE = "none"  # polygons are returned as the worker stored them
+    DOUGLAS_PEUCKER = "douglas-peucker"  # tolerance is a distance in pixels
+    VISVALINGAM = "visvalingam"  # tolerance squared is a triangle area in pixels
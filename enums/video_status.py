@@ -6,3 +6,5 @@ class VideoStatus(Enum):
     PENDING = "pending"
     PROCESSING = "processing"
     FAILED = "failed"
+    DELETING = "deleting"  # tombstoned, files are waiting for the reaper
+    DELETED = "deleted"  # files are reclaimed, row is kept for references
@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class WebSocketRoleEnum(Enum):
+    ANNOTATOR = "annotator"  # sends prompts and receives the results
+    VIEWER = "viewer"  # receives the results only
@@ -0,0 +1,22 @@
+from typing import Literal
+
+from .base import DatasetExporter, DatasetInfo
+from .coco import CocoExporter
+from .yolo import YoloExporter
+from .cvat import CvatExporter
+
+DatasetFormat = Literal["coco", "yolo", "yolo-seg", "cvat"]
+
+
+def get_dataset_exporter(
+    dataset_format: DatasetFormat, info: DatasetInfo
+) -> DatasetExporter:
+    if dataset_format == "coco":
+        return CocoExporter(info)
+    if dataset_format == "yolo":
+        return YoloExporter(info, task="detect")
+    if dataset_format == "yolo-seg":
+        return YoloExporter(info, task="segment")
+    if dataset_format == "cvat":
+        return CvatExporter(info)
+    raise ValueError(f"Unknown dataset format: {dataset_format}")
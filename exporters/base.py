@@ -0,0 +1,98 @@
+import os
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from .geometry import FrameObjects
+from .zip_stream import ZipStreamBuffer, open_zip_stream, write_image
+
+
+class DatasetInfo:
+    def __init__(
+        self,
+        name: str,
+        image_width: int,
+        image_height: int,
+        include_images: bool = False,
+    ) -> None:
+        self.name = name
+        self.image_width = image_width
+        self.image_height = image_height
+        self.include_images = include_images
+
+
+class DatasetExporter:
+    """Streams a dataset zip from ImageAnnotation JSON documents in frame order.
+
+    Subclasses write one frame at a time with write_frame and the files that
+    need every frame, e.g. category lists, in finish. Coordinates of the
+    annotations are pixels of the extracted frames.
+    """
+
+    format_name: str = ""
+
+    def __init__(self, info: DatasetInfo) -> None:
+        self.info = info
+        self.label_ids: Dict[str, int] = dict()
+
+    def get_label_id(self, label: str) -> int:
+        """Zero based label id in order of appearance"""
+        if label not in self.label_ids:
+            self.label_ids[label] = len(self.label_ids)
+        return self.label_ids[label]
+
+    @staticmethod
+    def get_image_name(annotation: Dict[str, Any]) -> str:
+        image_path = annotation.get("image_path") or ""
+        if image_path:
+            return os.path.basename(image_path)
+        return f"{int(annotation['meta']['frame_idx']) + 1:08d}.jpg"
+
+    def write_frame(self, zip_file, annotation: Dict[str, Any], objects: FrameObjects):
+        raise NotImplementedError
+
+    def finish(self, zip_file) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Releases spooled files, called even if the export is interrupted"""
+
+    def iter_zip(self, records: Iterable[bytes]) -> Iterator[bytes]:
+        """Yields the zip file chunk by chunk
+
+        Args:
+            records (Iterable[bytes]): ImageAnnotation JSON documents in frame order
+
+        Returns:
+            Iterator[bytes]: zip bytes
+        """
+        buffer = ZipStreamBuffer()
+        try:
+            with open_zip_stream(buffer) as zip_file:
+                for record in records:
+                    annotation = json.loads(record)
+                    self.write_frame(zip_file, annotation, FrameObjects(annotation))
+                    if self.info.include_images and annotation.get("image_path"):
+                        write_image(
+                            zip_file,
+                            annotation["image_path"],
+                            f"images/{self.get_image_name(annotation)}",
+                        )
+                    chunk = buffer.drain()
+                    if chunk:
+                        yield chunk
+                self.finish(zip_file)
+            yield buffer.drain()
+        finally:
+            self.close()
+
+
+def format_values(values: Iterable[float]) -> str:
+    return " ".join(f"{value:.6f}" for value in values)
+
+
+def get_labels_in_order(label_ids: Dict[str, int]) -> List[str]:
+    return sorted(label_ids, key=label_ids.__getitem__)
+
+
+def get_score(score: Optional[float]) -> Optional[float]:
+    return float(score) if score is not None else None
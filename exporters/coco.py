@@ -0,0 +1,91 @@
+import json
+from typing import Any, Dict
+
+from .base import DatasetExporter, DatasetInfo, get_labels_in_order, get_score
+from .geometry import FrameObjects, xyxy_to_xywh
+from .zip_stream import copy_to_entry, spooled_file
+
+
+class CocoExporter(DatasetExporter):
+    """COCO instances JSON.
+
+    Categories are known only after the last frame, and frame images may be
+    written to the zip in between, so image and annotation entries are spooled
+    to temporary files and copied into the JSON entry at the end.
+    """
+
+    format_name = "coco"
+
+    def __init__(self, info: DatasetInfo) -> None:
+        super().__init__(info)
+        self._images = spooled_file()
+        self._annotations = spooled_file()
+        self._annotation_id = 0
+        self._image_count = 0
+
+    def _write_array_item(self, file, count: int, item: Dict[str, Any]) -> None:
+        file.write((b"," if count else b"") + json.dumps(item).encode("utf-8"))
+
+    def write_frame(self, zip_file, annotation: Dict[str, Any], objects: FrameObjects):
+        meta = annotation.get("meta") or dict()
+        frame_idx = meta.get("frame_idx")
+        image_id = int(frame_idx) if frame_idx is not None else self._image_count
+        self._write_array_item(
+            self._images,
+            self._image_count,
+            {
+                "id": image_id,
+                "file_name": self.get_image_name(annotation),
+                "width": self.info.image_width,
+                "height": self.info.image_height,
+                "frame_idx": meta.get("frame_idx"),
+                "original_frame_idx": meta.get("original_frame_idx"),
+            },
+        )
+        self._image_count += 1
+
+        boxes = xyxy_to_xywh(objects.boxes).round(2).tolist()
+        areas = objects.areas.round(2).tolist()
+        segmentations = dict(
+            zip(
+                objects.polygon_object_indices.tolist(),
+                (
+                    [polygon.ravel().round(2).tolist()]
+                    for polygon in objects.split_polygon_points()
+                ),
+            )
+        )
+        for idx, label in enumerate(objects.labels):
+            item = {
+                "id": self._annotation_id + 1,
+                "image_id": image_id,
+                "category_id": self.get_label_id(label) + 1,
+                "bbox": boxes[idx],
+                "area": areas[idx],
+                "segmentation": segmentations.get(idx, []),
+                "iscrowd": 0,
+            }
+            score = get_score(objects.scores[idx])
+            if score is not None:
+                item["score"] = score
+            self._write_array_item(self._annotations, self._annotation_id, item)
+            self._annotation_id += 1
+
+    def finish(self, zip_file) -> None:
+        categories = [
+            {"id": idx + 1, "name": label, "supercategory": ""}
+            for idx, label in enumerate(get_labels_in_order(self.label_ids))
+        ]
+        info = {"description": self.info.name}
+        with zip_file.open("annotations/instances.json", mode="w") as entry:
+            entry.write(b'{"info":' + json.dumps(info).encode("utf-8"))
+            entry.write(b',"categories":' + json.dumps(categories).encode("utf-8"))
+            entry.write(b',"images":[')
+            copy_to_entry(self._images, entry)
+            entry.write(b'],"annotations":[')
+            copy_to_entry(self._annotations, entry)
+            entry.write(b"]}")
+
+    def close(self) -> None:
+        self._images.close()
+        self._annotations.close()
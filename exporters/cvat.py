@@ -0,0 +1,78 @@
+from typing import Any, Dict
+from xml.sax.saxutils import quoteattr
+
+from .base import DatasetExporter, DatasetInfo, get_labels_in_order
+from .geometry import FrameObjects
+from .zip_stream import copy_to_entry, spooled_file
+
+
+class CvatExporter(DatasetExporter):
+    """CVAT for images 1.1 XML.
+
+    The label list in <meta> must come before the images, image elements are
+    spooled to a temporary file and written after the meta block.
+    """
+
+    format_name = "cvat"
+
+    def __init__(self, info: DatasetInfo) -> None:
+        super().__init__(info)
+        self._images = spooled_file()
+        self._image_count = 0
+
+    def write_frame(self, zip_file, annotation: Dict[str, Any], objects: FrameObjects):
+        meta = annotation.get("meta") or dict()
+        frame_idx = meta.get("frame_idx")
+        image_id = int(frame_idx) if frame_idx is not None else self._image_count
+        elements = [
+            f'  <image id="{image_id}" name={quoteattr(self.get_image_name(annotation))} '
+            f'width="{self.info.image_width}" height="{self.info.image_height}">'
+        ]
+        polygons = dict(
+            zip(
+                objects.polygon_object_indices.tolist(),
+                objects.split_polygon_points(),
+            )
+        )
+        for idx, label in enumerate(objects.labels):
+            self.get_label_id(label)
+            polygon = polygons.get(idx)
+            if polygon is not None:
+                points = ";".join(f"{x:.2f},{y:.2f}" for x, y in polygon.tolist())
+                elements.append(
+                    f'    <polygon label={quoteattr(label)} occluded="0" source="auto" '
+                    f'points="{points}" z_order="0"></polygon>'
+                )
+            else:
+                xmin, ymin, xmax, ymax = objects.boxes[idx].tolist()
+                elements.append(
+                    f'    <box label={quoteattr(label)} occluded="0" source="auto" '
+                    f'xtl="{xmin:.2f}" ytl="{ymin:.2f}" xbr="{xmax:.2f}" ybr="{ymax:.2f}" '
+                    f'z_order="0"></box>'
+                )
+        elements.append("  </image>\n")
+        self._images.write("\n".join(elements).encode("utf-8"))
+        self._image_count += 1
+
+    def finish(self, zip_file) -> None:
+        labels = "".join(
+            f"        <label><name>{quoteattr(label)[1:-1]}</name><type>any</type>"
+            f"<attributes></attributes></label>\n"
+            for label in get_labels_in_order(self.label_ids)
+        )
+        with zip_file.open("annotations.xml", mode="w") as entry:
+            entry.write(
+                (
+                    '<?xml version="1.0" encoding="utf-8"?>\n<annotations>\n'
+                    "  <version>1.1</version>\n  <meta>\n    <task>\n"
+                    f"      <name>{quoteattr(self.info.name)[1:-1]}</name>\n"
+                    f"      <size>{self._image_count}</size>\n"
+                    f"      <labels>\n{labels}      </labels>\n"
+                    "    </task>\n  </meta>\n"
+                ).encode("utf-8")
+            )
+            copy_to_entry(self._images, entry)
+            entry.write(b"</annotations>\n")
+
+    def close(self) -> None:
+        self._images.close()
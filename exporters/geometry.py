@@ -0,0 +1,160 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_LABEL = "object"
+
+
+class FrameObjects:
+    """Geometry of all objects annotated on a frame, as NumPy arrays.
+
+    Bbox and polygon annotations with the same id are the same object.
+    Polygons of a frame are concatenated into one point array, so bounds and
+    areas of every polygon are computed with a few vectorized reductions
+    instead of a Python loop per object.
+
+    Attributes:
+        ids (List[str]): object ids
+        labels (List[str]): object labels
+        scores (List[Optional[float]]): object confidences
+        boxes (np.ndarray): (N, 4) xmin, ymin, xmax, ymax in pixels
+        areas (np.ndarray): (N,) polygon area, box area for objects without polygon
+        polygon_object_indices (np.ndarray): object index of every polygon
+        polygon_points (np.ndarray): (P, 2) points of all polygons
+        polygon_offsets (np.ndarray): start of every polygon in polygon_points
+    """
+
+    def __init__(self, annotation: Dict[str, Any]) -> None:
+        objects: Dict[str, Dict[str, Any]] = dict()
+        for bbox in annotation.get("bbox_annotations") or []:
+            objects.setdefault(str(bbox["id"]), dict())["bbox"] = bbox
+        for polygon in annotation.get("polygon_annotations") or []:
+            if len(polygon.get("coordinates") or []) >= 3:
+                objects.setdefault(str(polygon["id"]), dict())["polygon"] = polygon
+
+        self.ids = list(objects)
+        self.labels: List[str] = []
+        self.scores: List[Optional[float]] = []
+        boxes = np.zeros((len(objects), 4), dtype=np.float64)
+        has_box = np.zeros(len(objects), dtype=bool)
+        polygon_object_indices, polygon_coordinates = [], []
+        for idx, parts in enumerate(objects.values()):
+            source = parts.get("bbox") or parts["polygon"]
+            self.labels.append(source.get("label") or DEFAULT_LABEL)
+            self.scores.append(source.get("confidence"))
+            if "bbox" in parts:
+                bbox = parts["bbox"]
+                boxes[idx] = (bbox["xmin"], bbox["ymin"], bbox["xmax"], bbox["ymax"])
+                has_box[idx] = True
+            if "polygon" in parts:
+                polygon_object_indices.append(idx)
+                polygon_coordinates.append(parts["polygon"]["coordinates"])
+
+        self.polygon_object_indices = np.asarray(polygon_object_indices, dtype=np.int64)
+        self.polygon_points, self.polygon_offsets = _concatenate_polygons(
+            polygon_coordinates
+        )
+        polygon_bounds = polygon_bounds_xyxy(self.polygon_points, self.polygon_offsets)
+        polygon_areas = polygon_area(self.polygon_points, self.polygon_offsets)
+
+        # boxes of polygon-only objects come from the polygon bounds
+        missing_box = ~has_box[self.polygon_object_indices]
+        boxes[self.polygon_object_indices[missing_box]] = polygon_bounds[missing_box]
+        self.boxes = boxes
+        self.areas = box_area(boxes)
+        self.areas[self.polygon_object_indices] = polygon_areas
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def split_polygon_points(
+        self, points: Optional[np.ndarray] = None
+    ) -> List[np.ndarray]:
+        """Splits concatenated points, e.g. normalized polygon_points, per polygon"""
+        points = self.polygon_points if points is None else points
+        return np.split(points, self.polygon_offsets[1:]) if len(points) else []
+
+
+def _concatenate_polygons(
+    polygon_coordinates: List[List[List[float]]],
+) -> Tuple[np.ndarray, np.ndarray]:
+    if not polygon_coordinates:
+        return np.zeros((0, 2), dtype=np.float64), np.zeros(0, dtype=np.int64)
+    lengths = np.fromiter(
+        (len(coordinates) for coordinates in polygon_coordinates), dtype=np.int64
+    )
+    points = np.asarray(
+        [point for coordinates in polygon_coordinates for point in coordinates],
+        dtype=np.float64,
+    ).reshape(-1, 2)
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    return points, offsets
+
+
+def polygon_area(points: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Shoelace area of every polygon in a concatenated point array
+
+    Args:
+        points (np.ndarray): (P, 2) points of all polygons
+        offsets (np.ndarray): start of every polygon, polygons are not empty
+
+    Returns:
+        np.ndarray: (len(offsets),) areas
+    """
+    if len(offsets) == 0:
+        return np.zeros(0, dtype=np.float64)
+    # index of the next point, the last point of a polygon wraps to its first
+    next_indices = np.arange(1, len(points) + 1)
+    ends = np.append(offsets[1:], len(points)) - 1
+    next_indices[ends] = offsets
+    x, y = points[:, 0], points[:, 1]
+    cross = x * y[next_indices] - x[next_indices] * y
+    return 0.5 * np.abs(np.add.reduceat(cross, offsets))
+
+
+def polygon_bounds_xyxy(points: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Bounding box of every polygon in a concatenated point array"""
+    if len(offsets) == 0:
+        return np.zeros((0, 4), dtype=np.float64)
+    return np.stack(
+        [
+            np.minimum.reduceat(points[:, 0], offsets),
+            np.minimum.reduceat(points[:, 1], offsets),
+            np.maximum.reduceat(points[:, 0], offsets),
+            np.maximum.reduceat(points[:, 1], offsets),
+        ],
+        axis=1,
+    )
+
+
+def box_area(boxes_xyxy: np.ndarray) -> np.ndarray:
+    return np.clip(boxes_xyxy[:, 2] - boxes_xyxy[:, 0], 0, None) * np.clip(
+        boxes_xyxy[:, 3] - boxes_xyxy[:, 1], 0, None
+    )
+
+
+def xyxy_to_xywh(boxes_xyxy: np.ndarray) -> np.ndarray:
+    """COCO boxes, top left corner with width and height"""
+    boxes = boxes_xyxy.copy()
+    boxes[:, 2:] -= boxes[:, :2]
+    return boxes
+
+
+def normalize_xyxy_to_cxcywh(
+    boxes_xyxy: np.ndarray, width: int, height: int
+) -> np.ndarray:
+    """YOLO boxes, center with width and height relative to the image size"""
+    boxes = np.clip(boxes_xyxy / (width, height, width, height), 0, 1)
+    return np.stack(
+        [
+            (boxes[:, 0] + boxes[:, 2]) / 2,
+            (boxes[:, 1] + boxes[:, 3]) / 2,
+            boxes[:, 2] - boxes[:, 0],
+            boxes[:, 3] - boxes[:, 1],
+        ],
+        axis=1,
+    )
+
+
+def normalize_points(points: np.ndarray, width: int, height: int) -> np.ndarray:
+    return np.clip(points / (width, height), 0, 1)
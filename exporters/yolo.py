@@ -0,0 +1,69 @@
+import os
+from typing import Any, Dict
+
+import numpy as np
+
+from .base import DatasetExporter, DatasetInfo, format_values, get_labels_in_order
+from .geometry import FrameObjects, normalize_points, normalize_xyxy_to_cxcywh
+
+
+class YoloExporter(DatasetExporter):
+    """YOLO txt labels, one file per frame with normalized coordinates.
+
+    "detect" writes boxes, "segment" writes polygons in the YOLO segmentation
+    format, objects without polygon fall back to their box corners.
+    """
+
+    format_name = "yolo"
+
+    def __init__(self, info: DatasetInfo, task: str = "detect") -> None:
+        super().__init__(info)
+        self.task = task
+
+    def write_frame(self, zip_file, annotation: Dict[str, Any], objects: FrameObjects):
+        if not len(objects):
+            lines = []
+        elif self.task == "segment":
+            lines = self._get_segment_lines(objects)
+        else:
+            boxes = normalize_xyxy_to_cxcywh(
+                objects.boxes, self.info.image_width, self.info.image_height
+            )
+            lines = [
+                f"{self.get_label_id(label)} {format_values(box)}"
+                for label, box in zip(objects.labels, boxes)
+            ]
+        label_name = os.path.splitext(self.get_image_name(annotation))[0] + ".txt"
+        zip_file.writestr(f"labels/{label_name}", "\n".join(lines))
+
+    def _get_segment_lines(self, objects: FrameObjects):
+        width, height = self.info.image_width, self.info.image_height
+        polygons = dict(
+            zip(
+                objects.polygon_object_indices.tolist(),
+                objects.split_polygon_points(
+                    normalize_points(objects.polygon_points, width, height)
+                ),
+            )
+        )
+        lines = []
+        for idx, label in enumerate(objects.labels):
+            polygon = polygons.get(idx)
+            if polygon is None:
+                xmin, ymin, xmax, ymax = objects.boxes[idx]
+                polygon = normalize_points(
+                    np.array([[xmin, ymin], [xmax, ymin], [xmax, ymax], [xmin, ymax]]),
+                    width,
+                    height,
+                )
+            lines.append(f"{self.get_label_id(label)} {format_values(polygon.ravel())}")
+        return lines
+
+    def finish(self, zip_file) -> None:
+        labels = get_labels_in_order(self.label_ids)
+        zip_file.writestr("classes.txt", "\n".join(labels))
+        names = "\n".join(f"  {idx}: {label}" for idx, label in enumerate(labels))
+        zip_file.writestr(
+            "data.yaml",
+            f"path: .\ntrain: images\nval: images\nnames:\n{names}\n",
+        )
@@ -0,0 +1,53 @@
+import os
+import shutil
+import zipfile
+import tempfile
+from typing import IO, List
+
+# entries spooled to disk above this size, e.g. COCO images or CVAT image elements
+SPOOL_MAX_MEMORY_SIZE = 8 * 1024 * 1024
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class ZipStreamBuffer:
+    """Write-only file object for zipfile that hands written bytes to a generator.
+
+    It has no tell/seek, so zipfile writes entries with data descriptors and
+    never goes back in the stream. The generator drains the buffer after every
+    write step, only the compressed bytes of that step are held in memory.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        if data:
+            self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def open_zip_stream(buffer: ZipStreamBuffer) -> zipfile.ZipFile:
+    return zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_DEFLATED)
+
+
+def spooled_file() -> IO[bytes]:
+    return tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY_SIZE, mode="w+b")
+
+
+def copy_to_entry(source: IO[bytes], entry: IO[bytes]) -> None:
+    source.seek(0)
+    shutil.copyfileobj(source, entry, COPY_CHUNK_SIZE)
+
+
+def write_image(zip_file: zipfile.ZipFile, image_path: str, arcname: str) -> None:
+    """Adds a frame image, JPEGs are stored as is since they do not compress"""
+    if os.path.isfile(image_path):
+        zip_file.write(image_path, arcname, compress_type=zipfile.ZIP_STORED)
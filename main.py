@@ -1,5 +1,6 @@
 import os
 import json
+import asyncio
 import dotenv
 from numpy import isin
 
@@ -8,16 +9,30 @@ from db.redis_client import RedisClient
 dotenv.load_dotenv(".env.general")
 print(f"ENVIRONMENT: {os.environ.get('MAX_SAM2_MODEL_INSTANCES')}")
 
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import Response, StreamingResponse
 
 import database_models as dbmodels
-from db import Base, engine, get_db, get_redis_client
-from app import CustomHTTPException
-from app import video_router, ai_model_router, files_router, frames_router, task_router
+from db import Base, engine, get_db, get_redis_client, dispose_async_engine
+from db import AsyncRedisClient, get_async_redis_client
+from app import CustomHTTPException, FILE_CATALOG, MEDIA_PROBER, RESPONSE_BRIDGE
+from app import WSMANAGER, TASK_HUBS
+from app import (
+    video_router,
+    ai_model_router,
+    files_router,
+    frames_router,
+    task_router,
+    playback_router,
+)
+from background_tasks import run_video_reaper, run_export_workers, run_sam2_lease_keeper
+from background_tasks import run_annotation_indexer, run_task_stream_trimmer
+from background_tasks import ANNOTATION_INDEXER
+from background_tasks import run_task_registry_reconciler
 from settings import settings
 
+from contextlib import asynccontextmanager
 from pydantic import BaseModel
 from typing import Any, Optional
 from starlette.middleware.base import BaseHTTPMiddleware
@@ -90,6 +105,8 @@ def init_folder_structure() -> None:
     os.makedirs(settings.RAW_VIDEO_DIRECTORY, exist_ok=True)
     os.makedirs(settings.RAW_IMAGE_DIRECTORY, exist_ok=True)
     os.makedirs(settings.EXTRACTED_FRAMES_DIRECTORY, exist_ok=True)
+    os.makedirs(settings.SEGMENTED_VIDEO_DIRECTORY, exist_ok=True)
+    os.makedirs(settings.PROXY_VIDEO_DIRECTORY, exist_ok=True)
 
 
 def init_redis_structure() -> None:
@@ -112,20 +129,66 @@ def init_redis_structure() -> None:
         )
     except Exception as e:
         print(f"Error creating consumer group: {e}")
-        
-    rcli.set("sam2-instances", 0)
-    rcli.set("max-sam2-instances",99999)
-        
 
+    registered = rcli.backfill_task_registry()
+    print(f"Task registry backfilled: {registered} tasks")
 
 
 init_folder_structure()
 Base.metadata.create_all(bind=engine)
 init_redis_structure()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.redis = await AsyncRedisClient.create()
+    video_reaper_task = asyncio.create_task(run_video_reaper())
+    file_catalog_task = asyncio.create_task(
+        FILE_CATALOG.run(settings.FILE_CATALOG_REFRESH_INTERVAL_SECONDS)
+    )
+    export_workers_task = asyncio.create_task(run_export_workers())
+    media_prober_task = asyncio.create_task(
+        MEDIA_PROBER.run(FILE_CATALOG, settings.FILE_CATALOG_REFRESH_INTERVAL_SECONDS)
+    )
+    response_bridge_task = asyncio.create_task(RESPONSE_BRIDGE.run(app.state.redis))
+    sam2_lease_keeper_task = asyncio.create_task(
+        run_sam2_lease_keeper(app.state.redis)
+    )
+    annotation_indexer_task = asyncio.create_task(
+        run_annotation_indexer(app.state.redis)
+    )
+    task_stream_trimmer_task = asyncio.create_task(
+        run_task_stream_trimmer(app.state.redis)
+    )
+    task_registry_reconciler_task = asyncio.create_task(
+        run_task_registry_reconciler(app.state.redis)
+    )
+    yield
+    video_reaper_task.cancel()
+    file_catalog_task.cancel()
+    media_prober_task.cancel()
+    export_workers_task.cancel()
+    response_bridge_task.cancel()
+    sam2_lease_keeper_task.cancel()
+    annotation_indexer_task.cancel()
+    task_stream_trimmer_task.cancel()
+    task_registry_reconciler_task.cancel()
+    await asyncio.gather(
+        response_bridge_task,
+        sam2_lease_keeper_task,
+        annotation_indexer_task,
+        task_stream_trimmer_task,
+        task_registry_reconciler_task,
+        return_exceptions=True,
+    )
+    await app.state.redis.close()
+    await dispose_async_engine()
+
+
 app = FastAPI(
     debug=True,
     title="Segment Anything API",
+    lifespan=lifespan,
 )
 # app.add_middleware(ResponseWrapperMiddleware)
 
@@ -154,8 +217,41 @@ app.include_router(ai_model_router)
 app.include_router(files_router)
 app.include_router(frames_router)
 app.include_router(task_router)
+app.include_router(playback_router)
 
 
 @app.get("/")
 async def root():
     return {"message": "Hello World"}
+
+
+@app.get("/health/redis")
+async def redis_health(rcli: AsyncRedisClient = Depends(get_async_redis_client)):
+    is_alive, latency_ms = await rcli.ping()
+    return JSONResponse(
+        status_code=200 if is_alive else 503,
+        content={
+            "status": "ok" if is_alive else "unavailable",
+            "latency_ms": latency_ms,
+            "pool": rcli.get_pool_metrics(),
+        },
+    )
+
+
+@app.get("/health/annotation-index")
+async def annotation_index_health():
+    # without keyspace notifications every annotation read rebuilds its index
+    metrics = ANNOTATION_INDEXER.get_metrics()
+    return JSONResponse(
+        status_code=200 if metrics["following"] else 503,
+        content={
+            "status": "ok" if metrics["following"] else "degraded",
+            **metrics,
+        },
+    )
+
+
+@app.get("/health/websockets")
+async def websockets_health():
+    # send queue depth and lag of every inference websocket, sockets per task hub
+    return {"connections": WSMANAGER.get_metrics(), "hubs": TASK_HUBS.get_metrics()}
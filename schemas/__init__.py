@@ -6,5 +6,7 @@ from .prompt import *
 from .gpu import *
 from .intercom import *
 from .dtos import *
+from .polygon_simplification import *
 from .annotation import *
+from .export_job import *
 
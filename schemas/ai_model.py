@@ -1,6 +1,7 @@
 from typing import Optional
 from pydantic import BaseModel, Field
 from .video import VideoOutDetailed
+from .polygon_simplification import PolygonSimplification
 from enums import TaskStatusEnum
 
 
@@ -19,6 +20,8 @@ class InitModelRequest(BaseModel):
     ai_model_id: int  # = Field(alias="model_id")
     video_id: int
     task_name: str = ""
+    # defaults from settings if not given
+    polygon_simplification: Optional[PolygonSimplification] = None
 
     class Config:
         from_attributes = True
@@ -4,6 +4,7 @@ from datetime import datetime, timezone
 
 from enums import AnnotationStatusEnum
 from .dtos import ResponseCover
+from .polygon_simplification import PolygonSimplification
 
 
 class BboxAnnotation(BaseModel):
@@ -24,6 +25,8 @@ class PolygonAnnotation(BaseModel):
     label: Optional[str] = None
     confidence: Optional[float] = None
     coordinates: List[List[float]] = []
+    # coordinates before simplification, only if requested
+    original_coordinates: Optional[List[List[float]]] = None
 
     class Config:
         from_attributes = True
@@ -48,6 +51,9 @@ class AnnotationMeta(BaseModel):
     frame_idx: Optional[int] = (
         None  # frame index of the annotation if annotated on a video
     )
+    original_frame_idx: Optional[int] = (
+        None  # frame number in the source video if frames are sparsely extracted
+    )
 
     class Config:
         from_attributes = True
@@ -68,6 +74,11 @@ class ImageAnnotation(BaseModel):
         from_attributes = True
 
 
+class PolygonSimplificationResponseCover(ResponseCover):
+    msg_type: Any = None
+    data: PolygonSimplification  # type: ignore
+
+
 class AnnotationStatus(BaseModel):
     status: AnnotationStatusEnum
 
@@ -77,6 +88,13 @@ class AnnotationStatusResponseCover(ResponseCover):
     data: AnnotationStatus  # type: ignore
 
 
+class AnnotationVersion(BaseModel):
+    version: int  # annotation version of the task the response includes
+    since: Optional[int] = None  # version the changes are relative to
+    deleted_frames: List[int] = list()  # frames deleted after `since`
+
+
 class ImageAnnotationResponseCover(ResponseCover):
     msg_type: Any = None
     data: List[ImageAnnotation]  # type: ignore
+    meta: Optional[AnnotationVersion] = None
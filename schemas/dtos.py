@@ -1,6 +1,6 @@
 from __future__ import annotations
 from pydantic import BaseModel
-from typing import Any, Dict, List, Optional, TypeVar
+from typing import Any, Dict, List, Literal, Optional, TypeVar
 
 from .prompt import PointPrompt, AnnotationObject, SingleFrameAnnotationObject
 from .intercom import InitModelIntercom, Intercom
@@ -25,7 +25,12 @@ class ResponseCover(BaseModel):
 
 
 class ResetTaskInputCover(ResponseCover):
-    msg_type: str = "reset"
+    msg_type: Literal["reset"] = "reset"
+
+    class Config:
+        from_attributes = True
+        # requests are forwarded as sent, nothing unvalidated may pass
+        extra = "forbid"
 
 
 class ErrorResponseCover(ResponseCover):
@@ -40,11 +45,12 @@ class ErrorResponseCover(ResponseCover):
 
 
 class PointPromptInputCover(ResponseCover):
-    msg_type: str = "add_points"
+    msg_type: Literal["add_points"] = "add_points"
     data: List[AnnotationObject] = []
 
     class Config:
         from_attributes = True
+        extra = "forbid"
 
 
 class SingleFramePointPromptInputCover(PointPromptInputCover):
@@ -52,18 +58,20 @@ class SingleFramePointPromptInputCover(PointPromptInputCover):
 
 
 class RunInferenceInputCover(PointPromptInputCover):
-    msg_type: str = "run_inference"
+    msg_type: Literal["run_inference"] = "run_inference"  # type: ignore
 
     class Config:
         from_attributes = True
+        extra = "forbid"
 
 
 class RemoveObjectInputCover(ResponseCover):
-    msg_type: str = "remove_object"
+    msg_type: Literal["remove_object"] = "remove_object"
     data: List[str] = []  # list of object ids
 
     class Config:
         from_attributes = True
+        extra = "forbid"
 
 
 class InitilizeModelInputCover(ResponseCover):
@@ -0,0 +1,38 @@
+import json
+
+from pydantic import BaseModel, field_validator
+from typing import Any, Optional
+from datetime import datetime
+
+from enums import ExportJobStatusEnum
+from .dtos import ResponseCover
+from .polygon_simplification import PolygonSimplification
+
+
+class ExportJob(BaseModel):
+    job_id: str
+    task_uuid: str
+    status: ExportJobStatusEnum
+    total_frames: Optional[int] = None
+    exported_frames: int = 0
+    last_frame: Optional[int] = None  # last frame index committed to the db
+    error: Optional[str] = None
+    polygon_simplification: Optional[PolygonSimplification] = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+    # redis hash fields are flat, the simplification is stored as JSON
+    @field_validator("polygon_simplification", mode="before")
+    @classmethod
+    def parse_polygon_simplification(cls, v):
+        if isinstance(v, (str, bytes)):
+            return json.loads(v)
+        return v
+
+
+class ExportJobResponseCover(ResponseCover):
+    msg_type: Any = None
+    data: ExportJob  # type: ignore
@@ -1,15 +1,27 @@
 import pathlib
 from pydantic import BaseModel
 
-from typing import Union
+from typing import Union, Optional
 from datetime import datetime
 
 
+class MediaInformation(BaseModel):
+    video_width: Optional[int] = None
+    video_height: Optional[int] = None
+    video_duration: Optional[int] = None  # in milliseconds
+    video_fps: Optional[float] = None
+    video_codec: Optional[str] = None
+
+
 class FileOut(BaseModel):
     file_name: str
     file_path: Union[str, pathlib.Path]
     file_size: int  # in bytes
     created_at: datetime
+    modified_at: Optional[datetime] = None
+    # media is None until the file is probed, or if it is not a video
+    media: Optional[MediaInformation] = None
+    media_probed: bool = False
 
     class Config:
         from_attributes = True
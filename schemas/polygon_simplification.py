@@ -0,0 +1,18 @@
+from pydantic import BaseModel, Field
+
+from enums import PolygonSimplificationMethodEnum
+
+
+class PolygonSimplification(BaseModel):
+    method: PolygonSimplificationMethodEnum = PolygonSimplificationMethodEnum.NONE
+    tolerance: float = Field(default=1.0, ge=0)  # pixels
+    keep_original: bool = False
+
+    class Config:
+        from_attributes = True
+
+    @property
+    def is_active(self) -> bool:
+        return (
+            self.method != PolygonSimplificationMethodEnum.NONE and self.tolerance > 0
+        )
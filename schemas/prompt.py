@@ -39,6 +39,8 @@ class PointPrompt(BaseModel):
 
     class Config:
         from_attributes = True
+        # part of websocket requests, forwarded as sent
+        extra = "forbid"
 
 
 class AnnotationObject(BaseModel):
@@ -58,6 +60,9 @@ class AnnotationObject(BaseModel):
                     raise ValueError("Child should be a PointPrompt object")
         return v
 
+    class Config:
+        extra = "forbid"
+
 
 class SingleFrameAnnotationObject(AnnotationObject):
     # each objects must be on the same frame
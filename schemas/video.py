@@ -1,6 +1,6 @@
 from datetime import datetime
-from pydantic import BaseModel
-from enums import VideoStatusEnum
+from pydantic import BaseModel, model_validator
+from enums import VideoStatusEnum, FrameExtractionModeEnum
 
 from typing import Optional, Dict, Any
 
@@ -9,10 +9,26 @@ class VideoIn(BaseModel):
     video_name: str
     video_path: str
     target_fps: Optional[int] = None
+    extraction_mode: FrameExtractionModeEnum = FrameExtractionModeEnum.ALL
+    frame_stride: Optional[int] = None  # used with "stride" extraction mode
+    scene_threshold: Optional[float] = None  # used with "scene_change" extraction mode
+    create_proxy: bool = False  # low resolution rendition for playback and scrubbing
 
     class Config:
         from_attributes = True
 
+    @model_validator(mode="after")
+    def _validate_extraction_parameters(self):
+        if self.extraction_mode == FrameExtractionModeEnum.STRIDE:
+            if self.frame_stride is None or self.frame_stride < 1:
+                raise ValueError("frame_stride should be a positive integer")
+        if self.extraction_mode == FrameExtractionModeEnum.SCENE_CHANGE:
+            if self.scene_threshold is None:
+                self.scene_threshold = 0.3
+            if self.scene_threshold <= 0 or self.scene_threshold >= 1:
+                raise ValueError("scene_threshold should be between 0 and 1")
+        return self
+
 
 class VideoOut(BaseModel):
     video_id: int
@@ -34,6 +50,13 @@ class VideoOutDetailed(VideoOut):
     frames_path: str
     video_fps: int
     frame_count: Optional[int] = None
+    extraction_mode: Optional[str] = None
+    frame_stride: Optional[int] = None
+    scene_threshold: Optional[float] = None
+    extracted_frame_count: Optional[int] = None
+    content_hash: Optional[str] = None
+    segments_path: Optional[str] = None
+    proxy_path: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -26,11 +26,37 @@ class Settings(BaseSettings):
     REDIS_DB: str = str(os.environ.get("REDIS_DB"))
     REDIS_PASSWORD: str = str(os.environ.get("REDIS_PASSWORD"))
 
+    # Async client shared by the routes, requests wait for a free connection
+    REDIS_POOL_MAX_CONNECTIONS: int = int(
+        os.environ.get("REDIS_POOL_MAX_CONNECTIONS", 64)
+    )
+    REDIS_POOL_TIMEOUT_SECONDS: float = float(
+        os.environ.get("REDIS_POOL_TIMEOUT_SECONDS", 5)
+    )
+    # idle connections are pinged before reuse after this many seconds
+    REDIS_HEALTH_CHECK_INTERVAL_SECONDS: int = int(
+        os.environ.get("REDIS_HEALTH_CHECK_INTERVAL_SECONDS", 30)
+    )
+
     DATA_DIRECTORY: str = str(os.environ.get("DATA_DIRECTORY"))
     RAW_VIDEO_DIRECTORY: str = str(os.environ.get("RAW_VIDEO_DIRECTORY"))
     RAW_IMAGE_DIRECTORY: str = str(os.environ.get("RAW_IMAGE_DIRECTORY"))
     EXTRACTED_FRAMES_DIRECTORY: str = str(os.environ.get("EXTRACTED_FRAMES_DIRECTORY"))
 
+    SEGMENTED_VIDEO_DIRECTORY: str = str(
+        os.environ.get(
+            "SEGMENTED_VIDEO_DIRECTORY",
+            os.path.join(str(os.environ.get("DATA_DIRECTORY")), "segmented_video"),
+        )
+    )
+
+    PROXY_VIDEO_DIRECTORY: str = str(
+        os.environ.get(
+            "PROXY_VIDEO_DIRECTORY",
+            os.path.join(str(os.environ.get("DATA_DIRECTORY")), "proxy_video"),
+        )
+    )
+
     USER_FILES_DIRECTORY: str = str(os.environ.get("USER_FILES_DIRECTORY"))
 
     MODEL_CHECKPOINT_DIRECTORY: str = str(os.environ.get("MODEL_CHECKPOINT_DIRECTORY"))
@@ -39,6 +65,161 @@ class Settings(BaseSettings):
     REDIS_MANAGER_QUEUE: str = str(os.environ.get("REDIS_MANAGER_QUEUE"))
     REDIS_MANAGER_STREAM_NAME: str = str(os.environ.get("REDIS_MANAGER_STREAM_NAME"))
 
+    # Video deduplication, "full" or "sampled"
+    VIDEO_HASH_MODE: str = str(os.environ.get("VIDEO_HASH_MODE", "sampled"))
+    VIDEO_HASH_SAMPLE_BLOCK_SIZE: int = int(
+        os.environ.get("VIDEO_HASH_SAMPLE_BLOCK_SIZE", 1024 * 1024)
+    )
+    VIDEO_HASH_SAMPLE_BLOCK_COUNT: int = int(
+        os.environ.get("VIDEO_HASH_SAMPLE_BLOCK_COUNT", 16)
+    )
+
+    # Segmented (HLS, fMP4) playback, renditions are "<height>:<bitrate>" pairs
+    STREAM_PACKAGING_ENABLED: bool = (
+        str(os.environ.get("STREAM_PACKAGING_ENABLED", "true")).lower() == "true"
+    )
+    STREAM_RENDITIONS: str = str(
+        os.environ.get("STREAM_RENDITIONS", "720:2500k,360:800k")
+    )
+    STREAM_SEGMENT_DURATION_SECONDS: int = int(
+        os.environ.get("STREAM_SEGMENT_DURATION_SECONDS", 2)
+    )
+    STREAM_GOP_SECONDS: float = float(os.environ.get("STREAM_GOP_SECONDS", 1))
+    # e.g. "/protected-segments", lets nginx serve segments with sendfile
+    STREAM_ACCEL_REDIRECT_PREFIX: str = str(
+        os.environ.get("STREAM_ACCEL_REDIRECT_PREFIX", "")
+    )
+
+    # Number of frames fetched per MGET when streaming annotations
+    ANNOTATION_STREAM_CHUNK_SIZE: int = int(
+        os.environ.get("ANNOTATION_STREAM_CHUNK_SIZE", 500)
+    )
+
+    # Rows per INSERT ... ON CONFLICT statement when exporting annotations
+    ANNOTATION_EXPORT_BATCH_SIZE: int = int(
+        os.environ.get("ANNOTATION_EXPORT_BATCH_SIZE", 1000)
+    )
+
+    # Storage of exported annotations: "json", or binary "float32" / "int16"
+    ANNOTATION_CODEC: str = str(os.environ.get("ANNOTATION_CODEC", "json"))
+
+    # Default polygon simplification of tasks: "none", "douglas-peucker" or "visvalingam"
+    POLYGON_SIMPLIFICATION_METHOD: str = str(
+        os.environ.get("POLYGON_SIMPLIFICATION_METHOD", "none")
+    )
+    POLYGON_SIMPLIFICATION_TOLERANCE: float = float(
+        os.environ.get("POLYGON_SIMPLIFICATION_TOLERANCE", 1.0)
+    )
+    POLYGON_SIMPLIFICATION_KEEP_ORIGINAL: bool = (
+        str(os.environ.get("POLYGON_SIMPLIFICATION_KEEP_ORIGINAL", "false")).lower()
+        == "true"
+    )
+
+    # Background annotation export jobs
+    EXPORT_WORKER_COUNT: int = int(os.environ.get("EXPORT_WORKER_COUNT", 2))
+    # a job whose lock expires is taken over, the lock is renewed after every batch
+    EXPORT_JOB_LOCK_TIMEOUT_SECONDS: int = int(
+        os.environ.get("EXPORT_JOB_LOCK_TIMEOUT_SECONDS", 300)
+    )
+
+    # Worker responses to websockets, one blocking pop per process
+    RESPONSE_BRIDGE_BLOCK_TIMEOUT_SECONDS: float = float(
+        os.environ.get("RESPONSE_BRIDGE_BLOCK_TIMEOUT_SECONDS", 5)
+    )
+    # responses popped per round trip when a burst arrives
+    RESPONSE_BRIDGE_BATCH_SIZE: int = int(
+        os.environ.get("RESPONSE_BRIDGE_BATCH_SIZE", 100)
+    )
+
+    # SAM2 model instances across all API replicas, every task holds a lease
+    MAX_SAM2_MODEL_INSTANCES: int = int(os.environ.get("MAX_SAM2_MODEL_INSTANCES", 1))
+    # a lease that is not renewed within its ttl is reclaimed
+    SAM2_LEASE_TTL_SECONDS: float = float(os.environ.get("SAM2_LEASE_TTL_SECONDS", 60))
+    SAM2_LEASE_HEARTBEAT_SECONDS: float = float(
+        os.environ.get("SAM2_LEASE_HEARTBEAT_SECONDS", 15)
+    )
+    # workers renew their lease with PEXPIRE, or with this enabled the API renews
+    # the leases of tasks whose worker keeps task:<uuid>:heartbeat alive
+    SAM2_LEASE_RENEWED_BY_API: bool = (
+        str(os.environ.get("SAM2_LEASE_RENEWED_BY_API", "false")).lower() == "true"
+    )
+
+    # statuses written by workers reach the task registry within this interval
+    TASK_REGISTRY_RECONCILE_INTERVAL_SECONDS: float = float(
+        os.environ.get("TASK_REGISTRY_RECONCILE_INTERVAL_SECONDS", 30)
+    )
+
+    # Per-task request and response channels, "stream" (resumable) or "list"
+    TASK_CHANNEL_TRANSPORT: str = str(
+        os.environ.get("TASK_CHANNEL_TRANSPORT", "list")
+    )
+    # entries kept per task stream, trimmed approximately
+    TASK_STREAM_MAX_LENGTH: int = int(os.environ.get("TASK_STREAM_MAX_LENGTH", 10000))
+    # response streams are written by the worker and trimmed by a periodic sweep
+    TASK_STREAM_TRIM_INTERVAL_SECONDS: int = int(
+        os.environ.get("TASK_STREAM_TRIM_INTERVAL_SECONDS", 60)
+    )
+    # streams of terminated tasks can still be resumed for this many seconds
+    TASK_STREAM_TTL_SECONDS: int = int(os.environ.get("TASK_STREAM_TTL_SECONDS", 3600))
+
+    # Inference websockets offer the "autolabel.msgpack" subprotocol, JSON otherwise
+    WEBSOCKET_MSGPACK_ENABLED: bool = (
+        str(os.environ.get("WEBSOCKET_MSGPACK_ENABLED", "true")).lower() == "true"
+    )
+    # Per-connection send queues, results are never dropped and wait for room
+    WEBSOCKET_SEND_QUEUE_SIZE: int = int(
+        os.environ.get("WEBSOCKET_SEND_QUEUE_SIZE", 256)
+    )
+    WEBSOCKET_RECEIVE_QUEUE_SIZE: int = int(
+        os.environ.get("WEBSOCKET_RECEIVE_QUEUE_SIZE", 64)
+    )
+    # comma separated, only the latest queued message of these types is sent
+    WEBSOCKET_COALESCED_MSG_TYPES: str = str(
+        os.environ.get("WEBSOCKET_COALESCED_MSG_TYPES", "progress,status")
+    )
+    # clients whose queue stays full or whose oldest message waits longer are closed
+    WEBSOCKET_SEND_TIMEOUT_SECONDS: float = float(
+        os.environ.get("WEBSOCKET_SEND_TIMEOUT_SECONDS", 10)
+    )
+    WEBSOCKET_MAX_LAG_SECONDS: float = float(
+        os.environ.get("WEBSOCKET_MAX_LAG_SECONDS", 30)
+    )
+
+    # Scrubbing proxy rendition, GOP size 1 means all-intra
+    PROXY_VIDEO_HEIGHT: int = int(os.environ.get("PROXY_VIDEO_HEIGHT", 360))
+    PROXY_VIDEO_GOP_SIZE: int = int(os.environ.get("PROXY_VIDEO_GOP_SIZE", 1))
+    PROXY_VIDEO_CRF: int = int(os.environ.get("PROXY_VIDEO_CRF", 28))
+
+    # User files catalog
+    FILE_CATALOG_REFRESH_INTERVAL_SECONDS: float = float(
+        os.environ.get("FILE_CATALOG_REFRESH_INTERVAL_SECONDS", 10)
+    )
+    FILE_CATALOG_FULL_RESCAN_INTERVAL_SECONDS: float = float(
+        os.environ.get("FILE_CATALOG_FULL_RESCAN_INTERVAL_SECONDS", 15 * 60)
+    )
+    # empty string keeps the catalog in memory only
+    FILE_CATALOG_PERSIST_PATH: str = str(
+        os.environ.get("FILE_CATALOG_PERSIST_PATH", "")
+    )
+
+    # Background media probing of user files
+    MEDIA_PROBE_CONCURRENCY: int = int(os.environ.get("MEDIA_PROBE_CONCURRENCY", 2))
+    MEDIA_PROBE_TIMEOUT_SECONDS: float = float(
+        os.environ.get("MEDIA_PROBE_TIMEOUT_SECONDS", 10)
+    )
+
+    # Deleted video reaper
+    VIDEO_REAPER_INTERVAL_SECONDS: float = float(
+        os.environ.get("VIDEO_REAPER_INTERVAL_SECONDS", 60)
+    )
+    VIDEO_REAPER_BATCH_SIZE: int = int(os.environ.get("VIDEO_REAPER_BATCH_SIZE", 500))
+    VIDEO_REAPER_BATCH_SLEEP_SECONDS: float = float(
+        os.environ.get("VIDEO_REAPER_BATCH_SLEEP_SECONDS", 0.05)
+    )
+    VIDEO_REAPER_ORPHAN_GRACE_SECONDS: float = float(
+        os.environ.get("VIDEO_REAPER_ORPHAN_GRACE_SECONDS", 60 * 60)
+    )
+
     class Config:
         env_file = ".env"
 
@@ -0,0 +1,35 @@
+import os
+
+from app.file_catalog import FileCatalog
+
+
+def _write(path, size: int) -> None:
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+
+
+def test_list_files_sorts_zero_byte_files_by_size(tmp_path):
+    _write(tmp_path / "empty.mp4", 0)
+    _write(tmp_path / "large.mp4", 2048)
+    _write(tmp_path / "small.mp4", 16)
+    catalog = FileCatalog(str(tmp_path))
+    catalog.refresh(full=True)
+
+    total, files = catalog.list_files(sort_by="file_size")
+    assert total == 3
+    assert [f.file_name for f in files] == ["empty.mp4", "small.mp4", "large.mp4"]
+
+    _, files = catalog.list_files(sort_by="file_size", descending=True)
+    assert [f.file_size for f in files] == [2048, 16, 0]
+
+
+def test_list_files_sorts_by_every_key(tmp_path):
+    _write(tmp_path / "a.mp4", 0)
+    _write(tmp_path / "b.mp4", 1)
+    os.utime(tmp_path / "a.mp4", (0, 0))
+    catalog = FileCatalog(str(tmp_path))
+    catalog.refresh(full=True)
+
+    for sort_by in ["file_name", "file_size", "created_at", "modified_at"]:
+        total, _ = catalog.list_files(sort_by=sort_by)
+        assert total == 2
@@ -0,0 +1,62 @@
+import json
+import asyncio
+
+import pytest
+
+import enums
+from app.response_bridge import StreamResponseBridge, get_response_stream_name
+from app.task_hub import TaskHubRegistry
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+class _RedisClient:
+    def __init__(self, client) -> None:
+        self.client = client
+
+
+async def _add_response(client, task_uuid: str, idx: int) -> str:
+    entry_id = await client.xadd(
+        get_response_stream_name(task_uuid), {"data": json.dumps({"idx": idx})}
+    )
+    return entry_id.decode("utf-8")
+
+
+async def _receive(member, count: int):
+    return [
+        json.loads(await asyncio.wait_for(member.get(), timeout=5))["idx"]
+        for _ in range(count)
+    ]
+
+
+def test_resuming_attach_keeps_responses_added_before_the_bridge_attaches():
+    async def run():
+        client = fakeredis.FakeAsyncRedis()
+        bridge = StreamResponseBridge(block_timeout=0.1)
+        hubs = TaskHubRegistry(bridge)
+        task_uuid = "task"
+        last_id = await _add_response(client, task_uuid, 0)
+        await _add_response(client, task_uuid, 1)
+
+        # the bridge is not running yet, the hub subscription is only queued
+        member = await hubs.attach(
+            task_uuid,
+            "socket",
+            _RedisClient(client),
+            enums.WebSocketRoleEnum.VIEWER,
+            last_id,
+        )
+        # added after the replay read, before the bridge attaches the hub
+        await _add_response(client, task_uuid, 2)
+        bridge_task = asyncio.create_task(bridge.run(_RedisClient(client)))
+        try:
+            assert await _receive(member, 2) == [1, 2]
+            await _add_response(client, task_uuid, 3)
+            assert await _receive(member, 1) == [3]
+            assert member.queue.empty() and not member.replayed
+        finally:
+            bridge_task.cancel()
+            await asyncio.gather(bridge_task, return_exceptions=True)
+            await hubs.detach(task_uuid, "socket")
+
+    asyncio.run(run())
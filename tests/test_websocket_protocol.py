@@ -0,0 +1,30 @@
+import json
+
+import msgpack
+import pytest
+
+from app.websocket_protocol import MessageDecodeError, MsgpackCodec
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        b"\xc1",
+        msgpack.packb({"msg_type": "reset"}) + b"\x01",
+        msgpack.packb({"msg_type": "reset", "data": b"raw"}),
+    ],
+)
+def test_msgpack_to_json_rejects_malformed_messages(payload):
+    with pytest.raises(MessageDecodeError):
+        MsgpackCodec().to_json(payload)
+
+
+def test_msgpack_to_json_converts_messages():
+    payload = msgpack.packb({"msg_type": "reset"})
+    assert json.loads(MsgpackCodec().to_json(payload)) == {"msg_type": "reset"}
+
+
+def test_msgpack_encode_keeps_double_precision():
+    response = json.dumps({"msg_type": "run_inference", "data": [[0.1, 1234.5678]]})
+    assert msgpack.unpackb(MsgpackCodec().encode(response)) == json.loads(response)
+    assert msgpack.unpackb(MsgpackCodec().encode({"score": 0.1})) == {"score": 0.1}
@@ -1,3 +1,29 @@
 from .video_information import get_video_information, get_frame_count_by_duration
 from .gpu_information import get_vram_information
-from .dto_validation import validate_request
\ No newline at end of file
+from .dto_validation import validate_request, validate_request_json
+from .frame_mapping import (
+    get_frame_mapping,
+    get_original_frame_number,
+    get_extracted_frame_count,
+)
+from .content_hash import compute_video_content_hash
+from .media_probe import probe_media_file
+from .annotation_records import (
+    get_annotation_key,
+    iter_annotation_frame_chunks,
+    get_annotation_records,
+    iter_annotation_records,
+)
+from .annotation_codec import (
+    encode_annotation,
+    is_encoded_annotation,
+    EncodedAnnotation,
+    decode_annotation_json,
+    load_image_annotation,
+)
+from .polygon_simplification import simplify_polygons, simplify_annotation
+from .annotation_store import (
+    AnnotationStore,
+    get_frame_objects,
+    bump_annotation_index_generation,
+)
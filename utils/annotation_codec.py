@@ -0,0 +1,171 @@
+import json
+import struct
+
+from typing import Any, Dict, List, Literal, Optional, Union
+
+import numpy as np
+
+import schemas
+
+CoordinateType = Literal["float32", "int16"]
+
+# magic prefix tells encoded annotations apart from JSON, which starts with "{"
+ANNOTATION_CODEC_MAGIC = b"AAB\x01"
+_HEADER_LENGTH = struct.Struct("<I")
+_COORDINATE_DTYPES = {"float32": np.dtype("<f4"), "int16": np.dtype("<i2")}
+_INT16_MAX = np.iinfo(np.int16).max
+# finest quantization step is 1/16 pixel, coarser only for coordinates above 2047 px
+_INT16_MAX_SCALE = 16.0
+
+
+def is_encoded_annotation(raw_annotation: bytes) -> bool:
+    return raw_annotation[: len(ANNOTATION_CODEC_MAGIC)] == ANNOTATION_CODEC_MAGIC
+
+
+def encode_annotation(
+    annotation: Union[Dict[str, Any], schemas.ImageAnnotation],
+    coordinate_type: CoordinateType = "int16",
+) -> bytes:
+    """Encodes an ImageAnnotation with polygon coordinates as a packed array
+
+    Layout: magic, header length, JSON header with everything but polygon
+    coordinates (including point count per polygon), then the coordinates of
+    all polygons as one little endian float32 or int16 array.
+    int16 coordinates are quantized with a per-annotation scale, float32 is
+    used instead if the scale would go below one step per pixel.
+
+    Args:
+        annotation (Union[Dict[str, Any], schemas.ImageAnnotation]): annotation to encode
+        coordinate_type (CoordinateType, optional): coordinate storage type. Defaults to "int16".
+
+    Returns:
+        bytes: encoded annotation
+    """
+    if isinstance(annotation, schemas.ImageAnnotation):
+        annotation = annotation.model_dump(mode="json")
+
+    polygons = annotation.get("polygon_annotations") or []
+    point_counts = [len(polygon.get("coordinates") or []) for polygon in polygons]
+    points = np.asarray(
+        [point for polygon in polygons for point in (polygon.get("coordinates") or [])],
+        dtype=np.float64,
+    ).reshape(-1, 2)
+
+    scale = 1.0
+    if coordinate_type == "int16":
+        max_abs = float(np.abs(points).max()) if len(points) else 0.0
+        scale = min(_INT16_MAX_SCALE, _INT16_MAX / max_abs) if max_abs else 1.0
+        if scale < 1.0:
+            coordinate_type = "float32"
+            scale = 1.0
+
+    if coordinate_type == "int16":
+        packed = np.round(points * scale).astype(_COORDINATE_DTYPES["int16"])
+    else:
+        packed = points.astype(_COORDINATE_DTYPES["float32"])
+
+    header = {
+        key: value for key, value in annotation.items() if key != "polygon_annotations"
+    }
+    header["polygon_annotations"] = [
+        {key: value for key, value in polygon.items() if key != "coordinates"}
+        for polygon in polygons
+    ]
+    header["codec"] = {
+        "coordinate_type": coordinate_type,
+        "scale": scale,
+        "point_counts": point_counts,
+    }
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    return b"".join(
+        [
+            ANNOTATION_CODEC_MAGIC,
+            _HEADER_LENGTH.pack(len(header_bytes)),
+            header_bytes,
+            packed.tobytes(),
+        ]
+    )
+
+
+class EncodedAnnotation:
+    """Lazy view of an encoded annotation.
+
+    The header is parsed on first access and coordinates are decoded only when
+    requested, as a single NumPy array without per-point Python objects.
+    """
+
+    def __init__(self, raw_annotation: bytes) -> None:
+        if not is_encoded_annotation(raw_annotation):
+            raise ValueError("Not an encoded annotation")
+        self.raw_annotation = raw_annotation
+        self._header: Optional[Dict[str, Any]] = None
+        self._points: Optional[np.ndarray] = None
+
+    @property
+    def header(self) -> Dict[str, Any]:
+        if self._header is None:
+            start = len(ANNOTATION_CODEC_MAGIC)
+            (header_length,) = _HEADER_LENGTH.unpack_from(self.raw_annotation, start)
+            start += _HEADER_LENGTH.size
+            self._header = json.loads(
+                self.raw_annotation[start : start + header_length]
+            )
+            self._coordinates_start = start + header_length
+        return self._header
+
+    @property
+    def frame_idx(self) -> Optional[int]:
+        return (self.header.get("meta") or dict()).get("frame_idx")
+
+    @property
+    def polygon_points(self) -> np.ndarray:
+        """(P, 2) coordinates of all polygons in pixels"""
+        if self._points is None:
+            codec = self.header["codec"]
+            points = np.frombuffer(
+                self.raw_annotation,
+                dtype=_COORDINATE_DTYPES[codec["coordinate_type"]],
+                offset=self._coordinates_start,
+            ).reshape(-1, 2)
+            if codec["coordinate_type"] == "int16":
+                points = points / codec["scale"]
+            self._points = points
+        return self._points
+
+    def get_polygon_coordinates(self) -> List[np.ndarray]:
+        point_counts = self.header["codec"]["point_counts"]
+        if not point_counts:
+            return []
+        return np.split(self.polygon_points, np.cumsum(point_counts)[:-1])
+
+    def to_dict(self) -> Dict[str, Any]:
+        annotation = {
+            key: value for key, value in self.header.items() if key != "codec"
+        }
+        annotation["polygon_annotations"] = [
+            dict(polygon, coordinates=coordinates.tolist())
+            for polygon, coordinates in zip(
+                self.header["polygon_annotations"], self.get_polygon_coordinates()
+            )
+        ]
+        return annotation
+
+    def to_json(self) -> bytes:
+        return json.dumps(self.to_dict(), separators=(",", ":")).encode("utf-8")
+
+    def to_model(self) -> schemas.ImageAnnotation:
+        return schemas.ImageAnnotation.model_validate(self.to_dict())
+
+
+def decode_annotation_json(raw_annotation: bytes) -> bytes:
+    """Returns JSON of an annotation stored either encoded or as JSON"""
+    if is_encoded_annotation(raw_annotation):
+        return EncodedAnnotation(raw_annotation).to_json()
+    return raw_annotation
+
+
+def load_image_annotation(raw_annotation: Union[bytes, str]) -> schemas.ImageAnnotation:
+    """Builds the Pydantic model of an annotation stored either encoded or as JSON"""
+    if isinstance(raw_annotation, bytes) and is_encoded_annotation(raw_annotation):
+        return EncodedAnnotation(raw_annotation).to_model()
+    return schemas.ImageAnnotation.model_validate_json(raw_annotation)
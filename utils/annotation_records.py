@@ -0,0 +1,161 @@
+import json
+
+from typing import Iterator, List, Literal, Optional, Set
+
+import schemas
+
+from .frame_mapping import get_original_frame_number
+from .annotation_codec import decode_annotation_json
+from .polygon_simplification import simplify_annotation
+
+AnnotationFormat = Literal["all", "bbox", "polygon"]
+
+
+def get_annotation_key(task_uuid: str, frame_idx: int) -> str:
+    return f"task:{task_uuid}:annotation:{frame_idx}"
+
+
+def iter_annotation_frame_chunks(
+    task_uuid: str,
+    frame_count: Optional[int],
+    rcli,
+    chunk_size: int,
+    start_frame: int = 0,
+) -> Iterator[List[int]]:
+    """Yields frame indices of a task in ascending order, chunk by chunk
+
+    Frame indices run from 0 to the extracted frame count, so they are generated
+    instead of listed. If the frame count is unknown, annotation keys are collected
+    with SCAN and only the frame indices are kept in memory.
+
+    Args:
+        task_uuid (str): task uuid
+        frame_count (Optional[int]): extracted frame count of the task video
+        rcli (RedisClient): Redis client
+        chunk_size (int): frame indices per chunk
+        start_frame (int, optional): first frame index. Defaults to 0.
+
+    Returns:
+        Iterator[List[int]]: frame index chunks
+    """
+    if frame_count is not None:
+        for chunk_start in range(start_frame, frame_count, chunk_size):
+            yield list(range(chunk_start, min(chunk_start + chunk_size, frame_count)))
+        return
+
+    frame_indices = sorted(
+        frame_idx
+        for frame_idx in (
+            int(key.rsplit(":", 1)[1])
+            for key in rcli.iter_keys_with_pattern(
+                f"task:{task_uuid}:annotation:[0-9]*"
+            )
+        )
+        if frame_idx >= start_frame
+    )
+    for chunk_start in range(0, len(frame_indices), chunk_size):
+        yield frame_indices[chunk_start : chunk_start + chunk_size]
+
+
+def get_annotation_records(
+    task_uuid: str,
+    frame_indices: List[int],
+    frame_mapping: Optional[List[int]],
+    annotation_format: AnnotationFormat,
+    rcli,
+    simplification: Optional[schemas.PolygonSimplification] = None,
+    object_ids: Optional[Set[str]] = None,
+    labels: Optional[Set[str]] = None,
+) -> List[bytes]:
+    """Reads annotations of the frames with a single MGET as single line JSON documents
+
+    Annotations are validated by the worker before they are written, they are
+    passed through as is unless they have to be changed. Binary encoded
+    annotations are converted to JSON.
+
+    Args:
+        task_uuid (str): task uuid
+        frame_indices (List[int]): frames to read, frames without annotation are skipped
+        frame_mapping (Optional[List[int]]): mapping to fill original_frame_idx
+        annotation_format (AnnotationFormat): annotation types to keep
+        rcli (RedisClient): Redis client
+        simplification (Optional[schemas.PolygonSimplification], optional): polygon simplification. Defaults to None.
+        object_ids (Optional[Set[str]], optional): objects to keep, all if None. Defaults to None.
+        labels (Optional[Set[str]], optional): labels to keep, all if None. Defaults to None.
+
+    Returns:
+        List[bytes]: ImageAnnotation JSON documents in frame order
+    """
+    simplify = simplification is not None and simplification.is_active
+    filter_objects = object_ids is not None or labels is not None
+    records = []
+    raw_annotations = rcli.get_raw_values(
+        [get_annotation_key(task_uuid, frame_idx) for frame_idx in frame_indices]
+    )
+    for raw_annotation in raw_annotations:
+        if raw_annotation is None:
+            continue
+        raw_annotation = decode_annotation_json(raw_annotation)
+        if (
+            frame_mapping is None
+            and annotation_format == "all"
+            and not simplify
+            and not filter_objects
+            and b"\n" not in raw_annotation
+        ):
+            records.append(raw_annotation)
+            continue
+        try:
+            annotation = json.loads(raw_annotation)
+            meta = annotation.get("meta") or dict()
+            if frame_mapping is not None and meta.get("frame_idx") is not None:
+                meta["original_frame_idx"] = get_original_frame_number(
+                    meta["frame_idx"], frame_mapping
+                )
+            if annotation_format == "bbox":
+                annotation["polygon_annotations"] = list()
+            elif annotation_format == "polygon":
+                annotation["bbox_annotations"] = list()
+            if filter_objects:
+                for annotation_type in ("bbox_annotations", "polygon_annotations"):
+                    annotation[annotation_type] = [
+                        annotation_object
+                        for annotation_object in annotation.get(annotation_type) or []
+                        if (
+                            object_ids is None
+                            or annotation_object.get("id") in object_ids
+                        )
+                        and (labels is None or annotation_object.get("label") in labels)
+                    ]
+            if simplify:
+                simplify_annotation(annotation, simplification)
+            records.append(
+                json.dumps(annotation, separators=(",", ":")).encode("utf-8")
+            )
+        except Exception as e:
+            print(f"Error in reading annotation: {e}")
+            continue
+    return records
+
+
+def iter_annotation_records(
+    task_uuid: str,
+    frame_count: Optional[int],
+    frame_mapping: Optional[List[int]],
+    annotation_format: AnnotationFormat,
+    rcli,
+    chunk_size: int,
+    simplification: Optional[schemas.PolygonSimplification] = None,
+) -> Iterator[bytes]:
+    """Yields annotations of a task in frame order, reading one chunk of frames at a time"""
+    for frame_indices in iter_annotation_frame_chunks(
+        task_uuid, frame_count, rcli, chunk_size
+    ):
+        yield from get_annotation_records(
+            task_uuid,
+            frame_indices,
+            frame_mapping,
+            annotation_format,
+            rcli,
+            simplification=simplification,
+        )
@@ -0,0 +1,506 @@
+import json
+import uuid
+import hashlib
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+import schemas
+
+from .annotation_codec import EncodedAnnotation, is_encoded_annotation
+from .annotation_records import get_annotation_key, iter_annotation_frame_chunks
+
+FrameObject = Tuple[str, Optional[str]]  # object id, label
+
+INDEX_STATE_READY = "ready"
+INDEX_STATE_STALE = "stale"
+# bumped whenever worker writes may have gone unindexed, an index is ready only
+# for the generation it was built or verified at
+ANNOTATION_INDEX_GENERATION_KEY = "annotation:index:generation"
+
+# Writes or deletes a frame annotation under a new task version and moves the
+# frame between object and label indexes, using the objects the index
+# recorded for the frame before.
+# With ARGV[6] == '1' the annotation was already written or deleted by the
+# worker: it is only versioned and indexed, and nothing changes if its digest
+# is the one recorded before, so indexing the same write again is a no-op.
+# Without a ready index (state ready:<generation>) only the annotation and its
+# version are written and the index is marked stale, a rebuild in progress then
+# does not mark itself ready. A ready index of an older generation is kept
+# current, it is verified again by its next reader.
+# KEYS[1]: annotation key, KEYS[2]: frames sorted set, KEYS[3]: frame objects hash,
+# KEYS[4]: index state, KEYS[5]: version counter, KEYS[6]: frame versions sorted set,
+# KEYS[7]: deleted frames sorted set, KEYS[8]: frame digests hash
+# ARGV[1]: frame index, ARGV[2]: annotation, empty to delete, ARGV[3]: objects JSON,
+# ARGV[4]: index key prefix, ARGV[5]: annotation digest, ARGV[6]: '1' if stored
+# Returns the new version
+WRITE_FRAME_SCRIPT = """
+local frame = ARGV[1]
+local prefix = ARGV[4]
+local stored = ARGV[6] == '1'
+if stored then
+    local digest = redis.call('HGET', KEYS[8], frame)
+    if (ARGV[2] == '' and not digest) or digest == ARGV[5] then
+        return tonumber(redis.call('GET', KEYS[5]) or 0)
+    end
+end
+local version = redis.call('INCR', KEYS[5])
+if ARGV[2] == '' then
+    if not stored then
+        redis.call('DEL', KEYS[1])
+    end
+    redis.call('ZREM', KEYS[6], frame)
+    redis.call('ZADD', KEYS[7], version, frame)
+    redis.call('HDEL', KEYS[8], frame)
+else
+    if not stored then
+        redis.call('SET', KEYS[1], ARGV[2])
+    end
+    redis.call('ZADD', KEYS[6], version, frame)
+    redis.call('ZREM', KEYS[7], frame)
+    redis.call('HSET', KEYS[8], frame, ARGV[5])
+end
+local state = redis.call('GET', KEYS[4])
+if not state or string.sub(state, 1, 6) ~= 'ready:' then
+    redis.call('SET', KEYS[4], 'stale')
+    return version
+end
+local previous = redis.call('HGET', KEYS[3], frame)
+if previous then
+    for _, object in ipairs(cjson.decode(previous)) do
+        local object_key = prefix .. 'object:' .. object[1]
+        redis.call('ZREM', object_key, frame)
+        if type(object[2]) == 'string' and redis.call('ZCARD', object_key) == 0 then
+            redis.call('SREM', prefix .. 'label:' .. object[2], object[1])
+        end
+    end
+end
+if ARGV[2] == '' then
+    redis.call('ZREM', KEYS[2], frame)
+    redis.call('HDEL', KEYS[3], frame)
+    return version
+end
+redis.call('ZADD', KEYS[2], frame, frame)
+redis.call('HSET', KEYS[3], frame, ARGV[3])
+for _, object in ipairs(cjson.decode(ARGV[3])) do
+    redis.call('ZADD', prefix .. 'object:' .. object[1], frame, frame)
+    if type(object[2]) == 'string' then
+        redis.call('SADD', prefix .. 'label:' .. object[2], object[1])
+    end
+end
+return version
+"""
+
+# Marks a rebuilt index ready unless a write made it stale meanwhile
+# KEYS[1]: index state, ARGV[1]: state set when the rebuild started,
+# ARGV[2]: index generation read when the rebuild started
+FINISH_REBUILD_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('SET', KEYS[1], 'ready:' .. ARGV[2])
+    return 1
+end
+return 0
+"""
+
+
+def get_annotation_index_state_key(task_uuid: str) -> str:
+    return f"task:{task_uuid}:annotation:index"
+
+
+def bump_annotation_index_generation(rcli) -> int:
+    """Makes the indexes of all tasks stale without touching them
+
+    Used when worker writes may have gone unindexed, e.g. no API process was
+    listening to keyspace notifications. Every index is verified again by a
+    rebuild of its next reader, tasks nobody reads cost nothing.
+
+    Returns:
+        int: new index generation
+    """
+    return int(rcli.client.incr(ANNOTATION_INDEX_GENERATION_KEY))
+
+
+def get_annotation_digest(raw_annotation: bytes) -> str:
+    return hashlib.blake2b(raw_annotation, digest_size=16).hexdigest()
+
+
+def get_frame_objects(raw_annotation: bytes) -> List[FrameObject]:
+    """Returns (object id, label) pairs of a stored frame annotation
+
+    Binary encoded annotations only have their header parsed.
+    """
+    if is_encoded_annotation(raw_annotation):
+        annotation = EncodedAnnotation(raw_annotation).header
+    else:
+        annotation = json.loads(raw_annotation)
+    objects: Dict[str, Optional[str]] = dict()
+    for annotation_type in ("bbox_annotations", "polygon_annotations"):
+        for annotation_object in annotation.get(annotation_type) or []:
+            object_id = annotation_object.get("id")
+            if object_id is not None and objects.get(object_id) is None:
+                objects[object_id] = annotation_object.get("label")
+    return list(objects.items())
+
+
+class AnnotationStore:
+    """Frame annotations of a task with secondary indexes for queries.
+
+    Indexes are kept next to the annotations in redis:
+    - frames: sorted set of annotated frame indices
+    - object:<id>: sorted set of the frames an object appears in
+    - label:<label>: set of object ids with the label
+    - frame_objects: hash of the objects indexed for every frame
+
+    Writes through `write_frame` keep the indexes current. Annotations written
+    by the SAM2 worker are passed to `index_frames` by the annotation indexer,
+    which follows their keyspace notifications. If notifications may have been
+    missed the index generation is bumped, and every index of an older
+    generation is rebuilt by its next reader.
+
+    Every change gets a version from a per-task counter when it is written or
+    indexed, and every frame records the version that last wrote or deleted
+    it. Versions are kept outside the index. A rebuild compares frame digests
+    with the ones recorded before and gives missed changes a single new version.
+    """
+
+    def __init__(self, rcli, task_uuid: str) -> None:
+        self.rcli = rcli
+        self.task_uuid = task_uuid
+        self.index_prefix = f"task:{task_uuid}:annotation:index:"
+        self.state_key = get_annotation_index_state_key(task_uuid)
+        self.lock_name = f"task:{task_uuid}:annotation:index:lock"
+        self.frames_key = f"{self.index_prefix}frames"
+        self.frame_objects_key = f"{self.index_prefix}frame_objects"
+        self.version_key = f"task:{task_uuid}:annotation:version"
+        self.frame_versions_key = f"task:{task_uuid}:annotation:versions"
+        self.deleted_frames_key = f"task:{task_uuid}:annotation:deleted"
+        self.digests_key = f"task:{task_uuid}:annotation:digests"
+        self.write_frame_script = rcli.client.register_script(WRITE_FRAME_SCRIPT)
+        self.finish_rebuild_script = rcli.client.register_script(FINISH_REBUILD_SCRIPT)
+
+    def _object_key(self, object_id: str) -> str:
+        return f"{self.index_prefix}object:{object_id}"
+
+    def _label_key(self, label: str) -> str:
+        return f"{self.index_prefix}label:{label}"
+
+    def _write(
+        self,
+        frame_idx: int,
+        raw_annotation: bytes,
+        objects_json: str,
+        is_stored: bool = False,
+        client=None,
+    ):
+        digest = get_annotation_digest(raw_annotation) if raw_annotation else ""
+        return self.write_frame_script(
+            keys=[
+                get_annotation_key(self.task_uuid, frame_idx),
+                self.frames_key,
+                self.frame_objects_key,
+                self.state_key,
+                self.version_key,
+                self.frame_versions_key,
+                self.deleted_frames_key,
+                self.digests_key,
+            ],
+            args=[
+                frame_idx,
+                raw_annotation,
+                objects_json,
+                self.index_prefix,
+                digest,
+                "1" if is_stored else "0",
+            ],
+            client=client,
+        )
+
+    def write_frame(
+        self,
+        frame_idx: int,
+        annotation: Union[bytes, Dict, schemas.ImageAnnotation],
+    ) -> int:
+        """Writes the annotation of a frame and updates the indexes atomically
+
+        Args:
+            frame_idx (int): extracted frame index
+            annotation (Union[bytes, Dict, schemas.ImageAnnotation]): annotation,
+                bytes are stored as they are (JSON or binary encoded)
+
+        Returns:
+            int: task version of the write
+        """
+        if isinstance(annotation, schemas.ImageAnnotation):
+            raw_annotation = annotation.model_dump_json().encode("utf-8")
+        elif isinstance(annotation, dict):
+            raw_annotation = json.dumps(annotation, separators=(",", ":")).encode(
+                "utf-8"
+            )
+        else:
+            raw_annotation = annotation
+        return int(
+            self._write(
+                frame_idx,
+                raw_annotation,
+                json.dumps(get_frame_objects(raw_annotation)),
+            )
+        )
+
+    def delete_frame(self, frame_idx: int) -> int:
+        return int(self._write(frame_idx, b"", "[]"))
+
+    def index_frames(self, frame_indices: Iterable[int]) -> None:
+        """Versions and indexes frames written or deleted outside the store
+
+        Reads the current annotations with one MGET and indexes them in one
+        pipeline. Frames unchanged since they were last indexed are left alone.
+
+        Args:
+            frame_indices (Iterable[int]): frames the worker touched
+        """
+        frame_indices = sorted(set(frame_indices))
+        if not frame_indices:
+            return
+        raw_annotations = self.rcli.get_raw_values(
+            [get_annotation_key(self.task_uuid, frame_idx) for frame_idx in frame_indices]
+        )
+        pipeline = self.rcli.client.pipeline(transaction=False)
+        for frame_idx, raw_annotation in zip(frame_indices, raw_annotations):
+            if raw_annotation is None:
+                self._write(frame_idx, b"", "[]", is_stored=True, client=pipeline)
+                continue
+            try:
+                objects = get_frame_objects(raw_annotation)
+            except Exception as e:
+                print(f"Error in indexing annotation of frame {frame_idx}: {e}")
+                continue
+            self._write(
+                frame_idx,
+                raw_annotation,
+                json.dumps(objects),
+                is_stored=True,
+                client=pipeline,
+            )
+        pipeline.execute()
+
+    def invalidate(self) -> None:
+        """Marks the index stale, annotations may be changed outside the store"""
+        self.rcli.client.set(self.state_key, INDEX_STATE_STALE)
+
+    def _get_state(self) -> Tuple[Optional[str], int]:
+        state, generation = self.rcli.client.mget(
+            self.state_key, ANNOTATION_INDEX_GENERATION_KEY
+        )
+        return (
+            state.decode("utf-8") if state is not None else None,
+            int(generation or 0),
+        )
+
+    def is_ready(self) -> bool:
+        state, generation = self._get_state()
+        return state == f"{INDEX_STATE_READY}:{generation}"
+
+    def rebuild_index(
+        self,
+        frame_count: Optional[int],
+        chunk_size: int = 500,
+        lock_timeout: float = 300,
+        force: bool = False,
+    ) -> bool:
+        """Builds the indexes again from the stored annotations
+
+        Readers racing for a stale index wait on a lock, only one rebuilds.
+        Only the index keys of the task are deleted, they are found from the
+        objects recorded per frame instead of scanning the keyspace.
+
+        Args:
+            frame_count (Optional[int]): extracted frame count, frames are scanned if None
+            chunk_size (int, optional): frames read per MGET. Defaults to 500.
+            lock_timeout (float, optional): lock expiry, renewed per chunk. Defaults to 300.
+            force (bool, optional): rebuild a ready index too. Defaults to False.
+
+        Returns:
+            bool: True if the index is ready afterwards
+        """
+        with self.rcli.get_lock(self.lock_name, timeout=lock_timeout) as lock:
+            state, generation = self._get_state()
+            if not force and state == f"{INDEX_STATE_READY}:{generation}":
+                return True
+
+            building_state = f"building:{uuid.uuid4()}"
+            self.rcli.client.set(self.state_key, building_state)
+            stale_keys = set()
+            for _, objects_json in self.rcli.client.hscan_iter(
+                self.frame_objects_key, count=chunk_size
+            ):
+                for object_id, label in json.loads(objects_json):
+                    stale_keys.add(self._object_key(object_id))
+                    if label is not None:
+                        stale_keys.add(self._label_key(label))
+            # frame objects go last, an interrupted rebuild still finds the rest
+            stale_keys = [self.frames_key, *stale_keys, self.frame_objects_key]
+            for start in range(0, len(stale_keys), chunk_size):
+                self.rcli.client.delete(*stale_keys[start : start + chunk_size])
+
+            # frames versioned before and not found again were deleted
+            deleted_frames = {
+                int(frame_idx) for frame_idx in self.rcli.client.hkeys(self.digests_key)
+            }
+            version = None
+            for frame_indices in iter_annotation_frame_chunks(
+                self.task_uuid, frame_count, self.rcli, chunk_size
+            ):
+                raw_annotations = self.rcli.get_raw_values(
+                    [
+                        get_annotation_key(self.task_uuid, frame_idx)
+                        for frame_idx in frame_indices
+                    ]
+                )
+                digests = self.rcli.client.hmget(self.digests_key, frame_indices)
+                pipeline = self.rcli.client.pipeline(transaction=False)
+                for frame_idx, raw_annotation, digest in zip(
+                    frame_indices, raw_annotations, digests
+                ):
+                    if raw_annotation is None:
+                        continue
+                    deleted_frames.discard(frame_idx)
+                    new_digest = get_annotation_digest(raw_annotation)
+                    if digest is None or digest.decode("utf-8") != new_digest:
+                        if version is None:
+                            version = self.rcli.client.incr(self.version_key)
+                        pipeline.zadd(self.frame_versions_key, {frame_idx: version})
+                        pipeline.zrem(self.deleted_frames_key, frame_idx)
+                        pipeline.hset(self.digests_key, frame_idx, new_digest)
+                    try:
+                        objects = get_frame_objects(raw_annotation)
+                    except Exception as e:
+                        print(f"Error in indexing annotation of frame {frame_idx}: {e}")
+                        continue
+                    pipeline.zadd(self.frames_key, {frame_idx: frame_idx})
+                    pipeline.hset(
+                        self.frame_objects_key, frame_idx, json.dumps(objects)
+                    )
+                    for object_id, label in objects:
+                        pipeline.zadd(
+                            self._object_key(object_id), {frame_idx: frame_idx}
+                        )
+                        if label is not None:
+                            pipeline.sadd(self._label_key(label), object_id)
+                pipeline.execute()
+                lock.reacquire()
+
+            if deleted_frames:
+                if version is None:
+                    version = self.rcli.client.incr(self.version_key)
+                deleted_frames = list(deleted_frames)
+                pipeline = self.rcli.client.pipeline(transaction=False)
+                pipeline.zrem(self.frame_versions_key, *deleted_frames)
+                pipeline.zadd(
+                    self.deleted_frames_key,
+                    {frame_idx: version for frame_idx in deleted_frames},
+                )
+                pipeline.hdel(self.digests_key, *deleted_frames)
+                pipeline.execute()
+
+            return bool(
+                self.finish_rebuild_script(
+                    keys=[self.state_key], args=[building_state, generation]
+                )
+            )
+
+    def ensure_index(
+        self, frame_count: Optional[int], chunk_size: int = 500, force: bool = False
+    ) -> None:
+        if force or not self.is_ready():
+            self.rebuild_index(frame_count, chunk_size=chunk_size, force=force)
+
+    def get_version(self) -> int:
+        return int(self.rcli.get(self.version_key) or 0)
+
+    def get_changes(self, since: int) -> Tuple[int, List[int], List[int]]:
+        """Returns frames written or deleted after a version
+
+        Args:
+            since (int): version the client has
+
+        Returns:
+            Tuple[int, List[int], List[int]]: current version, changed frames and
+                deleted frames, both in frame order
+        """
+        pipeline = self.rcli.client.pipeline(transaction=True)
+        pipeline.get(self.version_key)
+        pipeline.zrangebyscore(self.frame_versions_key, f"({since}", "+inf")
+        pipeline.zrangebyscore(self.deleted_frames_key, f"({since}", "+inf")
+        version, changed_frames, deleted_frames = pipeline.execute()
+        return (
+            int(version or 0),
+            sorted(int(frame_idx) for frame_idx in changed_frames),
+            sorted(int(frame_idx) for frame_idx in deleted_frames),
+        )
+
+    def query_frames(
+        self,
+        start_frame: int = 0,
+        end_frame: Optional[int] = None,
+        object_ids: Optional[Iterable[str]] = None,
+        labels: Optional[Iterable[str]] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> Tuple[int, List[int], Optional[Set[str]]]:
+        """Finds annotated frames from the indexes
+
+        Without object filters the frame range is paged in redis. With object
+        or label filters only the frame indices of the matching objects in the
+        range are read, never the whole task.
+
+        Args:
+            start_frame (int, optional): first frame index. Defaults to 0.
+            end_frame (Optional[int], optional): last frame index, inclusive. Defaults to None.
+            object_ids (Optional[Iterable[str]], optional): objects to keep. Defaults to None.
+            labels (Optional[Iterable[str]], optional): labels to keep. Defaults to None.
+            offset (int, optional): number of frames to skip. Defaults to 0.
+            limit (Optional[int], optional): page size, all frames if None. Defaults to None.
+
+        Returns:
+            Tuple[int, List[int], Optional[Set[str]]]: total number of matching frames,
+                the page of frame indices and the object ids to keep, None for all
+        """
+        max_frame = end_frame if end_frame is not None else "+inf"
+        if object_ids is not None:
+            object_ids = set(object_ids)
+        if labels:
+            pipeline = self.rcli.client.pipeline(transaction=False)
+            for label in labels:
+                pipeline.smembers(self._label_key(label))
+            label_object_ids = {
+                object_id.decode("utf-8")
+                for members in pipeline.execute()
+                for object_id in members
+            }
+            object_ids = (
+                label_object_ids
+                if object_ids is None
+                else object_ids & label_object_ids
+            )
+
+        if object_ids is None:
+            pipeline = self.rcli.client.pipeline(transaction=False)
+            pipeline.zcount(self.frames_key, start_frame, max_frame)
+            pipeline.zrangebyscore(
+                self.frames_key,
+                start_frame,
+                max_frame,
+                start=offset,
+                num=limit if limit is not None else -1,
+            )
+            total, page = pipeline.execute()
+            return total, [int(frame_idx) for frame_idx in page], None
+
+        if not object_ids:
+            return 0, [], object_ids
+        pipeline = self.rcli.client.pipeline(transaction=False)
+        for object_id in object_ids:
+            pipeline.zrangebyscore(self._object_key(object_id), start_frame, max_frame)
+        frames = sorted(
+            {int(frame_idx) for members in pipeline.execute() for frame_idx in members}
+        )
+        end = offset + limit if limit is not None else None
+        return len(frames), frames[offset:end], object_ids
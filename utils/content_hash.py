@@ -0,0 +1,51 @@
+import os
+import json
+import hashlib
+import pathlib
+
+from typing import Any, Dict, Literal, Union
+
+HASH_CHUNK_SIZE = 1024 * 1024  # 1 MB
+
+
+def compute_video_content_hash(
+    video_path: Union[str, pathlib.Path],
+    conversion_parameters: Dict[str, Any],
+    mode: Literal["full", "sampled"] = "sampled",
+    sample_block_size: int = HASH_CHUNK_SIZE,
+    sample_block_count: int = 16,
+) -> str:
+    """Computes a content hash of a video file combined with its conversion parameters
+
+    "full" mode streams the whole file through the hash. "sampled" mode hashes the
+    file size and evenly spaced blocks, which is enough to identify the same clip
+    added under different names without reading multi-GB files.
+
+    Args:
+        video_path (Union[str, pathlib.Path]): source video path
+        conversion_parameters (Dict[str, Any]): parameters affecting the converted video and frames
+        mode (Literal["full", "sampled"], optional): hashing mode. Defaults to "sampled".
+        sample_block_size (int, optional): size of each sampled block in bytes. Defaults to 1 MB.
+        sample_block_count (int, optional): number of sampled blocks. Defaults to 16.
+
+    Returns:
+        str: hex digest prefixed with the hashing mode
+    """
+    digest = hashlib.sha256()
+    file_size = os.path.getsize(video_path)
+    digest.update(str(file_size).encode("utf-8"))
+
+    with open(video_path, "rb") as file:
+        if mode == "full" or file_size <= sample_block_size * sample_block_count:
+            while chunk := file.read(HASH_CHUNK_SIZE):
+                digest.update(chunk)
+        else:
+            step = (file_size - sample_block_size) // max(sample_block_count - 1, 1)
+            for block_idx in range(sample_block_count):
+                file.seek(block_idx * step)
+                digest.update(file.read(sample_block_size))
+
+    digest.update(
+        json.dumps(conversion_parameters, sort_keys=True, default=str).encode("utf-8")
+    )
+    return f"{mode}:{digest.hexdigest()}"
@@ -1,30 +1,58 @@
-from typing import Union, Tuple, Type, Dict
+from typing import Annotated, Union, Tuple
+
+from pydantic import Field, TypeAdapter, ValidationError
+
 import schemas
 
-schema_mapping: Dict[str, Type[schemas.ResponseCover]] = {
-    "add_points": schemas.SingleFramePointPromptInputCover,
-    "run_inference": schemas.RunInferenceInputCover,
-    "remove_object": schemas.RemoveObjectInputCover,
-    "error": schemas.ErrorResponseCover,
-    "reset": schemas.ResetTaskInputCover,
-}
+# requests a websocket client can send, told apart by msg_type
+TaskRequest = Annotated[
+    Union[
+        schemas.SingleFramePointPromptInputCover,
+        schemas.RunInferenceInputCover,
+        schemas.RemoveObjectInputCover,
+        schemas.ResetTaskInputCover,
+    ],
+    Field(discriminator="msg_type"),
+]
+# built once, the validator picks the schema by msg_type without trying the others
+TASK_REQUEST_ADAPTER: TypeAdapter[TaskRequest] = TypeAdapter(TaskRequest)
+
+
+def _to_error(error: ValidationError) -> schemas.ErrorResponseCover:
+    error_type = error.errors()[0]["type"]
+    if error_type == "union_tag_not_found":
+        return schemas.ErrorResponseCover(message="msg_type is required")
+    if error_type == "union_tag_invalid":
+        return schemas.ErrorResponseCover(message="Unknown msg_type")
+    return schemas.ErrorResponseCover(message=str(error))
 
 
 def validate_request(request: dict) -> Tuple[schemas.ResponseCover, bool]:
+    try:
+        return TASK_REQUEST_ADAPTER.validate_python(request), True
+    except ValidationError as e:
+        return _to_error(e), False
+    except Exception as e:
+        return schemas.ErrorResponseCover(message=str(e)), False
+
 
-    if request.get("msg_type") is None:
-        return schemas.ErrorResponseCover(message="msg_type is required"), False
+def validate_request_json(
+    payload: Union[str, bytes],
+) -> Tuple[schemas.ResponseCover, bool]:
+    """Validates a JSON request without parsing it into a dict first
 
-    validation_schema: Type[schemas.ResponseCover] = schema_mapping.get(
-        request["msg_type"], schemas.ErrorResponseCover
-    )
-    if validation_schema is schemas.ErrorResponseCover:
-        return validation_schema(message="Unknown msg_type"), False
+    A valid payload can be forwarded to the worker as it is, it does not have
+    to be serialized again.
 
+    Args:
+        payload (Union[str, bytes]): request as the client sent it
+
+    Returns:
+        Tuple[schemas.ResponseCover, bool]: validated request, or an error cover and False
+    """
     try:
-        validated_request = validation_schema.model_validate(request)
-        return validated_request, True
+        return TASK_REQUEST_ADAPTER.validate_json(payload), True
+    except ValidationError as e:
+        return _to_error(e), False
     except Exception as e:
         return schemas.ErrorResponseCover(message=str(e)), False
-
-    return schemas.ErrorResponseCover(message="unknown error occured"), False
@@ -0,0 +1,57 @@
+import json
+
+from typing import List, Optional
+
+from .video_information import get_frame_count_by_duration
+
+
+def get_frame_mapping(video) -> Optional[List[int]]:
+    """Returns extracted frame index -> original frame number mapping of the video
+
+    Args:
+        video (dbmodels.Video): video row
+
+    Returns:
+        Optional[List[int]]: mapping list, None if every frame is extracted (identity)
+    """
+    if not video.frame_mapping:
+        return None
+    return json.loads(video.frame_mapping)
+
+
+def get_original_frame_number(
+    frame_number: int, frame_mapping: Optional[List[int]]
+) -> int:
+    """Converts an extracted frame index to the frame number in the original video
+
+    Args:
+        frame_number (int): index of the extracted frame
+        frame_mapping (Optional[List[int]]): mapping from get_frame_mapping
+
+    Returns:
+        int: original frame number
+    """
+    if frame_mapping is None:
+        return frame_number
+    return frame_mapping[frame_number]
+
+
+def get_extracted_frame_count(video) -> int:
+    """Returns number of frames on disk for the video
+
+    Falls back to frame_count and duration for videos processed before
+    the extraction modes were introduced.
+
+    Args:
+        video (dbmodels.Video): video row
+
+    Returns:
+        int: number of extracted frames
+    """
+    if video.extracted_frame_count is not None:
+        return int(video.extracted_frame_count)
+    if video.frame_count is not None:
+        return int(video.frame_count)
+    return get_frame_count_by_duration(
+        duration=video.video_duration, fps=video.video_fps
+    )
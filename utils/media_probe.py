@@ -0,0 +1,85 @@
+import json
+import pathlib
+import subprocess
+
+from typing import Optional, Union
+
+import schemas
+
+
+def _parse_frame_rate(frame_rate: Optional[str]) -> Optional[float]:
+    """Parses ffprobe frame rates like "30000/1001" """
+    if not frame_rate:
+        return None
+    numerator, _, denominator = frame_rate.partition("/")
+    try:
+        if not denominator:
+            return float(numerator)
+        if float(denominator) == 0:
+            return None
+        return float(numerator) / float(denominator)
+    except ValueError:
+        return None
+
+
+def probe_media_file(
+    file_path: Union[str, pathlib.Path], timeout: float = 10
+) -> Optional[schemas.MediaInformation]:
+    """Reads duration, resolution, codec and fps of the first video stream with ffprobe
+
+    Only container headers are read, the file is not decoded.
+
+    Args:
+        file_path (Union[str, pathlib.Path]): file to probe
+        timeout (float, optional): ffprobe timeout in seconds. Defaults to 10.
+
+    Returns:
+        Optional[schemas.MediaInformation]: None if the file has no video stream
+    """
+    command = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-select_streams",
+        "v:0",
+        "-show_entries",
+        "stream=codec_name,width,height,avg_frame_rate,r_frame_rate:format=duration",
+        "-of",
+        "json",
+        str(file_path),
+    ]
+    try:
+        process = subprocess.run(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        return None
+    if process.returncode != 0:
+        return None
+
+    try:
+        data = json.loads(process.stdout)
+    except json.JSONDecodeError:
+        return None
+    streams = data.get("streams") or []
+    if not streams:
+        return None
+    stream = streams[0]
+
+    duration = None
+    try:
+        duration = int(float(data.get("format", {})["duration"]) * 1000)
+    except (KeyError, TypeError, ValueError):
+        pass
+
+    return schemas.MediaInformation(
+        video_width=stream.get("width"),
+        video_height=stream.get("height"),
+        video_duration=duration,
+        video_fps=_parse_frame_rate(stream.get("avg_frame_rate"))
+        or _parse_frame_rate(stream.get("r_frame_rate")),
+        video_codec=stream.get("codec_name"),
+    )
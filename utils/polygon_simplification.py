@@ -0,0 +1,256 @@
+from typing import Any, Dict, Sequence, Tuple
+
+import numpy as np
+
+import schemas
+from enums import PolygonSimplificationMethodEnum as SimplificationMethod
+
+# simplified polygons never go below a triangle
+MIN_POLYGON_POINTS = 3
+
+
+def _group_argmax(
+    values: np.ndarray, offsets: np.ndarray, groups: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Maximum and position of the first maximum of consecutive value groups"""
+    maxima = np.maximum.reduceat(values, offsets)
+    is_max = np.flatnonzero(values == maxima[groups])
+    _, first = np.unique(groups[is_max], return_index=True)
+    return maxima, is_max[first]
+
+
+def _segment_distances(
+    points: np.ndarray, starts: np.ndarray, ends: np.ndarray
+) -> np.ndarray:
+    """Distances of points to the segments from starts to ends"""
+    segments = ends - starts
+    lengths = np.einsum("ij,ij->i", segments, segments)
+    offsets = points - starts
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.einsum("ij,ij->i", offsets, segments) / lengths
+    t = np.clip(np.nan_to_num(t), 0.0, 1.0)
+    return np.hypot(*(offsets - t[:, None] * segments).T)
+
+
+def _douglas_peucker_keep(
+    points: np.ndarray, starts: np.ndarray, ends: np.ndarray, tolerance: float
+) -> np.ndarray:
+    """Douglas-Peucker over many ranges at once, one NumPy pass per tree level
+
+    Args:
+        points (np.ndarray): (N, 2) points
+        starts (np.ndarray): first point index of every range
+        ends (np.ndarray): last point index of every range
+        tolerance (float): maximum distance of a dropped point to the kept outline
+
+    Returns:
+        np.ndarray: (N,) mask of kept points
+    """
+    keep = np.zeros(len(points), dtype=bool)
+    keep[starts] = True
+    keep[ends] = True
+    while len(starts):
+        counts = ends - starts - 1
+        has_interior = counts > 0
+        starts, ends, counts = (
+            starts[has_interior],
+            ends[has_interior],
+            counts[has_interior],
+        )
+        if not len(starts):
+            break
+
+        offsets = np.cumsum(counts) - counts
+        groups = np.repeat(np.arange(len(starts)), counts)
+        interior = starts[groups] + 1 + np.arange(counts.sum()) - offsets[groups]
+        distances = _segment_distances(
+            points[interior], points[starts[groups]], points[ends[groups]]
+        )
+        maxima, farthest = _group_argmax(distances, offsets, groups)
+
+        split = maxima > tolerance
+        splits = interior[farthest[split]]
+        keep[splits] = True
+        starts, ends = (
+            np.concatenate([starts[split], splits]),
+            np.concatenate([splits, ends[split]]),
+        )
+    return keep
+
+
+def _douglas_peucker(
+    points: np.ndarray, point_counts: np.ndarray, tolerance: float
+) -> np.ndarray:
+    """Simplifies closed polygons, returns the mask of kept points"""
+    keep = np.ones(len(points), dtype=bool)
+    simplified = point_counts > MIN_POLYGON_POINTS
+    if not simplified.any():
+        return keep
+
+    # rings are closed with a copy of their first point and split at the
+    # point farthest from it, both halves are simplified as open lines
+    starts = np.cumsum(point_counts) - point_counts
+    starts, counts = starts[simplified], point_counts[simplified]
+    closed_starts = starts + np.arange(len(starts))
+    closed_index = np.insert(
+        np.arange(len(points)), starts + counts, starts
+    )  # index of every closed ring point in points
+    closed_points = points[closed_index]
+
+    groups = np.repeat(np.arange(len(starts)), counts)
+    ring_offsets = np.cumsum(counts) - counts
+    # position of every ring point in the closed array, without the copies
+    ring_points = closed_starts[groups] + np.arange(counts.sum()) - ring_offsets[groups]
+    distances = np.hypot(
+        *(closed_points[ring_points] - closed_points[closed_starts[groups]]).T
+    )
+    _, farthest = _group_argmax(distances, ring_offsets, groups)
+    splits = ring_points[farthest]
+    closed_ends = closed_starts + counts
+
+    closed_keep = _douglas_peucker_keep(
+        closed_points,
+        np.concatenate([closed_starts, splits]),
+        np.concatenate([splits, closed_ends]),
+        tolerance,
+    )
+    ring_keep = closed_keep[ring_points]
+    # degenerate rings would collapse to a line, they are kept as they are
+    kept_counts = np.add.reduceat(ring_keep.astype(np.int64), ring_offsets)
+    ring_keep |= (kept_counts < MIN_POLYGON_POINTS)[groups]
+
+    keep[closed_index[ring_points]] = ring_keep
+    return keep
+
+
+def _visvalingam(
+    points: np.ndarray, point_counts: np.ndarray, tolerance: float
+) -> np.ndarray:
+    """Simplifies closed polygons, returns the mask of kept points
+
+    Every round drops vertices whose triangle with their neighbours is below
+    the area threshold and smaller than the triangles of both neighbours.
+    Such vertices are never adjacent, so a whole round is one NumPy pass.
+    """
+    count = len(points)
+    starts = np.cumsum(point_counts) - point_counts
+    groups = np.repeat(np.arange(len(point_counts)), point_counts)
+    index = np.arange(count)
+    previous = index - 1
+    following = index + 1
+    previous[starts[point_counts > 0]] = (starts + point_counts - 1)[point_counts > 0]
+    following[(starts + point_counts - 1)[point_counts > 0]] = starts[point_counts > 0]
+
+    keep = np.ones(count, dtype=bool)
+    alive_counts = point_counts.copy()
+    threshold = tolerance * tolerance
+    areas = np.full(count, np.inf)
+    while True:
+        alive = np.flatnonzero(keep & (alive_counts[groups] > MIN_POLYGON_POINTS))
+        if not len(alive):
+            break
+        a, b, c = points[previous[alive]], points[alive], points[following[alive]]
+        areas[:] = np.inf
+        areas[alive] = 0.5 * np.abs(
+            (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1])
+            - (c[:, 0] - a[:, 0]) * (b[:, 1] - a[:, 1])
+        )
+
+        area = areas[alive]
+        previous_area, following_area = areas[previous[alive]], areas[following[alive]]
+        # ties are broken by index, so a run of equal triangles still drops one
+        removable = (
+            (area < threshold)
+            & (
+                (area < previous_area)
+                | ((area == previous_area) & (alive < previous[alive]))
+            )
+            & (
+                (area < following_area)
+                | ((area == following_area) & (alive < following[alive]))
+            )
+        )
+        candidates = alive[removable]
+        if not len(candidates):
+            break
+
+        # smallest triangles first, as long as the polygon stays a polygon
+        order = np.lexsort((areas[candidates], groups[candidates]))
+        candidates = candidates[order]
+        candidate_groups = groups[candidates]
+        first = np.searchsorted(candidate_groups, candidate_groups, side="left")
+        rank = np.arange(len(candidates)) - first
+        candidates = candidates[
+            rank < alive_counts[candidate_groups] - MIN_POLYGON_POINTS
+        ]
+
+        keep[candidates] = False
+        following[previous[candidates]] = following[candidates]
+        previous[following[candidates]] = previous[candidates]
+        alive_counts -= np.bincount(groups[candidates], minlength=len(point_counts))
+    return keep
+
+
+def simplify_polygons(
+    points: np.ndarray,
+    point_counts: Sequence[int],
+    tolerance: float,
+    method: SimplificationMethod = SimplificationMethod.DOUGLAS_PEUCKER,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Simplifies the closed polygons of a frame together
+
+    Polygons of all objects are processed in the same NumPy passes.
+    Polygons are never reduced below a triangle.
+
+    Args:
+        points (np.ndarray): (P, 2) points of all polygons
+        point_counts (Sequence[int]): number of points of each polygon
+        tolerance (float): tolerance in pixels
+        method (SimplificationMethod, optional): algorithm. Defaults to DOUGLAS_PEUCKER.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: kept points and point count of each polygon
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    point_counts = np.asarray(point_counts, dtype=np.int64)
+    if method == SimplificationMethod.NONE or tolerance <= 0 or not len(points):
+        return points, point_counts
+
+    if method == SimplificationMethod.VISVALINGAM:
+        keep = _visvalingam(points, point_counts, tolerance)
+    else:
+        keep = _douglas_peucker(points, point_counts, tolerance)
+
+    groups = np.repeat(np.arange(len(point_counts)), point_counts)
+    return points[keep], np.bincount(groups[keep], minlength=len(point_counts))
+
+
+def simplify_annotation(
+    annotation: Dict[str, Any], simplification: schemas.PolygonSimplification
+) -> Dict[str, Any]:
+    """Simplifies polygon coordinates of an ImageAnnotation dict in place
+
+    Args:
+        annotation (Dict[str, Any]): ImageAnnotation as a dict
+        simplification (schemas.PolygonSimplification): method and tolerance
+
+    Returns:
+        Dict[str, Any]: the annotation
+    """
+    polygons = annotation.get("polygon_annotations") or []
+    if not simplification.is_active or not polygons:
+        return annotation
+
+    coordinates = [polygon.get("coordinates") or [] for polygon in polygons]
+    points, point_counts = simplify_polygons(
+        [point for polygon in coordinates for point in polygon],
+        [len(polygon) for polygon in coordinates],
+        simplification.tolerance,
+        simplification.method,
+    )
+    simplified = np.split(points, np.cumsum(point_counts)[:-1])
+    for polygon, original, polygon_points in zip(polygons, coordinates, simplified):
+        if simplification.keep_original:
+            polygon["original_coordinates"] = original
+        polygon["coordinates"] = polygon_points.tolist()
+    return annotation